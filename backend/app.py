@@ -10,9 +10,19 @@ from pptx import Presentation
 
 from latex_generator import genrate_latex_from_image
 from latex_generater import generate_latex_from_image
-from test_generate_video import generate_educational_video
+from test_generate_video import (
+    generate_educational_video, generate_progressive_video, generate_streaming_video, generate_vector_video,
+)
 from generate_video_for_pdf import generate_latex_from_pdf
 from answer import ask_gemini
+from artifact_store import get_artifact_store
+from render_jobs import create_job, update_job, get_job, job_context
+from render_pool import get_render_pool
+from hls_stream import HLSStream, prune_streams
+from render_profiles import DEFAULT_RENDER_PROFILE, RENDER_PROFILES, client_profile, profile_stats
+from render_scratch import scratch_stats
+from media_info import media_info_stats
+from tts_engine import get_speech_synthesizer
 
 app = Flask(__name__)
 CORS(app)  
@@ -21,6 +31,7 @@ STATIC_VIDEOS_FOLDER = 'static/'
 UPLOAD_FOLDER = 'snap'
 PDF_UPLOAD_FOLDER = 'pdfs'
 STATIC_FOLDER = 'static'
+STREAMS_FOLDER = os.path.join(STATIC_FOLDER, 'streams')
 HANDWRITTEN_FOLDER = 'handwritten'
 VIDEOS_FOLDER = os.path.join(os.getcwd(), 'videos')
 os.makedirs(VIDEOS_FOLDER, exist_ok=True)
@@ -56,18 +67,150 @@ def get_latest_text_file(directory):
         print("Error finding latest file:", e)
         return None
     
+def publish_video(vidpath):
+    video_filename = os.path.basename(vidpath.replace('\\', '/'))
+    new_video_path = os.path.join(STATIC_VIDEOS_FOLDER, video_filename)
+    # Artifacts from the store are already written to the serving location.
+    if os.path.abspath(vidpath) != os.path.abspath(new_video_path):
+        shutil.move(vidpath, new_video_path)
+    # Published: drop the hold the render (or cache hit) took on the artifact.
+    get_artifact_store().release_path(new_video_path)
+    return f'/static/{video_filename}'
+
+def request_profile(data=None):
+    # An explicit profile wins; otherwise phones get the small, fast mobile
+    # render and everyone else the default.
+    fields = data or request.form
+    profile = fields.get('profile') or client_profile(request.headers.get('User-Agent'), fields.get('viewportWidth'))
+    if profile not in RENDER_PROFILES:
+        return None
+    return profile
+
+def handle_progressive_question(user_input, profile):
+    job_id = create_job(status='rendering')
+    
+    def on_final(final_path):
+        if final_path:
+            update_job(job_id, status='ready', videoUrl=publish_video(final_path))
+        else:
+            update_job(job_id, status='failed')
+    
+    # Renders submitted for the job add their predicted and actual times to its status.
+    with job_context(job_id):
+        preview_path = generate_progressive_video(user_input, on_final, with_audio=True, final_profile=profile)
+    if not preview_path:
+        update_job(job_id, status='failed')
+        return jsonify({'error': 'Failed to generate video', 'jobId': job_id}), 500
+    
+    preview_url = publish_video(preview_path)
+    update_job(job_id, previewUrl=preview_url)
+    
+    response = {
+        'videoUrl': preview_url,
+        'jobId': job_id,
+        'statusUrl': f'/api/render/{job_id}',
+        'message': f'Processed your question: {user_input}'
+    }
+    return jsonify(response)
+
+def handle_streaming_question(user_input, profile):
+    job_id = create_job(status='rendering')
+    prune_streams(STREAMS_FOLDER)
+    stream = HLSStream(os.path.join(STREAMS_FOLDER, job_id))
+    
+    def on_section(index, result):
+        stream.add_section(result['path'], result['duration'], result.get('audio_path'),
+                           result.get('audio_start', 0.0), result.get('silent', False))
+        update_job(job_id, sectionsReady=stream.sections, streamedSeconds=stream.offset)
+    
+    def on_final(final_path):
+        if final_path and not stream.sections:
+            # Artifact cache hit: nothing was rendered, stream the stored file whole.
+            stream.add_section(final_path)
+        stream.finish()
+        if final_path:
+            update_job(job_id, status='ready', videoUrl=publish_video(final_path))
+        else:
+            update_job(job_id, status='failed')
+    
+    with job_context(job_id):
+        generate_streaming_video(user_input, on_section, on_final, with_audio=True, profile=profile)
+    
+    response = {
+        'jobId': job_id,
+        'streamUrl': f'/stream/{job_id}/index.m3u8',
+        'statusUrl': f'/api/render/{job_id}',
+        'message': f'Processed your question: {user_input}'
+    }
+    return jsonify(response)
+
+def handle_vector_question(user_input, profile):
+    job_id = create_job(status='rendering')
+    
+    def on_fallback(video_path):
+        if video_path:
+            update_job(job_id, status='ready', videoUrl=publish_video(video_path))
+        else:
+            update_job(job_id, status='failed')
+    
+    with job_context(job_id):
+        result = generate_vector_video(user_input, with_audio=True, profile=profile, on_fallback=on_fallback)
+    if not result:
+        update_job(job_id, status='failed')
+        return jsonify({'error': 'Failed to generate video'}), 500
+    
+    response = {'message': f'Processed your question: {user_input}'}
+    if result['vector']:
+        response['vectorBytes'] = os.path.getsize(result['vector'])
+        response['vectorUrl'] = publish_video(result['vector'])
+        # The MP4 for players that can't load the timeline is still rendering.
+        response['jobId'] = job_id
+        response['statusUrl'] = f'/api/render/{job_id}'
+    else:
+        # The scene needed something the vector player can't draw.
+        response['videoUrl'] = publish_video(result['video'])
+        update_job(job_id, status='ready', videoUrl=response['videoUrl'])
+    return jsonify(response)
+
+@app.route('/api/render/stats', methods=['GET'])
+def render_stats():
+    stats = get_render_pool().stats()
+    stats['profiles'] = profile_stats()
+    stats['scratch'] = scratch_stats()
+    stats['media_info'] = media_info_stats()
+    stats['tts'] = get_speech_synthesizer().stats()
+    return jsonify(stats)
+
+@app.route('/api/render/profiles', methods=['GET'])
+def list_render_profiles():
+    return jsonify({'default': DEFAULT_RENDER_PROFILE, 'profiles': RENDER_PROFILES})
+
+@app.route('/api/render/<job_id>', methods=['GET'])
+def render_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
 @app.route('/api/ask', methods=['POST'])
 def handle_question():
     data = request.json
     user_input = data.get('message', '')
+    profile = request_profile(data)
+    if profile is None:
+        return jsonify({'error': f"Unknown profile, choose one of: {', '.join(RENDER_PROFILES)}"}), 400
     
-    vidpath=generate_educational_video(user_input,'y',)
-    video_url = vidpath.replace('\\', '/')
+    if data.get('stream'):
+        return handle_streaming_question(user_input, profile)
+    if data.get('progressive'):
+        return handle_progressive_question(user_input, profile)
+    if data.get('format') == 'vector':
+        return handle_vector_question(user_input, profile)
     
-    video_filename = os.path.basename(video_url)
-    new_video_path = os.path.join(STATIC_VIDEOS_FOLDER, video_filename)
-    shutil.move(vidpath, new_video_path)
-    video_url = f'/static/{video_filename}'
+    vidpath=generate_educational_video(user_input,'y',profile=profile)
+    if not vidpath:
+        return jsonify({'error': 'Failed to generate video'}), 500
+    video_url = publish_video(vidpath)
     
     response = {
         'videoUrl': video_url,
@@ -96,16 +239,15 @@ def handle_upload():
     file_path = os.path.join(UPLOAD_FOLDER, filename)
     file.save(file_path)
     
-    latex_equation = genrate_latex_from_image(file_path)
-    vidpath=generate_educational_video(latex_equation)
-    video_url = vidpath.replace('\\', '/')
+    profile = request_profile()
+    if profile is None:
+        return jsonify({'error': f"Unknown profile, choose one of: {', '.join(RENDER_PROFILES)}"}), 400
     
-    video_filename = os.path.basename(video_url)  
-    new_video_path = os.path.join(STATIC_VIDEOS_FOLDER, video_filename)
-
-    shutil.move(vidpath, new_video_path)  
-
-    video_url = f'/static/{video_filename}'
+    latex_equation = genrate_latex_from_image(file_path)
+    vidpath=generate_educational_video(latex_equation, profile=profile)
+    if not vidpath:
+        return jsonify({'error': 'Failed to generate video'}), 500
+    video_url = publish_video(vidpath)
     
     response = {
         'videoUrl': video_url,
@@ -126,6 +268,10 @@ def handle_upload_pdf():
     file_path = os.path.join(PDF_UPLOAD_FOLDER, filename)
     file.save(file_path)
     
+    profile = request_profile()
+    if profile is None:
+        return jsonify({'error': f"Unknown profile, choose one of: {', '.join(RENDER_PROFILES)}"}), 400
+    
     filename = os.path.basename(file_path)
     name, ext = os.path.splitext(filename)
     pdf_path = os.path.join(PDF_UPLOAD_FOLDER, f"{name}.pdf")
@@ -137,16 +283,14 @@ def handle_upload_pdf():
     elif ext.lower() != ".pdf":
         return "Unsupported file format", None
     
-    result = generate_latex_from_pdf(pdf_path)
+    result = generate_latex_from_pdf(pdf_path, profile=profile)
     
     vidpath = result['video_file']
     latex_file = result['latex_file']
     
-    video_url = vidpath.replace('\\', '/')
-    video_filename = os.path.basename(video_url)
-    new_video_path = os.path.join(STATIC_VIDEOS_FOLDER, video_filename)
-    shutil.move(vidpath, new_video_path)
-    video_url = f'/static/{video_filename}'
+    if not vidpath:
+        return jsonify({'error': 'Failed to generate video'}), 500
+    video_url = publish_video(vidpath)
     response = {
         'videoUrl': video_url,
         'message': f'Processed your file: {filename}',
@@ -168,15 +312,15 @@ def handle_handwritten_upload():
     file_path = os.path.join(HANDWRITTEN_FOLDER, filename)
     file.save(file_path)
     
+    profile = request_profile()
+    if profile is None:
+        return jsonify({'error': f"Unknown profile, choose one of: {', '.join(RENDER_PROFILES)}"}), 400
+    
     latex=generate_latex_from_image(file_path)
-    vidpath=generate_educational_video(latex)
-    video_url = vidpath.replace('\\', '/')
-    video_filename = os.path.basename(video_url)  
-    new_video_path = os.path.join(STATIC_VIDEOS_FOLDER, video_filename)
-
-    shutil.move(vidpath, new_video_path)  
-
-    video_url = f'/static/{video_filename}'
+    vidpath=generate_educational_video(latex, profile=profile)
+    if not vidpath:
+        return jsonify({'error': 'Failed to generate video'}), 500
+    video_url = publish_video(vidpath)
     
     response = {
         'videoUrl': video_url,
@@ -189,6 +333,14 @@ def handle_handwritten_upload():
 def static_files(filename):
     return send_from_directory(STATIC_FOLDER, filename)
 
+@app.route('/stream/<job_id>/<filename>')
+def stream_files(job_id, filename):
+    response = send_from_directory(os.path.join(STREAMS_FOLDER, job_id), filename)
+    if filename.endswith('.m3u8'):
+        # The playlist grows while sections render.
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/videos/<filename>')
 def serve_video(filename):
     return send_from_directory(VIDEOS_FOLDER, filename)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+
+from filelock import FileLock
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "static")
+ARTIFACT_QUOTA_MB = int(os.environ.get("ARTIFACT_QUOTA_MB", "2048"))
+# A hold (lookup/put) pins an artifact until it is released; holds older than
+# this were leaked by a caller that never released them and stop counting.
+ARTIFACT_HOLD_SECONDS = int(os.environ.get("ARTIFACT_HOLD_SECONDS", "600"))
+# Cache hits are appended to a journal and folded into the index once it grows
+# past this, instead of rewriting the whole index on every hit.
+ARTIFACT_JOURNAL_BYTES = int(os.environ.get("ARTIFACT_JOURNAL_BYTES", str(64 * 1024)))
+
+
+def artifact_key(script, narration=None, settings=None):
+    payload = json.dumps({
+        'script': script or '',
+        'narration': narration or '',
+        'settings': settings or {},
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class ArtifactStore:
+
+    def __init__(self, root=ARTIFACT_DIR, quota_bytes=ARTIFACT_QUOTA_MB * 1024 * 1024):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, ".artifacts.json")
+        self.journal_path = os.path.join(root, ".artifacts.journal")
+        # The index is shared by every gunicorn worker, so guard it with a file lock
+        # as well as a thread lock.
+        self._file_lock = FileLock(self.index_path + ".lock")
+        self._lock = threading.Lock()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+
+        # Apply the holds and releases logged since the index was last written.
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        for line in lines:
+            try:
+                key, delta, now = json.loads(line)
+            except ValueError:
+                continue
+            entry = index.get(key)
+            if entry is None:
+                continue
+            entry['refs'] = max(0, entry.get('refs', 0) + delta)
+            if delta > 0:
+                entry['last_access'] = max(entry.get('last_access', 0), now)
+        return index
+
+    def _save_index(self, index):
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+        # The index now includes everything the journal held.
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+
+    def _log(self, key, delta):
+        # Called with both locks held.
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([key, delta, time.time()]) + "\n")
+        if os.path.getsize(self.journal_path) > ARTIFACT_JOURNAL_BYTES:
+            self._save_index(self._load_index())
+
+    def path_for(self, key, ext=".mp4"):
+        return os.path.join(self.root, f"{key}{ext}")
+
+    def lookup(self, key):
+        with self._lock, self._file_lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+
+            path = os.path.join(self.root, entry['file'])
+            if not os.path.exists(path):
+                del index[key]
+                self._save_index(index)
+                return None
+
+            self._log(key, 1)
+            return path
+
+    def release(self, key):
+        # Drop a hold taken by lookup or put once the caller is done with the file.
+        with self._lock, self._file_lock:
+            self._log(key, -1)
+
+    def release_path(self, path):
+        # release() by the path lookup/put returned; other files are ignored.
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.root):
+            return
+        self.release(os.path.splitext(os.path.basename(path))[0])
+
+    def put(self, key, src_path, metadata=None):
+        ext = os.path.splitext(src_path)[1] or ".mp4"
+        final_path = self.path_for(key, ext)
+        tmp_path = os.path.join(self.root, f".{key}.{uuid.uuid4().hex}.part")
+
+        # Stage next to the destination so the final rename is atomic even when
+        # src_path lives on another filesystem (e.g. a temp dir).
+        shutil.move(src_path, tmp_path)
+
+        with self._lock, self._file_lock:
+            os.replace(tmp_path, final_path)
+
+            index = self._load_index()
+            now = time.time()
+            entry = index.get(key, {'refs': 0, 'created': now})
+            entry.update({
+                'file': os.path.basename(final_path),
+                'size': os.path.getsize(final_path),
+                'last_access': now,
+                'refs': entry.get('refs', 0) + 1,
+            })
+            if metadata:
+                entry['metadata'] = metadata
+            index[key] = entry
+
+            self._evict(index, keep=key)
+            self._save_index(index)
+
+        return final_path
+
+    def _evict(self, index, keep=None):
+        total = sum(entry.get('size', 0) for entry in index.values())
+        if total <= self.quota_bytes:
+            return
+
+        now = time.time()
+        for key, entry in sorted(index.items(), key=lambda item: item[1].get('last_access', 0)):
+            if total <= self.quota_bytes:
+                break
+            if key == keep:
+                continue
+            if entry.get('refs', 0) > 0 and now - entry.get('last_access', 0) < ARTIFACT_HOLD_SECONDS:
+                # Still being served or spliced; over quota until it's released.
+                continue
+
+            path = os.path.join(self.root, entry['file'])
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= entry.get('size', 0)
+            del index[key]
+            print(f"Evicted artifact {entry['file']} ({entry.get('size', 0)} bytes, refs={entry.get('refs', 0)})")
+
+    def stats(self):
+        with self._lock, self._file_lock:
+            index = self._load_index()
+        return {
+            'artifacts': len(index),
+            'bytes': sum(entry.get('size', 0) for entry in index.values()),
+            'quota_bytes': self.quota_bytes,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
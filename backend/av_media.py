@@ -0,0 +1,330 @@
+import os
+import time
+import tempfile
+import subprocess
+
+import av
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# "av" mixes and muxes narration in-process through libav; "ffmpeg" keeps the
+# subprocess path (MediaGraph and the amix filter graph). PyAV itself is a
+# hard dependency either way: probing and TTS transcoding always use it.
+MEDIA_BACKEND = os.environ.get("MEDIA_BACKEND", "av")
+MIX_SAMPLE_RATE = 44100
+MIX_LAYOUT = "stereo"
+AAC_FRAME_SIZE = 1024
+
+
+def use_av():
+    return MEDIA_BACKEND == "av"
+
+
+def _bit_rate(bitrate):
+    bitrate = str(bitrate).lower()
+    if bitrate.endswith("k"):
+        return int(float(bitrate[:-1]) * 1000)
+    if bitrate.endswith("m"):
+        return int(float(bitrate[:-1]) * 1000000)
+    return int(bitrate)
+
+
+def decode_audio(path, rate=MIX_SAMPLE_RATE):
+    # Whole clip as float32 samples shaped (channels, samples) at the mix rate.
+    resampler = av.AudioResampler(format="fltp", layout=MIX_LAYOUT, rate=rate)
+    chunks = []
+    with av.open(str(path)) as container:
+        for frame in container.decode(audio=0):
+            chunks += [out.to_ndarray() for out in resampler.resample(frame)]
+        chunks += [out.to_ndarray() for out in resampler.resample(None)]
+    if not chunks:
+        return np.zeros((2, 0), dtype=np.float32)
+    return np.concatenate(chunks, axis=1)
+
+
+def decode_segments(segments, rate=MIX_SAMPLE_RATE):
+    # Decoded ahead of time (while the video renders) so the mix only sums.
+    for segment in segments:
+        segment['samples'] = decode_audio(segment['file'], rate)
+    return segments
+
+
+def mix_placements(placements, total_duration=0.0, rate=MIX_SAMPLE_RATE):
+    # placements come from plan_audio_timeline; gaps between clips are just
+    # the zeros the buffer starts with, so no silence is ever generated.
+    clips = [
+        (int(round(p['start'] * rate)), p['samples'] if 'samples' in p else decode_audio(p['file'], rate))
+        for p in placements
+    ]
+    length = max([int(round(total_duration * rate))] + [start + clip.shape[1] for start, clip in clips])
+    track = np.zeros((2, length), dtype=np.float32)
+    for start, clip in clips:
+        track[:, start:start + clip.shape[1]] += clip
+    return track
+
+
+def concat_audio(paths, rate=MIX_SAMPLE_RATE):
+    clips = [decode_audio(path, rate) for path in paths]
+    return np.concatenate(clips, axis=1) if clips else np.zeros((2, 0), dtype=np.float32)
+
+
+def _fit_track(track, samples, loop):
+    if track.shape[1] >= samples:
+        return track[:, :samples]
+    if loop and track.shape[1]:
+        repeats = -(-samples // track.shape[1])
+        return np.tile(track, (1, repeats))[:, :samples]
+    return track
+
+
+def _audio_frames(track, start, end, rate=MIX_SAMPLE_RATE):
+    for offset in range(start, end, AAC_FRAME_SIZE):
+        chunk = np.ascontiguousarray(track[:, offset:min(offset + AAC_FRAME_SIZE, end)])
+        frame = av.AudioFrame.from_ndarray(chunk, format="fltp", layout=MIX_LAYOUT)
+        frame.sample_rate = rate
+        frame.pts = offset
+        yield frame
+
+
+def transcode_to_wav(src_path, dst_path):
+    # MP3 from gTTS is decoded once, when it enters the TTS cache; every mix
+    # after that reads PCM. Rate and channels are kept as synthesized.
+    with av.open(str(src_path)) as source, av.open(str(dst_path), mode="w", format="wav") as output:
+        audio_in = source.streams.audio[0]
+        rate = audio_in.codec_context.sample_rate
+        layout = audio_in.codec_context.layout.name
+        audio_out = output.add_stream("pcm_s16le", rate=rate)
+        audio_out.layout = layout
+        resampler = av.AudioResampler(format="s16", layout=layout, rate=rate)
+        for frame in source.decode(audio_in):
+            for out in resampler.resample(frame):
+                for packet in audio_out.encode(out):
+                    output.mux(packet)
+        for out in resampler.resample(None):
+            for packet in audio_out.encode(out):
+                output.mux(packet)
+        for packet in audio_out.encode(None):
+            output.mux(packet)
+    return dst_path
+
+
+def encode_audio_file(src_path, dst_path, bitrate="128k", rate=MIX_SAMPLE_RATE):
+    # Standalone AAC (.m4a) for players that take the narration separately.
+    track = np.ascontiguousarray(decode_audio(src_path, rate))
+    with av.open(str(dst_path), mode="w") as output:
+        audio_out = output.add_stream("aac", rate=rate)
+        audio_out.layout = MIX_LAYOUT
+        audio_out.bit_rate = _bit_rate(bitrate)
+        for frame in _audio_frames(track, 0, track.shape[1], rate):
+            for packet in audio_out.encode(frame):
+                output.mux(packet)
+        for packet in audio_out.encode(None):
+            output.mux(packet)
+    return dst_path
+
+
+def mux_audio(video_path, track, output_path, bitrate="128k", speed_factor=1.0, loop=False,
+              rate=MIX_SAMPLE_RATE):
+    # Copies the video packets into a new mp4 and encodes the in-memory track
+    # alongside them. A speed change only rescales the copied timestamps (as
+    # ffmpeg's -itsscale does), so the video is never decoded.
+    try:
+        with av.open(str(video_path)) as source, av.open(str(output_path), mode="w") as output:
+            video_in = source.streams.video[0]
+            video_out = output.add_stream(template=video_in)
+            audio_out = output.add_stream("aac", rate=rate)
+            audio_out.layout = MIX_LAYOUT
+            audio_out.bit_rate = _bit_rate(bitrate)
+
+            duration = source.duration / av.time_base / speed_factor if source.duration else None
+            if duration:
+                track = _fit_track(track, int(round(duration * rate)), loop)
+            track = np.ascontiguousarray(track, dtype=np.float32)
+            written = 0
+
+            def write_audio(until):
+                # Keeps the two streams interleaved instead of buffering all
+                # of one behind the other in the muxer.
+                nonlocal written
+                if until is None:
+                    end = track.shape[1]
+                else:
+                    # Whole frames only; just the very last one may be short.
+                    end = min(track.shape[1], int(until * rate))
+                    end = written + (end - written) // AAC_FRAME_SIZE * AAC_FRAME_SIZE
+                for frame in _audio_frames(track, written, end, rate):
+                    for packet in audio_out.encode(frame):
+                        output.mux(packet)
+                written = max(written, end)
+
+            last_dts = None
+            for packet in source.demux(video_in):
+                if packet.dts is None:
+                    continue
+                if speed_factor != 1.0:
+                    packet.pts = int(round(packet.pts / speed_factor)) if packet.pts is not None else None
+                    packet.dts = int(round(packet.dts / speed_factor))
+                    packet.duration = int(round(packet.duration / speed_factor)) if packet.duration else 0
+                if last_dts is not None and packet.dts <= last_dts:
+                    packet.dts = last_dts + 1
+                last_dts = packet.dts
+                write_audio(float(packet.dts * packet.time_base))
+                packet.stream = video_out
+                output.mux(packet)
+
+            write_audio(None)
+            for packet in audio_out.encode(None):
+                output.mux(packet)
+        return True
+    except (av.FFmpegError, OSError, ValueError) as e:
+        print(f"Error muxing {video_path} with narration: {e}")
+        return False
+
+
+def mux_audio_file(video_path, audio_path, output_path, bitrate="128k", speed_factor=1.0, loop=False, delay=0.0):
+    try:
+        track = decode_audio(audio_path)
+    except (av.FFmpegError, OSError) as e:
+        print(f"Error decoding {audio_path}: {e}")
+        return False
+    if delay:
+        track = np.pad(track, ((0, 0), (int(round(delay * MIX_SAMPLE_RATE)), 0)))
+    return mux_audio(video_path, track, output_path, bitrate, speed_factor, loop)
+
+
+def _write_test_media(temp_dir, duration=6.0, segments=4, segment_format="mp3"):
+    # A short 15 fps video and a few sine "narration" clips, all made with
+    # PyAV so the benchmark doesn't depend on which path it measures.
+    video_path = os.path.join(temp_dir, "video.mp4")
+    with av.open(video_path, mode="w") as container:
+        stream = container.add_stream("libx264", rate=15)
+        stream.width, stream.height, stream.pix_fmt = 320, 180, "yuv420p"
+        for i in range(int(duration * 15)):
+            image = np.full((180, 320, 3), (i * 3) % 255, dtype=np.uint8)
+            for packet in stream.encode(av.VideoFrame.from_ndarray(image, format="rgb24")):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+    segment_files = []
+    for i in range(segments):
+        path = os.path.join(temp_dir, f"segment_{i:03d}.{segment_format}")
+        with av.open(path, mode="w") as container:
+            pcm = segment_format == "wav"
+            stream = container.add_stream("pcm_s16le" if pcm else "libmp3lame", rate=22050)
+            stream.layout = "mono"
+            t = np.arange(int(22050 * 0.9)) / 22050
+            samples = (0.3 * np.sin(2 * np.pi * (220 + 110 * i) * t))[None, :]
+            if pcm:
+                frame = av.AudioFrame.from_ndarray((samples * 32767).astype(np.int16), format="s16", layout="mono")
+            else:
+                frame = av.AudioFrame.from_ndarray(samples.astype(np.float32), format="fltp", layout="mono")
+            frame.sample_rate = 22050
+            for packet in stream.encode(frame):
+                container.mux(packet)
+            for packet in stream.encode(None):
+                container.mux(packet)
+        segment_files.append(path)
+    return video_path, segment_files
+
+
+def _dir_bytes(path, exclude=()):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            full = os.path.join(root, name)
+            if full not in exclude:
+                total += os.path.getsize(full)
+    return total
+
+
+def _cpu_time():
+    # This process plus every child it waited for (ffmpeg runs).
+    cpu = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += children.ru_utime + children.ru_stime
+    return cpu
+
+
+# mode -> (segment format, how the mix is done, intermediate file)
+BENCH_MODES = {
+    'mp3': ("mp3", "ffmpeg", "synchronized_audio.mp3"),
+    'ffmpeg': ("wav", "ffmpeg", "synchronized_audio.wav"),
+    'av': ("wav", "av", None),
+}
+
+
+def benchmark_media_io(runs=3, speed_factor=1.0, modes=tuple(BENCH_MODES)):
+    # "mp3" is the old chain (MP3 clips, MP3 mixdown, AAC mux); "ffmpeg" and
+    # "av" are the subprocess fallback and the default, both fed PCM clips.
+    from media_graph import MediaGraph
+    from sync_audio_video import assemble_synchronized_audio, plan_audio_timeline
+
+    spawns = [0]
+    popen_init = subprocess.Popen.__init__
+
+    def counting_init(self, *args, **kwargs):
+        spawns[0] += 1
+        popen_init(self, *args, **kwargs)
+
+    results = {mode: [] for mode in modes}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inputs = {}
+        for segment_format in {BENCH_MODES[mode][0] for mode in modes}:
+            media_dir = os.path.join(temp_dir, segment_format)
+            os.makedirs(media_dir)
+            video_path, segment_files = _write_test_media(media_dir, segment_format=segment_format)
+            inputs[segment_format] = (video_path, [
+                {'timestamp': i * 1.5, 'file': path, 'text': ''} for i, path in enumerate(segment_files)
+            ])
+        total = 6.0 / speed_factor
+
+        subprocess.Popen.__init__ = counting_init
+        try:
+            for i in range(runs):
+                for mode in modes:
+                    segment_format, mixer, intermediate = BENCH_MODES[mode]
+                    video_path, segments = inputs[segment_format]
+                    work_dir = os.path.join(temp_dir, f"{mode}_{i}")
+                    os.makedirs(work_dir)
+                    output_path = os.path.join(work_dir, "out.mp4")
+                    spawns[0] = 0
+                    start, cpu_start = time.perf_counter(), _cpu_time()
+                    if mixer == "ffmpeg":
+                        audio_path = os.path.join(work_dir, intermediate)
+                        assemble_synchronized_audio(segments, total, audio_path)
+                        MediaGraph(video_path).speed(speed_factor).audio(audio_path).run(output_path)
+                    else:
+                        track = mix_placements(plan_audio_timeline(segments), total)
+                        mux_audio(video_path, track, output_path, speed_factor=speed_factor)
+                    results[mode].append({
+                        'wall': time.perf_counter() - start,
+                        'cpu': _cpu_time() - cpu_start,
+                        'spawns': spawns[0],
+                        'temp_bytes': _dir_bytes(work_dir, exclude=(output_path,)),
+                    })
+        finally:
+            subprocess.Popen.__init__ = popen_init
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark narration mix + mux: MP3 chain, ffmpeg and in-process PyAV")
+    parser.add_argument("--runs", type=int, default=3, help="Jobs per mode")
+    parser.add_argument("--speed", type=float, default=1.0, help="Video speed factor (e.g. 0.75)")
+
+    args = parser.parse_args()
+
+    results = benchmark_media_io(args.runs, args.speed)
+    for mode, runs in results.items():
+        walls = [r['wall'] for r in runs]
+        cpus = [r['cpu'] for r in runs]
+        print(f"{mode:>6}: wall mean {sum(walls) / len(walls):.3f}s  cpu mean {sum(cpus) / len(cpus):.3f}s  "
+              f"spawns {runs[0]['spawns']}  temp bytes {runs[0]['temp_bytes']}")
@@ -0,0 +1,104 @@
+import os
+import json
+import shutil
+import hashlib
+import traceback
+import tempfile
+
+from filelock import FileLock
+
+from render_engine import find_scene_class
+from render_profiles import DEFAULT_RENDER_PROFILE, get_profile, resolve_profile
+
+CLIP_DIR = os.environ.get(
+    "CLIP_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "visionsolve", "clips"),
+)
+VIDEO_INTRO_CLIP = os.environ.get("VIDEO_INTRO_CLIP", "")
+VIDEO_OUTRO_CLIP = os.environ.get("VIDEO_OUTRO_CLIP", "credits")
+
+CLIPS = {
+    "credits": '''from manim import *
+
+class Credits(Scene):
+    def construct(self):
+        credit = Tex("Generated by Vision Solve AI")
+        self.play(FadeIn(credit))
+        self.wait(1.5)
+        self.play(FadeOut(credit))
+''',
+    "title_card": '''from manim import *
+
+class TitleCard(Scene):
+    def construct(self):
+        title = Tex("Vision Solve AI").scale(1.5)
+        self.play(Write(title))
+        self.wait(1)
+        self.play(FadeOut(title))
+''',
+}
+
+
+def _clip_paths(name, profile):
+    # Code and encoder settings key the clip, so editing either re-renders it once.
+    profile = resolve_profile(profile)
+    fingerprint = CLIPS[name] + json.dumps(get_profile(profile), sort_keys=True)
+    digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:12]
+    stem = os.path.join(CLIP_DIR, f"{name}_{profile}_{digest}")
+    return f"{stem}.mp4", f"{stem}.json"
+
+
+def _render_clip(name, profile, video_path, info_path):
+    from render_pool import get_render_pool
+
+    code = CLIPS[name]
+    scene_class = find_scene_class(code)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        script_path = os.path.join(temp_dir, f"clip_{name}.py")
+        with open(script_path, "w", encoding="utf-8") as f:
+            f.write(code)
+        output_path = os.path.join(temp_dir, f"{name}.mp4")
+        result = get_render_pool().render(script_path, scene_class, output_path,
+                                          os.path.join(temp_dir, "media"), profile)
+
+        info = {
+            'duration': result['duration'],
+            'frame_count': result['frame_count'],
+            'frame_rate': result['frame_rate'],
+        }
+        # The scratch dir can be on another filesystem than CLIP_DIR (a tmpfs
+        # or a mounted cache), where os.replace fails with EXDEV.
+        shutil.move(result['path'], f"{video_path}.tmp")
+        os.replace(f"{video_path}.tmp", video_path)
+    with open(info_path, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    print(f"Rendered {name} clip for the {profile} profile in {result['timings']['total']:.1f}s")
+
+
+def get_clip(name, profile=DEFAULT_RENDER_PROFILE):
+    if name not in CLIPS:
+        print(f"Unknown clip: {name}")
+        return None
+
+    os.makedirs(CLIP_DIR, exist_ok=True)
+    video_path, info_path = _clip_paths(name, profile)
+    try:
+        with FileLock(f"{video_path}.lock"):
+            if not (os.path.exists(video_path) and os.path.exists(info_path)):
+                _render_clip(name, profile, video_path, info_path)
+            with open(info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+    except Exception as e:
+        # The generator no longer writes its own credits, so a missing clip
+        # is a visible regression: log the whole failure, not just the message.
+        print(f"Error preparing {name} clip, the video will be spliced without it: {e}")
+        traceback.print_exc()
+        return None
+
+    return {'path': video_path, 'clip': name, **info}
+
+
+def get_clips(profile=DEFAULT_RENDER_PROFILE, intro=VIDEO_INTRO_CLIP, outro=VIDEO_OUTRO_CLIP):
+    intro_clip = get_clip(intro, profile) if intro else None
+    outro_clip = get_clip(outro, profile) if outro else None
+    return intro_clip, outro_clip
@@ -2,8 +2,9 @@ import os
 import fitz  
 import re
 from test_generate_video import generate_educational_video  
+from render_profiles import DEFAULT_RENDER_PROFILE
 
-def generate_latex_from_pdf(pdf_path, output_dir="output"):
+def generate_latex_from_pdf(pdf_path, output_dir="output", profile=DEFAULT_RENDER_PROFILE):
     
     os.makedirs(output_dir, exist_ok=True)
     
@@ -48,7 +49,7 @@ def generate_latex_from_pdf(pdf_path, output_dir="output"):
     with open(tex_path, "r", encoding="utf-8") as f:
         latex_content = f.read()
     
-    video_path = generate_educational_video(latex_content)
+    video_path = generate_educational_video(latex_content, profile=profile)
 
     print(f"Video saved as {video_path}")
 
@@ -0,0 +1,141 @@
+import os
+import re
+import math
+import time
+import uuid
+import shutil
+import threading
+import subprocess
+
+from scene_writers import RENDER_KEYFRAME_INTERVAL
+
+HLS_SEGMENT_TIME = int(os.environ.get("HLS_SEGMENT_TIME", "4"))
+# Segments are cut on keyframes with stream copy; the render forces one every
+# RENDER_KEYFRAME_INTERVAL seconds, so a segment overruns by at most that.
+HLS_TARGET_DURATION = int(os.environ.get(
+    "HLS_TARGET_DURATION", str(math.ceil(HLS_SEGMENT_TIME + RENDER_KEYFRAME_INTERVAL))))
+# Seconds a stream stays on disk after it finishes (or last changed); players
+# have switched to the published MP4 by then.
+HLS_STREAM_RETENTION = int(os.environ.get("HLS_STREAM_RETENTION", "900"))
+
+
+def prune_streams(streams_dir, max_age=HLS_STREAM_RETENTION):
+    # Catches streams whose removal timer died with the process.
+    if not os.path.isdir(streams_dir):
+        return 0
+    now = time.time()
+    removed = 0
+    for name in os.listdir(streams_dir):
+        stream_dir = os.path.join(streams_dir, name)
+        try:
+            age = now - os.path.getmtime(os.path.join(stream_dir, "index.m3u8"))
+        except OSError:
+            age = now - os.path.getmtime(stream_dir) if os.path.isdir(stream_dir) else 0
+        if age > max_age:
+            shutil.rmtree(stream_dir, ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"Removed {removed} old streams from {streams_dir}")
+    return removed
+
+
+class HLSStream:
+
+    def __init__(self, stream_dir):
+        self.stream_dir = stream_dir
+        os.makedirs(stream_dir, exist_ok=True)
+        self.playlist_path = os.path.join(stream_dir, "index.m3u8")
+        self.segments = []
+        self.offset = 0.0
+        self.sections = 0
+        self.finished = False
+        self._lock = threading.Lock()
+        self._write_playlist()
+
+    def _write_playlist(self):
+        # Never advertise less than the longest segment (a clip cached before
+        # keyframes were forced can overrun); players stall on a target that lies.
+        target = max([HLS_TARGET_DURATION] + [math.ceil(segment['duration']) for segment in self.segments])
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{target}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for segment in self.segments:
+            if segment['discontinuity']:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f"#EXTINF:{segment['duration']:.3f},")
+            lines.append(segment['file'])
+        if self.finished:
+            lines.append("#EXT-X-ENDLIST")
+
+        tmp_path = f"{self.playlist_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.playlist_path)
+
+    def add_section(self, video_path, duration=None, audio_path=None, audio_start=0.0, silent=False):
+        # audio_start: stream time at which the narration track begins (after
+        # the intro clip). silent: give the section an empty audio track.
+        with self._lock:
+            index = self.sections
+            section_playlist = os.path.join(self.stream_dir, f"section_{index:03d}.m3u8")
+
+            cmd = ["ffmpeg", "-y", "-i", video_path]
+            if audio_path and duration:
+                # The narration covers the whole lesson; each section takes its
+                # own stretch, padded with silence so every segment has audio.
+                start = max(0.0, self.offset - audio_start)
+                cmd += ["-ss", f"{start:.3f}", "-t", f"{duration:.3f}", "-i", audio_path,
+                        "-map", "0:v", "-map", "1:a", "-af", "apad", "-t", f"{duration:.3f}", "-c:a", "aac"]
+            elif silent and duration:
+                cmd += ["-f", "lavfi", "-t", f"{duration:.3f}", "-i", "anullsrc=r=44100:cl=stereo",
+                        "-map", "0:v", "-map", "1:a", "-t", f"{duration:.3f}", "-c:a", "aac"]
+            cmd += [
+                "-c:v", "copy",
+                "-output_ts_offset", f"{self.offset:.3f}",
+                "-f", "hls",
+                "-hls_time", str(HLS_SEGMENT_TIME),
+                "-hls_list_size", "0",
+                "-hls_segment_type", "mpegts",
+                "-hls_segment_filename", os.path.join(self.stream_dir, f"seg_{index:03d}_%03d.ts"),
+                section_playlist,
+            ]
+            try:
+                subprocess.run(cmd, check=True, capture_output=True)
+            except subprocess.SubprocessError as e:
+                print(f"Error segmenting section {index} for streaming: {e}")
+                return False
+
+            with open(section_playlist, 'r', encoding='utf-8') as f:
+                entries = re.findall(r'#EXTINF:([\d.]+),\s*\n(\S+)', f.read())
+            os.remove(section_playlist)
+
+            for i, (segment_duration, segment_file) in enumerate(entries):
+                self.segments.append({
+                    'file': segment_file,
+                    'duration': float(segment_duration),
+                    # Every section is a separately encoded stream.
+                    'discontinuity': index > 0 and i == 0,
+                })
+
+            self.sections += 1
+            if duration is None:
+                duration = sum(float(segment_duration) for segment_duration, _ in entries)
+            self.offset += duration
+            self._write_playlist()
+            print(f"Streaming section {index}: {len(entries)} segments, {self.offset:.1f}s available")
+            return True
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+            self._write_playlist()
+        timer = threading.Timer(HLS_STREAM_RETENTION, self.remove)
+        timer.daemon = True
+        timer.start()
+
+    def remove(self):
+        shutil.rmtree(self.stream_dir, ignore_errors=True)
@@ -91,7 +91,7 @@ def generate_code(prompt):
     5. Use MathTex/Tex for all text to ensure proper chemical and mathematical notation
     6. Clear the screen before new topics and when it becomes crowded
     7. Ensure proper spacing between elements and maintain screen margins
-    8. Should have 'Generated by Vision Solve AI' at the end of the video
+    8. Do NOT add credits, logos or a closing 'Generated by ...' title; standard intro and credit clips are added automatically
     Tips: for safer side clear the screen as many times as you can to prevent overlapping elements
     
     Return ONLY the Python code without any explanations, markdown formatting, or code blocks.
@@ -160,6 +160,28 @@ def validate_code(code, language):
     response = model.generate_content(validation_prompt)
     return clean_code_response(response.text)
 
+def repair_code(code, error_traceback):
+    repair_prompt = f"""
+    The following Manim Python code fails when the scene is executed:
+
+    {code}
+
+    This is the error raised while running the scene:
+
+    {error_traceback}
+
+    Fix the code so the scene runs without errors:
+    - Fix the cause of the error shown above, and any identical mistakes elsewhere in the code
+    - Keep the scene class name, the content, the layout and the pacing unchanged
+    - Do not remove self.clear() calls or self.wait() calls
+
+    Return ONLY the corrected code without any explanations, markdown formatting, or code blocks.
+    Do not include ```python at the start or ``` at the end.
+    """
+    
+    response = model.generate_content(repair_prompt)
+    return clean_code_response(response.text)
+
 def clean_code_response(text):
     text = re.sub(r'^```\w*\s*', '', text)
     text = re.sub(r'\s*```$', '', text)
@@ -0,0 +1,107 @@
+import subprocess
+
+from render_profiles import DEFAULT_RENDER_PROFILE, get_profile
+
+
+def _atempo_chain(tempo):
+    # atempo only accepts 0.5-2.0 per instance.
+    filters = []
+    while tempo > 2.0:
+        filters.append("atempo=2.0")
+        tempo /= 2.0
+    while tempo < 0.5:
+        filters.append("atempo=0.5")
+        tempo /= 0.5
+    filters.append(f"atempo={tempo:.6f}")
+    return filters
+
+
+class MediaGraph:
+    # Describes how one output is built from a rendered video and a narration
+    # track (speed change, audio loop/tempo, mux) and runs it as a single
+    # ffmpeg process. The video is stream-copied unless its speed changes, so
+    # it is decoded and encoded at most once.
+
+    def __init__(self, video_path, profile=DEFAULT_RENDER_PROFILE):
+        self.video_path = str(video_path)
+        self.profile = profile
+        self.video_speed = 1.0
+        self.audio_path = None
+        self.audio_loop = False
+        self.audio_tempo = 1.0
+        self.audio_delay = 0.0
+        self.audio_bitrate = "128k"
+        self.duration = None
+
+    def speed(self, factor):
+        # factor < 1 slows the video down (0.75 -> 1.33x longer).
+        self.video_speed = factor
+        return self
+
+    def audio(self, audio_path, bitrate="128k", loop=False, tempo=1.0, delay=0.0):
+        # delay: seconds of silence before the narration starts.
+        self.audio_path = str(audio_path)
+        self.audio_bitrate = bitrate
+        self.audio_loop = loop
+        self.audio_tempo = tempo
+        self.audio_delay = delay
+        return self
+
+    def trim(self, duration):
+        self.duration = duration
+        return self
+
+    def command(self, output_path):
+        cmd = ["ffmpeg", "-y", "-i", self.video_path]
+        if self.audio_path:
+            if self.audio_loop:
+                cmd += ["-stream_loop", "-1"]
+            cmd += ["-i", self.audio_path]
+
+        filters = []
+        maps = []
+        if self.video_speed != 1.0:
+            filters.append(f"[0:v]setpts={1.0 / self.video_speed:.6f}*PTS[v]")
+            maps += ["-map", "[v]"]
+        else:
+            maps += ["-map", "0:v"]
+
+        if self.audio_path:
+            audio_filters = _atempo_chain(self.audio_tempo) if self.audio_tempo != 1.0 else []
+            if self.audio_delay:
+                audio_filters.append(f"adelay=delays={int(round(self.audio_delay * 1000))}:all=1")
+            if audio_filters:
+                filters.append("[1:a]" + ",".join(audio_filters) + "[a]")
+                maps += ["-map", "[a]"]
+            else:
+                maps += ["-map", "1:a"]
+
+        if filters:
+            cmd += ["-filter_complex", ";".join(filters)]
+        cmd += maps
+
+        if self.video_speed != 1.0:
+            settings = get_profile(self.profile)
+            cmd += ["-c:v", "libx264", "-preset", settings['preset'], "-crf", str(settings['crf']),
+                    "-pix_fmt", "yuv420p"]
+        else:
+            cmd += ["-c:v", "copy"]
+
+        if self.audio_path:
+            cmd += ["-c:a", "aac", "-b:a", self.audio_bitrate]
+            if self.duration:
+                cmd += ["-t", f"{self.duration:.3f}"]
+            else:
+                cmd += ["-shortest"]
+        elif self.duration:
+            cmd += ["-t", f"{self.duration:.3f}"]
+
+        return cmd + [str(output_path)]
+
+    def run(self, output_path):
+        try:
+            subprocess.run(self.command(output_path), check=True)
+            return True
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"Error running ffmpeg graph for {output_path}: {e}")
+            return False
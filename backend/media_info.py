@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import threading
+import subprocess
+from collections import OrderedDict
+
+import av
+
+MEDIA_INFO_CACHE_SIZE = int(os.environ.get("MEDIA_INFO_CACHE_SIZE", "512"))
+
+_cache = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'probe_time': 0.0}
+_lock = threading.Lock()
+
+
+def _frame_rate(rate):
+    if not rate:
+        return None
+    if isinstance(rate, str):
+        num, _, den = rate.partition("/")
+        return float(num) / float(den) if den and float(den) else float(num)
+    return float(rate)
+
+
+def _summarize(duration, format_name, bit_rate, streams):
+    info = {'duration': duration, 'format': format_name, 'bit_rate': bit_rate, 'video': None, 'audio': None}
+    for stream in streams:
+        kind = stream['type']
+        if kind in ('video', 'audio') and info[kind] is None:
+            info[kind] = stream
+    if info['duration'] is None:
+        durations = [s['duration'] for s in streams if s.get('duration')]
+        info['duration'] = max(durations) if durations else None
+    return info
+
+
+def _probe_av(path):
+    # Opening the container only reads headers (and the index for mp4),
+    # nothing is decoded.
+    with av.open(path) as container:
+        streams = []
+        for stream in container.streams:
+            if stream.type not in ('video', 'audio'):
+                continue
+            entry = {
+                'type': stream.type,
+                'codec': stream.codec_context.name,
+                'duration': float(stream.duration * stream.time_base) if stream.duration and stream.time_base else None,
+            }
+            if stream.type == 'video':
+                entry.update(width=stream.codec_context.width, height=stream.codec_context.height,
+                             frame_rate=_frame_rate(stream.average_rate), frames=stream.frames or None)
+            else:
+                entry.update(sample_rate=stream.codec_context.sample_rate, channels=stream.codec_context.channels)
+            streams.append(entry)
+        duration = container.duration / av.time_base if container.duration else None
+        return _summarize(duration, container.format.name, container.bit_rate or None, streams)
+
+
+def _probe_ffprobe(path):
+    cmd = ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    data = json.loads(result.stdout)
+
+    streams = []
+    for stream in data.get('streams', []):
+        kind = stream.get('codec_type')
+        if kind not in ('video', 'audio'):
+            continue
+        entry = {
+            'type': kind,
+            'codec': stream.get('codec_name'),
+            'duration': float(stream['duration']) if stream.get('duration') else None,
+        }
+        if kind == 'video':
+            entry.update(width=stream.get('width'), height=stream.get('height'),
+                         frame_rate=_frame_rate(stream.get('avg_frame_rate')),
+                         frames=int(stream['nb_frames']) if stream.get('nb_frames') else None)
+        else:
+            entry.update(sample_rate=int(stream.get('sample_rate') or 0) or None, channels=stream.get('channels'))
+        streams.append(entry)
+
+    fmt = data.get('format', {})
+    duration = float(fmt['duration']) if fmt.get('duration') else None
+    bit_rate = int(fmt['bit_rate']) if fmt.get('bit_rate') else None
+    return _summarize(duration, fmt.get('format_name'), bit_rate, streams)
+
+
+def _probe(path):
+    try:
+        return _probe_av(path)
+    except Exception as e:
+        print(f"PyAV could not read {path} ({e}), trying ffprobe")
+    try:
+        return _probe_ffprobe(path)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        print(f"Could not probe {path}: {e}")
+        return None
+
+
+def media_info(path):
+    path = os.path.abspath(str(path))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # A rewritten file gets a new mtime/size and so a new entry.
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        info = _cache.get(key)
+        if info is not None:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return info
+
+    start = time.perf_counter()
+    info = _probe(path)
+    elapsed = time.perf_counter() - start
+
+    with _lock:
+        _stats['misses'] += 1
+        _stats['probe_time'] += elapsed
+        if info is not None:
+            _cache[key] = info
+            while len(_cache) > MEDIA_INFO_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return info
+
+
+def media_duration(path):
+    info = media_info(path)
+    return info['duration'] if info else None
+
+
+def media_info_stats():
+    with _lock:
+        return dict(_stats, entries=len(_cache))
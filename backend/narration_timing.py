@@ -0,0 +1,299 @@
+import os
+import ast
+import shutil
+
+from media_info import media_duration
+from render_engine import clean_manim_code, find_scene_class
+from section_renderer import find_construct, split_construct
+from sync_audio_video import select_sync_points
+from tts_engine import get_speech_synthesizer
+
+# Synthesize [SYNC:] narration before rendering and stretch/shrink each
+# self.clear() section to the measured speech instead of fixing the timing
+# up afterwards (looping audio, slowing the whole video down).
+# Ships disabled (see README): the synthesis then sits in front of the
+# render instead of running alongside it. Set NARRATION_FIRST=1 to enable.
+NARRATION_FIRST = os.environ.get("NARRATION_FIRST", "0") == "1"
+# Breathing room after each spoken segment.
+NARRATION_GAP = 0.4
+# Shrinking a section never takes a wait below this or speeds its
+# animations up by more than this factor.
+MIN_WAIT = 0.5
+MIN_RUN_TIME_SCALE = 0.6
+DEFAULT_RUN_TIME = 1.0
+# Write() without a run_time takes 1s for fewer than 15 sub-paths and 2s
+# otherwise; glyphs of the literal text stand in for the sub-paths.
+WRITE_SHORT_LENGTH = 15
+WRITE_LONG_RUN_TIME = 2.0
+TEXT_CLASSES = {"Text", "Tex", "MathTex", "MarkupText", "Title", "Paragraph"}
+
+
+def _self_call(stmt, methods=("play", "wait")):
+    if (
+        isinstance(stmt, ast.Expr)
+        and isinstance(stmt.value, ast.Call)
+        and isinstance(stmt.value.func, ast.Attribute)
+        and stmt.value.func.attr in methods
+        and isinstance(stmt.value.func.value, ast.Name)
+        and stmt.value.func.value.id == "self"
+    ):
+        return stmt.value
+    return None
+
+
+def _number(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    return None
+
+
+def _duration_arg(call):
+    # The node holding the seconds of a wait (first arg) or play (run_time=).
+    if call.func.attr == "wait":
+        if call.args:
+            return call.args[0]
+        for keyword in call.keywords:
+            if keyword.arg == "duration":
+                return keyword.value
+        return None
+    for keyword in call.keywords:
+        if keyword.arg == "run_time":
+            return keyword.value
+    return None
+
+
+def _glyphs(node):
+    # Text("...").scale(0.8) -> glyphs in its literal strings, else None.
+    while isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        node = node.func.value
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in TEXT_CLASSES):
+        return None
+    strings = [arg.value for arg in node.args if isinstance(arg, ast.Constant) and isinstance(arg.value, str)]
+    if not strings or len(strings) != len(node.args):
+        return None
+    return sum(len("".join(string.split())) for string in strings)
+
+
+def _text_lengths(tree):
+    # name -> glyphs for every `name = Text("...")` in the scene.
+    lengths = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            glyphs = _glyphs(node.value)
+            if glyphs is not None:
+                lengths[node.targets[0].id] = glyphs
+    return lengths
+
+
+def _animation_seconds(node, lengths):
+    # An animation's own run_time= or its class default; None when the
+    # run_time isn't a literal.
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+        return DEFAULT_RUN_TIME
+    for keyword in node.keywords:
+        if keyword.arg == "run_time":
+            return _number(keyword.value)
+    if node.func.id == "Write":
+        glyphs = None
+        if node.args:
+            target = node.args[0]
+            glyphs = lengths.get(target.id) if isinstance(target, ast.Name) else _glyphs(target)
+        if glyphs is None or glyphs >= WRITE_SHORT_LENGTH:
+            return WRITE_LONG_RUN_TIME
+    return DEFAULT_RUN_TIME
+
+
+def _literal(call, lengths=None):
+    node = _duration_arg(call)
+    if node is not None:
+        return _number(node) is not None
+    if call.func.attr == "wait":
+        return True
+    return all(_animation_seconds(arg, lengths or {}) is not None for arg in call.args)
+
+
+def _call_seconds(call, lengths=None):
+    node = _duration_arg(call)
+    if node is not None:
+        seconds = _number(node)
+        return DEFAULT_RUN_TIME if seconds is None else seconds
+    if call.func.attr == "wait":
+        return DEFAULT_RUN_TIME
+    # Without its own run_time, play() lasts as long as its longest animation.
+    seconds = [_animation_seconds(arg, lengths or {}) for arg in call.args]
+    return max([DEFAULT_RUN_TIME if value is None else value for value in seconds] or [DEFAULT_RUN_TIME])
+
+
+def _iterations(loop):
+    # for ... in range(<constants>) is the only loop whose length is known.
+    it = loop.iter
+    if isinstance(it, ast.Call) and isinstance(it.func, ast.Name) and it.func.id == "range" and not it.keywords:
+        bounds = [_number(arg) for arg in it.args]
+        if bounds and None not in bounds:
+            return len(range(*(int(b) for b in bounds)))
+    if isinstance(it, (ast.List, ast.Tuple)):
+        return len(it.elts)
+    return 1
+
+
+def estimate_seconds(stmts, lengths=None):
+    total = 0.0
+    for stmt in stmts:
+        call = _self_call(stmt)
+        if call:
+            total += _call_seconds(call, lengths)
+        elif isinstance(stmt, ast.For):
+            total += _iterations(stmt) * estimate_seconds(stmt.body, lengths)
+        elif isinstance(stmt, ast.If):
+            total += max(estimate_seconds(stmt.body, lengths), estimate_seconds(stmt.orelse, lengths))
+        elif isinstance(stmt, (ast.With, ast.While, ast.Try)):
+            total += estimate_seconds(stmt.body, lengths)
+    return total
+
+
+def _set_seconds(call, seconds):
+    seconds = ast.Constant(round(seconds, 2))
+    if call.func.attr == "wait":
+        if call.args:
+            call.args[0] = seconds
+            return
+        for keyword in call.keywords:
+            if keyword.arg == "duration":
+                keyword.value = seconds
+                return
+        call.args.append(seconds)
+        return
+    for keyword in call.keywords:
+        if keyword.arg == "run_time":
+            keyword.value = seconds
+            return
+    call.keywords.append(ast.keyword(arg="run_time", value=seconds))
+
+
+def _stretch(section, seconds):
+    last = _self_call(section[-1], ("wait",))
+    if last is not None and _literal(last):
+        _set_seconds(last, _call_seconds(last) + seconds)
+        return
+    wait = ast.Expr(ast.Call(
+        func=ast.Attribute(value=ast.Name(id="self", ctx=ast.Load()), attr="wait", ctx=ast.Load()),
+        args=[ast.Constant(round(seconds, 2))], keywords=[],
+    ))
+    section.append(wait)
+
+
+def _shrink(section, seconds, lengths=None):
+    # Waits go first, then the animations play faster. Only top-level calls
+    # with a literal (or default) duration are touched.
+    calls = []
+    for stmt in section:
+        call = _self_call(stmt)
+        if call is not None and _literal(call, lengths):
+            calls.append(call)
+
+    for call in calls:
+        if seconds <= 0:
+            return
+        if call.func.attr == "wait":
+            current = _call_seconds(call)
+            cut = min(seconds, max(0.0, current - MIN_WAIT))
+            if cut > 0:
+                _set_seconds(call, current - cut)
+                seconds -= cut
+
+    plays = [call for call in calls if call.func.attr == "play"]
+    play_time = sum(_call_seconds(call, lengths) for call in plays)
+    if seconds <= 0 or not play_time:
+        return
+    scale = max(MIN_RUN_TIME_SCALE, 1.0 - seconds / play_time)
+    for call in plays:
+        _set_seconds(call, _call_seconds(call, lengths) * scale)
+
+
+def _assign_sections(points, sections, lengths=None):
+    # One segment per section when the counts line up; otherwise each segment
+    # goes to the section playing at its [SYNC:] timestamp.
+    if len(points) == len(sections):
+        return list(range(len(sections)))
+    starts = []
+    elapsed = 0.0
+    for section in sections:
+        starts.append(elapsed)
+        elapsed += estimate_seconds(section, lengths)
+    assigned = []
+    for point in points:
+        index = max([i for i, start in enumerate(starts) if start <= point['timestamp']] or [0])
+        assigned.append(index)
+    return assigned
+
+
+def _lay_out_section(segments):
+    # Offsets from the section's start: the first segment opens the section,
+    # the rest keep their [SYNC:] spacing from it without overlapping. Also
+    # returns when the last one (plus its gap) ends.
+    offsets = []
+    end = 0.0
+    for segment in segments:
+        offset = max(segment['timestamp'] - segments[0]['timestamp'], end)
+        offsets.append(offset)
+        end = offset + segment['duration'] + NARRATION_GAP
+    return offsets, end
+
+
+def fit_scene_to_narration(manim_code, narration_script, output_dir, voice_quality='high'):
+    # Returns (code, audio_segments) with the scene's waits/run_times fitted
+    # to the synthesized narration, or None when the scene can't be analysed.
+    manim_code = clean_manim_code(manim_code)
+    scene_class = find_scene_class(manim_code)
+    try:
+        tree = ast.parse(manim_code)
+    except SyntaxError:
+        return None
+    construct = find_construct(tree, scene_class) if scene_class else None
+    if construct is None:
+        return None
+
+    points = select_sync_points(narration_script)
+    clips = get_speech_synthesizer().synthesize_many([point['text'] for point in points], voice_quality)
+    segments = []
+    for i, (point, clip) in enumerate(zip(points, clips)):
+        duration = media_duration(clip) if clip else None
+        if not duration:
+            continue
+        segment_file = os.path.join(output_dir, f"segment_{i:03d}{os.path.splitext(clip)[1]}")
+        shutil.copyfile(clip, segment_file)
+        segments.append(dict(point, file=segment_file, duration=duration))
+    if not segments:
+        return None
+
+    sections = split_construct(construct)
+    lengths = _text_lengths(tree)
+    assigned = _assign_sections(segments, sections, lengths)
+    offsets = [0.0] * len(segments)
+    for index, section in enumerate(sections):
+        spoken = [k for k, i in enumerate(assigned) if i == index]
+        if not spoken:
+            continue
+        section_offsets, target = _lay_out_section([segments[k] for k in spoken])
+        for k, offset in zip(spoken, section_offsets):
+            offsets[k] = offset
+        current = estimate_seconds(section, lengths)
+        if target > current:
+            _stretch(section, target - current)
+        elif target < current:
+            _shrink(section, current - target, lengths)
+        print(f"Section {index}: {current:.1f}s of animation for {target:.1f}s of narration, "
+              f"now {estimate_seconds(section, lengths):.1f}s")
+
+    construct.body = [stmt for section in sections for stmt in section]
+
+    # Segments move with the (new) start of their section.
+    starts = []
+    elapsed = 0.0
+    for section in sections:
+        starts.append(elapsed)
+        elapsed += estimate_seconds(section, lengths)
+    for k, index in enumerate(assigned):
+        segments[k]['timestamp'] = starts[index] + offsets[k]
+
+    return ast.unparse(tree), segments
@@ -0,0 +1,65 @@
+import os
+import time
+import tempfile
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from render_pool import get_render_pool
+from render_engine import RenderError, clean_manim_code, find_scene_class
+
+MAX_REPAIR_ATTEMPTS = int(os.environ.get("MAX_REPAIR_ATTEMPTS", "2"))
+PREFLIGHT_TIMEOUT = int(os.environ.get("PREFLIGHT_TIMEOUT", "120"))
+# How long to wait for a timed-out preflight's worker to be killed and reaped.
+PREFLIGHT_KILL_WAIT = 10
+
+
+def preflight(manim_code):
+    scene_class = find_scene_class(manim_code)
+    if not scene_class:
+        return "Could not detect a Scene class in the generated code."
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        script_path = os.path.join(temp_dir, "manim_preflight.py")
+        with open(script_path, "w", encoding='utf-8') as f:
+            f.write(manim_code)
+
+        pool = get_render_pool()
+        future = pool.submit(script_path, scene_class, None, temp_dir, "preview", mode="preflight")
+        try:
+            future.result(PREFLIGHT_TIMEOUT)
+        except RenderError as e:
+            return e.details or str(e)
+        except FutureTimeoutError:
+            # Stop the scene before its temp dir is removed from under it.
+            pool.cancel(future, f"preflight exceeded {PREFLIGHT_TIMEOUT}s")
+            try:
+                future.exception(PREFLIGHT_KILL_WAIT)
+            except FutureTimeoutError:
+                print(f"Timed-out preflight of {scene_class} is still running")
+            return f"Scene did not finish within {PREFLIGHT_TIMEOUT}s with animations skipped."
+    return None
+
+
+def preflight_and_repair(manim_code, max_attempts=MAX_REPAIR_ATTEMPTS):
+    from manim_code_generater import repair_code
+
+    manim_code = clean_manim_code(manim_code)
+    for attempt in range(max_attempts + 1):
+        start = time.time()
+        error = preflight(manim_code)
+        elapsed = time.time() - start
+
+        if error is None:
+            print(f"Pre-flight passed in {elapsed:.1f}s")
+            return manim_code
+
+        print(f"Pre-flight failed in {elapsed:.1f}s:")
+        print(error)
+
+        if attempt == max_attempts:
+            break
+
+        print(f"\nAsking for a repair (attempt {attempt + 1}/{max_attempts})...")
+        manim_code = clean_manim_code(repair_code(manim_code, error[-4000:]))
+
+    print(f"Giving up after {max_attempts} repair attempts")
+    return None
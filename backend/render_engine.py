@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import time
+import tempfile
+import importlib.util
+
+from tex_cache import tex_cache_config, snapshot_stats, stats_delta, prune_tex_cache
+from render_profiles import DEFAULT_RENDER_PROFILE, get_profile
+
+# Bump when the timeline JSON read by the client's vector player changes shape.
+VECTOR_FORMAT_VERSION = 1
+
+
+class RenderError(Exception):
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details
+
+
+def clean_manim_code(code):
+    code = re.sub(r'^```python\s*', '', code, flags=re.MULTILINE)
+    code = re.sub(r'^```\s*$', '', code, flags=re.MULTILINE)
+
+    if "from manim import *" not in code and "import manim" not in code:
+        code = "from manim import *\n\n" + code
+    code = re.sub(r'^import \*\s*$', 'from manim import *', code, flags=re.MULTILINE)
+
+    return code
+
+
+def find_scene_class(code):
+    match = re.search(r'class\s+(\w+)\s*\(\s*Scene\s*\)', code)
+    return match.group(1) if match else None
+
+
+def profile_config(profile):
+    # tempconfig ignores manim's derived "quality" key, so the pixel size and
+    # frame rate are set directly.
+    settings = get_profile(profile)
+    return {
+        "pixel_height": settings["pixel_height"],
+        "pixel_width": settings["pixel_width"],
+        "frame_rate": settings["frame_rate"],
+    }
+
+
+def load_scene_class(script_path, scene_class, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, scene_class)
+
+
+def preflight_in_process(script_path, scene_class, media_dir, profile="preview"):
+    from manim import tempconfig
+
+    scene_cls = load_scene_class(script_path, scene_class, "manim_preflight")
+    options = {
+        "input_file": script_path,
+        "media_dir": media_dir,
+        "progress_bar": "none",
+        "dry_run": True,
+    }
+    options.update(profile_config(profile))
+    options.update(tex_cache_config())
+
+    # Animations are compiled and jumped to their end state, no frames are
+    # rasterized or encoded.
+    start = time.perf_counter()
+    with tempconfig(options):
+        scene = scene_cls(skip_animations=True)
+        scene.render()
+    return {'path': None, 'timings': {'preflight': time.perf_counter() - start}}
+
+
+def render_in_process(script_path, scene_class, output_path, media_dir, profile=DEFAULT_RENDER_PROFILE):
+    from manim import tempconfig
+    from scene_writers import TimelineRenderer, profile_writer_class
+
+    start = time.perf_counter()
+    output_dir, output_file = os.path.split(os.path.abspath(output_path))
+    output_name = os.path.splitext(output_file)[0]
+    scene_cls = load_scene_class(script_path, scene_class, f"manim_script_{output_name}")
+    loaded = time.perf_counter()
+
+    options = {
+        "input_file": script_path,
+        "output_file": output_name,
+        "media_dir": media_dir,
+        "video_dir": output_dir,
+        "partial_movie_dir": os.path.join(media_dir, "partial_movie_files", "{scene_name}"),
+        "progress_bar": "none",
+    }
+    options.update(profile_config(profile))
+    options.update(tex_cache_config())
+
+    tex_before = snapshot_stats()
+    with tempconfig(options):
+        scene = scene_cls(renderer=TimelineRenderer(file_writer_class=profile_writer_class(profile)))
+        scene.render()
+        movie_path = str(scene.renderer.file_writer.movie_file_path)
+        duration = scene.renderer.time
+        events = scene.renderer.events
+        frame_rate = options["frame_rate"]
+        encoded_frames = scene.renderer.file_writer.encoded_frames
+    rendered = time.perf_counter()
+
+    # Held frames are encoded once, so the file has fewer frames than the timeline.
+    frame_count = int(round(duration * frame_rate))
+    if not os.path.exists(movie_path):
+        # A scene that never plays or waits writes no movie file.
+        movie_path = None
+        frame_count = 0
+
+    tex_stats = stats_delta(tex_before)
+    print(f"Tex cache for {output_name}: {tex_stats['lookups']} expressions, "
+          f"{tex_stats['compiles']} compiled, {tex_stats['latex_runs_saved']} LaTeX runs saved")
+    prune_tex_cache()
+
+    return {
+        'path': movie_path,
+        'duration': duration,
+        'frame_count': frame_count,
+        'encoded_frames': encoded_frames,
+        'frame_rate': frame_rate,
+        'events': events,
+        'tex': tex_stats,
+        'timings': {
+            'load': loaded - start,
+            'render': rendered - loaded,
+            'total': time.perf_counter() - start,
+        },
+    }
+
+
+def export_vector_in_process(script_path, scene_class, output_path, media_dir):
+    from manim import tempconfig
+    from vector_export import VECTOR_SAMPLE_RATE, TimelineRecorder, VectorUnsupported, write_timeline
+
+    start = time.perf_counter()
+    output_name = os.path.splitext(os.path.basename(output_path))[0]
+    scene_cls = load_scene_class(script_path, scene_class, f"manim_vector_{output_name}")
+    loaded = time.perf_counter()
+
+    # Nothing is rasterized; the pixel size only has to keep the 16:9 frame.
+    options = {
+        "input_file": script_path,
+        "media_dir": media_dir,
+        "progress_bar": "none",
+        "dry_run": True,
+        "disable_caching": True,
+        "pixel_width": 160,
+        "pixel_height": 90,
+        "frame_rate": VECTOR_SAMPLE_RATE,
+    }
+    options.update(tex_cache_config())
+
+    with tempconfig(options):
+        renderer = TimelineRecorder()
+        scene = scene_cls(renderer=renderer)
+        try:
+            scene.render()
+        except VectorUnsupported as e:
+            print(f"{scene_class} can't be exported as vectors: {e}")
+            return {'path': None, 'reason': str(e), 'timings': {'total': time.perf_counter() - start}}
+        timeline = renderer.timeline()
+    rendered = time.perf_counter()
+
+    size_bytes = write_timeline(timeline, output_path)
+    return {
+        'path': output_path,
+        'duration': timeline['duration'],
+        'size_bytes': size_bytes,
+        'shapes': len(timeline['shapes']),
+        'keyframes': len(timeline['keyframes']),
+        'timings': {
+            'load': loaded - start,
+            'render': rendered - loaded,
+            'total': time.perf_counter() - start,
+        },
+    }
+
+
+def shift_events(events, offset):
+    shifted = []
+    for event in events:
+        event = dict(event)
+        for field in ('time', 'start', 'end'):
+            if field in event:
+                event[field] += offset
+        shifted.append(event)
+    return shifted
+
+
+def write_render_timeline(result, path):
+    # Sidecar read by audio sync in place of scanning the video for cuts.
+    timeline = {
+        'duration': result['duration'],
+        'events': [
+            {k: round(v, 3) if isinstance(v, float) else v for k, v in event.items()}
+            for event in result.get('events', [])
+        ],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(timeline, f, separators=(',', ':'))
+    return path
+
+
+def _splice_clips(body, intro_clip, outro_clip, output_path):
+    from section_renderer import concat_videos
+
+    parts = [clip for clip in (intro_clip, body, outro_clip) if clip]
+    # Clips are rendered by the same writer with the same profile, so the
+    # streams match and can be joined without re-encoding.
+    if not concat_videos([part['path'] for part in parts], output_path):
+        print("Could not splice intro/outro clips, keeping the bare render")
+        os.replace(body['path'], output_path)
+        return dict(body, path=output_path)
+
+    # The clips are cuts of their own; the lesson's events move by the intro.
+    offset = intro_clip['duration'] if intro_clip else 0.0
+    events = shift_events(body.get('events', []), offset)
+    if intro_clip:
+        events.insert(0, {'type': 'clear', 'time': offset})
+    if outro_clip:
+        events.append({'type': 'clear', 'time': offset + body['duration']})
+
+    return dict(
+        body,
+        path=output_path,
+        events=events,
+        duration=sum(part['duration'] for part in parts),
+        frame_count=sum(part['frame_count'] for part in parts),
+        body_duration=body['duration'],
+        intro_duration=intro_clip['duration'] if intro_clip else 0.0,
+    )
+
+
+def render_script(manim_code, output_path, profile=DEFAULT_RENDER_PROFILE, parallel=True, on_section=None,
+                  with_clips=True, work_dir=None):
+    from section_renderer import render_scene
+    from clip_library import get_clips
+
+    if work_dir is None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            return render_script(manim_code, output_path, profile, parallel, on_section, with_clips, temp_dir)
+
+    manim_code = clean_manim_code(manim_code)
+    scene_class = find_scene_class(manim_code)
+    if not scene_class:
+        raise RenderError("Could not detect a Scene class in the generated code", manim_code)
+    print(f"Detected scene class: {scene_class}")
+
+    intro_clip, outro_clip = get_clips(profile) if with_clips else (None, None)
+    streamed = []
+
+    def stream_part(part):
+        if on_section:
+            on_section(len(streamed), part)
+        streamed.append(part)
+
+    if intro_clip:
+        stream_part(intro_clip)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    os.makedirs(work_dir, exist_ok=True)
+    script_path = os.path.join(work_dir, "manim_script.py")
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(manim_code)
+
+    media_dir = os.path.join(work_dir, "media")
+    body_path = os.path.join(work_dir, "body.mp4") if intro_clip or outro_clip else output_path
+    result = render_scene(script_path, manim_code, scene_class, body_path, media_dir,
+                          profile=profile, parallel=parallel,
+                          on_section=(lambda i, part: stream_part(part)) if on_section else None)
+
+    if not result['path']:
+        raise RenderError(f"{scene_class} played no animations, no video was written")
+    if outro_clip:
+        stream_part(outro_clip)
+    if body_path != output_path:
+        result = _splice_clips(result, intro_clip, outro_clip, output_path)
+    result['timeline'] = write_render_timeline(result, os.path.splitext(output_path)[0] + ".timeline.json")
+
+    print(f"Rendered {result['path']}: {result['duration']:.1f}s, {result['frame_count']} frames "
+          f"({result['encoded_frames']} encoded) in {result['timings']['total']:.1f}s")
+    return result
+
+
+def export_vector(manim_code, output_path, work_dir=None):
+    # Returns None when the scene uses something the vector player can't draw
+    # (images, non-vector mobjects); callers render the MP4 instead.
+    from render_pool import get_render_pool
+
+    if work_dir is None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            return export_vector(manim_code, output_path, temp_dir)
+
+    manim_code = clean_manim_code(manim_code)
+    scene_class = find_scene_class(manim_code)
+    if not scene_class:
+        raise RenderError("Could not detect a Scene class in the generated code", manim_code)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    os.makedirs(work_dir, exist_ok=True)
+    script_path = os.path.join(work_dir, "manim_script.py")
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(manim_code)
+
+    result = get_render_pool().export_vector(script_path, scene_class, output_path, os.path.join(work_dir, "media"))
+    if not result['path']:
+        return None
+    print(f"Exported {result['path']}: {result['duration']:.1f}s, {result['keyframes']} keyframes, "
+          f"{result['shapes']} shapes, {result['size_bytes'] / 1024:.1f} KB in {result['timings']['total']:.1f}s")
+    return result
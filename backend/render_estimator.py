@@ -0,0 +1,250 @@
+import os
+import ast
+import json
+import uuid
+import threading
+
+from filelock import FileLock
+
+from render_profiles import get_profile
+
+RENDER_TIMINGS_FILE = os.environ.get(
+    "RENDER_TIMINGS_FILE",
+    os.path.join(os.path.expanduser("~"), ".cache", "visionsolve", "render_timings.json"),
+)
+RENDER_TIMINGS_MAX_SAMPLES = int(os.environ.get("RENDER_TIMINGS_MAX_SAMPLES", "500"))
+
+FEATURES = ("constant", "plays", "waits", "animated_mpx", "held_mpx", "tex", "graphs")
+
+# Seconds per unit of each feature before any timings are recorded; the fit
+# is pulled towards these so a handful of samples can't produce nonsense.
+DEFAULT_WEIGHTS = {
+    "constant": 1.5,
+    "plays": 0.15,
+    "waits": 0.05,
+    "animated_mpx": 0.014,
+    "held_mpx": 0.001,
+    "tex": 0.3,
+    "graphs": 1.0,
+}
+PRIOR_STRENGTH = 5.0
+
+TEX_CLASSES = {"MathTex", "Tex", "SingleStringMathTex", "Title", "BulletedList", "Matrix", "MathTable"}
+GRAPH_CLASSES = {
+    "Axes", "ThreeDAxes", "NumberPlane", "ComplexPlane", "PolarPlane", "NumberLine",
+    "FunctionGraph", "ParametricFunction", "ImplicitFunction", "BarChart",
+}
+GRAPH_METHODS = {"plot", "get_graph", "plot_parametric_curve", "plot_implicit_curve", "plot_polar_graph"}
+
+
+def _constant(node, default=None):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return float(node.value)
+    return default
+
+
+def _loop_count(node):
+    # for ... in range(n) / a literal list; anything else counts once.
+    if isinstance(node.iter, (ast.List, ast.Tuple, ast.Set)):
+        return len(node.iter.elts)
+    if (isinstance(node.iter, ast.Call) and isinstance(node.iter.func, ast.Name)
+            and node.iter.func.id == "range" and node.iter.args):
+        bounds = [_constant(arg) for arg in node.iter.args]
+        if None not in bounds:
+            start, stop = (0, bounds[0]) if len(bounds) == 1 else bounds[:2]
+            step = bounds[2] if len(bounds) > 2 and bounds[2] else 1
+            return max(0, int((stop - start) / step))
+    return 1
+
+
+def _count_calls(node, counts, multiplier):
+    for call in ast.walk(node):
+        if not isinstance(call, ast.Call):
+            continue
+        func = call.func
+        if isinstance(func, ast.Attribute):
+            on_self = isinstance(func.value, ast.Name) and func.value.id == "self"
+            if on_self and func.attr == "play":
+                run_time = 1.0
+                for keyword in call.keywords:
+                    if keyword.arg == "run_time":
+                        run_time = _constant(keyword.value, 1.0)
+                counts["plays"] += multiplier
+                counts["run_time"] += multiplier * run_time
+            elif on_self and func.attr == "wait":
+                duration = _constant(call.args[0], 1.0) if call.args else 1.0
+                for keyword in call.keywords:
+                    if keyword.arg == "duration":
+                        duration = _constant(keyword.value, 1.0)
+                counts["waits"] += multiplier
+                counts["wait_time"] += multiplier * duration
+            elif func.attr in GRAPH_METHODS:
+                counts["graphs"] += multiplier
+        elif isinstance(func, ast.Name):
+            if func.id in TEX_CLASSES:
+                counts["tex"] += multiplier
+            elif func.id in GRAPH_CLASSES:
+                counts["graphs"] += multiplier
+
+
+def _count_block(statements, counts, multiplier):
+    for stmt in statements:
+        if isinstance(stmt, (ast.For, ast.AsyncFor)):
+            _count_calls(stmt.iter, counts, multiplier)
+            _count_block(stmt.body, counts, multiplier * _loop_count(stmt))
+            _count_block(stmt.orelse, counts, multiplier)
+        elif isinstance(stmt, (ast.While, ast.If)):
+            _count_calls(stmt.test, counts, multiplier)
+            _count_block(stmt.body, counts, multiplier)
+            _count_block(stmt.orelse, counts, multiplier)
+        elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+            _count_block(stmt.body, counts, multiplier)
+        elif isinstance(stmt, ast.Try):
+            for block in (stmt.body, stmt.orelse, stmt.finalbody):
+                _count_block(block, counts, multiplier)
+        else:
+            _count_calls(stmt, counts, multiplier)
+
+
+def script_features(code, scene_class=None):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    construct = None
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and (scene_class is None or node.name == scene_class):
+            construct = next((item for item in node.body
+                              if isinstance(item, ast.FunctionDef) and item.name == "construct"), None)
+            if construct is not None:
+                break
+    if construct is None:
+        return None
+
+    counts = {"plays": 0, "waits": 0, "run_time": 0.0, "wait_time": 0.0, "tex": 0, "graphs": 0}
+    _count_block(construct.body, counts, 1)
+    return counts
+
+
+def feature_vector(counts, profile):
+    settings = get_profile(profile)
+    # Megapixels pushed through the rasterizer/encoder per second of video.
+    mpx_per_second = settings["pixel_width"] * settings["pixel_height"] * settings["frame_rate"] / 1e6
+    return [
+        1.0,
+        counts["plays"],
+        counts["waits"],
+        counts["run_time"] * mpx_per_second,
+        counts["wait_time"] * mpx_per_second,
+        counts["tex"],
+        counts["graphs"],
+    ]
+
+
+def _solve(matrix, vector):
+    # Gaussian elimination with partial pivoting; the system is tiny.
+    n = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(n):
+            if r != col:
+                factor = rows[r][col] / rows[col][col]
+                for c in range(col, n + 1):
+                    rows[r][c] -= factor * rows[col][c]
+    return [rows[i][n] / rows[i][i] for i in range(n)]
+
+
+class RenderEstimator:
+
+    def __init__(self, timings_file=RENDER_TIMINGS_FILE, max_samples=RENDER_TIMINGS_MAX_SAMPLES):
+        self.timings_file = timings_file
+        self.max_samples = max_samples
+        os.makedirs(os.path.dirname(os.path.abspath(timings_file)), exist_ok=True)
+        self._file_lock = FileLock(timings_file + ".lock")
+        self._lock = threading.Lock()
+        self.weights = [DEFAULT_WEIGHTS[name] for name in FEATURES]
+        self.samples = self._load_samples()
+        self._fit()
+
+    def _load_samples(self):
+        try:
+            with open(self.timings_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def _save_samples(self):
+        tmp_path = f"{self.timings_file}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.samples, f)
+        os.replace(tmp_path, self.timings_file)
+
+    def _fit(self):
+        # Ridge regression towards the default weights:
+        # (X'X + kI) w = X'y + k w0
+        n = len(FEATURES)
+        prior = [DEFAULT_WEIGHTS[name] for name in FEATURES]
+        matrix = [[PRIOR_STRENGTH if i == j else 0.0 for j in range(n)] for i in range(n)]
+        vector = [PRIOR_STRENGTH * w for w in prior]
+        for sample in self.samples:
+            x, y = sample['x'], sample['y']
+            for i in range(n):
+                vector[i] += x[i] * y
+                for j in range(n):
+                    matrix[i][j] += x[i] * x[j]
+        weights = _solve(matrix, vector)
+        if weights is not None:
+            self.weights = [max(0.0, w) for w in weights]
+
+    def features(self, script_path, scene_class):
+        try:
+            with open(script_path, 'r', encoding='utf-8') as f:
+                return script_features(f.read(), scene_class)
+        except OSError:
+            return None
+
+    def predict(self, counts, profile, preflight=False):
+        if counts is None:
+            return None
+        if preflight:
+            # Animations are skipped: only loading and LaTeX cost anything.
+            counts = dict(counts, run_time=0.0, wait_time=0.0)
+        x = feature_vector(counts, profile)
+        with self._lock:
+            return max(0.1, sum(w * v for w, v in zip(self.weights, x)))
+
+    def record(self, counts, profile, actual):
+        if counts is None:
+            return
+        x = feature_vector(counts, profile)
+        with self._lock, self._file_lock:
+            # Merge with samples other processes recorded since we last looked.
+            self.samples = self._load_samples()
+            self.samples.append({'x': x, 'y': actual})
+            self.samples = self.samples[-self.max_samples:]
+            self._save_samples()
+            self._fit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'samples': len(self.samples),
+                'weights': dict(zip(FEATURES, self.weights)),
+            }
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+
+def get_render_estimator():
+    global _estimator
+    with _estimator_lock:
+        if _estimator is None:
+            _estimator = RenderEstimator()
+        return _estimator
@@ -0,0 +1,68 @@
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+# The job whose request is being served; renders submitted under it report
+# their timings back to it. Threads started for a job must copy the context.
+_current_job = contextvars.ContextVar("render_job", default=None)
+
+
+def create_job(**fields):
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        'id': job_id,
+        'status': 'queued',
+        'created_at': time.time(),
+        'updated_at': time.time(),
+    }
+    job.update(fields)
+    with _jobs_lock:
+        _jobs[job_id] = job
+    return job_id
+
+
+def update_job(job_id, **fields):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        job['updated_at'] = time.time()
+        return dict(job)
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+
+def current_job():
+    return _current_job.get()
+
+
+@contextmanager
+def job_context(job_id):
+    token = _current_job.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def add_render_timings(job_id, timings):
+    # One entry per pool render (sections, preflights, the fallback MP4), plus
+    # running totals of predicted and actual render seconds.
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job['renders'] = job.get('renders', []) + [timings]
+        if timings['mode'] == "render":
+            job['predicted_seconds'] = round(job.get('predicted_seconds', 0.0) + timings['predicted'], 3)
+            job['render_seconds'] = round(job.get('render_seconds', 0.0) + timings['render_time'], 3)
+        job['updated_at'] = time.time()
@@ -0,0 +1,496 @@
+import os
+import sys
+import time
+import uuid
+import heapq
+import queue
+import signal
+import atexit
+import tempfile
+import threading
+import traceback
+import subprocess
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future
+
+from render_sandbox import (
+    RENDER_TIMEOUT, RENDER_MEMORY_LIMIT_MB, HostSlot, isolate_worker, limit_job_cpu,
+    process_tree_rss, kill_process_tree, remove_cgroup,
+)
+from tex_cache import install_tex_cache
+from render_engine import RenderError, render_in_process, preflight_in_process, export_vector_in_process
+from render_profiles import DEFAULT_RENDER_PROFILE
+from render_estimator import get_render_estimator
+from render_jobs import current_job, add_render_timings
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "2"))
+RENDER_WORKER_MAX_JOBS = int(os.environ.get("RENDER_WORKER_MAX_JOBS", "20"))
+# Seconds of predicted render time a job is forgiven per second it waits.
+RENDER_AGING_RATE = float(os.environ.get("RENDER_AGING_RATE", "1.0"))
+# Used when a script can't be parsed for an estimate.
+RENDER_DEFAULT_ESTIMATE = 30.0
+
+def _worker_main(job_queue, result_queue, max_jobs):
+    isolate_worker()
+
+    # Already imported by the forkserver; only pays the import cost under spawn.
+    import manim  # noqa: F401
+
+    install_tex_cache()
+    pid = os.getpid()
+
+    jobs_done = 0
+    while jobs_done < max_jobs:
+        # The pool only hands out a job per idle worker, so it can keep the
+        # rest of the queue ordered by predicted cost.
+        result_queue.put(("ready", pid, None))
+        job = job_queue.get()
+        if job is None:
+            break
+
+        job_id, script_path, scene_class, options = job
+        with HostSlot():
+            result_queue.put(("started", job_id, pid))
+            limit_job_cpu()
+            try:
+                mode = options.pop("mode")
+                if mode == "preflight":
+                    result = preflight_in_process(script_path, scene_class, options["media_dir"], options["profile"])
+                elif mode == "vector":
+                    result = export_vector_in_process(script_path, scene_class, options["output_path"],
+                                                      options["media_dir"])
+                else:
+                    result = render_in_process(script_path, scene_class, **options)
+                result_queue.put(("done", job_id, result))
+            except BaseException:
+                result_queue.put(("failed", job_id, traceback.format_exc()))
+        jobs_done += 1
+
+    result_queue.put(("exit", pid, None))
+
+
+class RenderPool:
+
+    def __init__(self, workers=RENDER_WORKERS, max_jobs_per_worker=RENDER_WORKER_MAX_JOBS,
+                 timeout=RENDER_TIMEOUT, memory_limit_mb=RENDER_MEMORY_LIMIT_MB):
+        self.num_workers = max(1, workers)
+        self.max_jobs_per_worker = max(1, max_jobs_per_worker)
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self.ctx = multiprocessing.get_context("forkserver")
+            self.ctx.set_forkserver_preload(["manim", "numpy", "cairo", "manimpango"])
+        else:
+            self.ctx = multiprocessing.get_context("spawn")
+
+        self.job_queue = self.ctx.Queue()
+        self.result_queue = self.ctx.Queue()
+
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._running = {}
+        self._workers = {}
+        self._ready = set()
+        self._idle = set()
+        self._pending = []
+        self._dispatched = set()
+        self._kill_reasons = {}
+        self._closed = False
+        self.recent_jobs = deque(maxlen=100)
+
+        for _ in range(self.num_workers):
+            self._spawn_worker()
+
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self._collector.start()
+        self._watchdog = threading.Thread(target=self._watch_jobs, daemon=True)
+        self._watchdog.start()
+
+    def _spawn_worker(self):
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(self.job_queue, self.result_queue, self.max_jobs_per_worker),
+            daemon=True,
+        )
+        process.start()
+        self._workers[process.pid] = process
+        return process
+
+    def _collect_results(self):
+        while True:
+            try:
+                kind, key, value = self.result_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._reap_workers()
+                if self._closed and not self._workers:
+                    return
+                continue
+
+            finished = None
+            cancelled_pid = None
+            with self._lock:
+                if kind == "ready":
+                    self._ready.add(key)
+                    self._idle.add(key)
+                    self._dispatch()
+                elif kind == "started":
+                    self._running[value] = key
+                    self._idle.discard(value)
+                    self._dispatched.discard(key)
+                    job = self._jobs.get(key)
+                    if job is not None:
+                        job['started'] = time.time()
+                        job['pid'] = value
+                        if job.get('cancelled'):
+                            # Cancelled after it was handed to the worker.
+                            self._kill_reasons[value] = job['cancelled']
+                            cancelled_pid = value
+                elif kind == "done":
+                    finished = self._finish_job(key, result=value)
+                elif kind == "failed":
+                    finished = self._finish_job(key, error=RenderError("Manim render failed", value))
+                elif kind == "exit":
+                    self._ready.discard(key)
+                    self._idle.discard(key)
+
+            if finished:
+                self._complete_job(*finished)
+            if cancelled_pid:
+                kill_process_tree(cancelled_pid)
+            if kind == "exit":
+                self._reap_workers()
+
+    def _watch_jobs(self):
+        while not self._closed:
+            time.sleep(1.0)
+            now = time.time()
+            with self._lock:
+                running = [(pid, self._jobs.get(job_id)) for pid, job_id in self._running.items()]
+
+            for pid, job in running:
+                if job is None or 'started' not in job:
+                    continue
+                reason = None
+                elapsed = now - job['started']
+                if self.timeout > 0 and elapsed > self.timeout:
+                    reason = f"wall-clock limit of {self.timeout}s exceeded"
+                elif self.memory_limit > 0:
+                    rss = process_tree_rss(pid)
+                    if rss > self.memory_limit:
+                        reason = f"memory limit exceeded ({rss // (1024 * 1024)} MB RSS)"
+
+                if reason:
+                    print(f"Killing render worker {pid} ({job['scene']}): {reason}")
+                    with self._lock:
+                        self._kill_reasons[pid] = reason
+                    kill_process_tree(pid)
+
+    def _finish_job(self, job_id, result=None, error=None):
+        # Called with the lock held; the caller passes the returned job to
+        # _complete_job once it has released the lock.
+        job = self._jobs.pop(job_id, None)
+        if job is None:
+            return None
+        self._running.pop(job.get('pid'), None)
+
+        finished = time.time()
+        started = job.get('started', finished)
+        timings = {
+            'job_id': job_id,
+            'scene': job['scene'],
+            'mode': job['mode'],
+            'status': 'failed' if error is not None else 'done',
+            'queue_wait': round(started - job['submitted'], 3),
+            'predicted': round(job['predicted'], 3),
+            'render_time': round(finished - started, 3),
+        }
+        self.recent_jobs.append(timings)
+        if isinstance(result, dict):
+            result.setdefault('timings', {}).update(queue_wait=timings['queue_wait'], predicted=timings['predicted'])
+        print(f"Render job {job['scene']}: waited {timings['queue_wait']:.1f}s in queue, "
+              f"rendered in {timings['render_time']:.1f}s, predicted {timings['predicted']:.1f}s "
+              f"({timings['status']})")
+        return job, timings, result, error
+
+    def _complete_job(self, job, timings, result, error):
+        # Outside the lock: the estimator writes its history and refits, and
+        # resolving the future runs the caller's callbacks.
+        if error is None and job['mode'] == "render":
+            get_render_estimator().record(job['features'], job['profile'], timings['render_time'])
+        if job['client_job'] is not None:
+            add_render_timings(job['client_job'], timings)
+
+        if error is not None:
+            job['future'].set_exception(error)
+        else:
+            job['future'].set_result(result)
+
+    def _reap_workers(self):
+        finished = []
+        with self._lock:
+            for pid, process in list(self._workers.items()):
+                if process.is_alive():
+                    continue
+                process.join(timeout=0)
+                del self._workers[pid]
+                self._ready.discard(pid)
+                self._idle.discard(pid)
+                # Reap anything the worker left behind in its process group.
+                kill_process_tree(pid)
+                remove_cgroup(pid)
+
+                job_id = self._running.pop(pid, None)
+                reason = self._kill_reasons.pop(pid, None)
+                if job_id is not None:
+                    sigxcpu = getattr(signal, "SIGXCPU", None)
+                    if reason is None and sigxcpu and process.exitcode == -sigxcpu:
+                        reason = "CPU time limit exceeded"
+                    finished.append(self._finish_job(job_id, error=RenderError(
+                        f"Render worker {pid} exited with code {process.exitcode}"
+                        + (f": {reason}" if reason else "")
+                    )))
+
+                if not self._closed:
+                    replacement = self._spawn_worker()
+                    print(f"Recycled render worker {pid} -> {replacement.pid}")
+
+        for job in finished:
+            if job:
+                self._complete_job(*job)
+
+    def _dispatch(self):
+        # Called with the lock held.
+        while self._pending and len(self._idle) > len(self._dispatched):
+            _, _, job_id, payload = heapq.heappop(self._pending)
+            self._dispatched.add(job_id)
+            self.job_queue.put(payload)
+
+    def submit(self, script_path, scene_class, output_path, media_dir, profile=DEFAULT_RENDER_PROFILE, mode="render"):
+        if self._closed:
+            raise RenderError("Render pool is shut down")
+
+        estimator = get_render_estimator()
+        features = estimator.features(script_path, scene_class)
+        # Preflights and vector exports skip rasterizing, so cost like a preflight.
+        predicted = estimator.predict(features, profile, preflight=mode != "render")
+        if predicted is None:
+            predicted = RENDER_DEFAULT_ESTIMATE
+
+        job_id = uuid.uuid4().hex
+        future = Future()
+        submitted = time.time()
+        options = {
+            "media_dir": os.path.abspath(media_dir),
+            "profile": profile,
+            "mode": mode,
+        }
+        if mode != "preflight":
+            options["output_path"] = os.path.abspath(output_path)
+        payload = (job_id, os.path.abspath(script_path), scene_class, options)
+
+        # Shortest predicted job first, with aging: the effective cost
+        # predicted - rate * (now - submitted) orders jobs the same way at any
+        # "now", so it can be a fixed heap key.
+        priority = predicted + RENDER_AGING_RATE * submitted
+        with self._lock:
+            self._jobs[job_id] = {
+                'future': future,
+                'scene': f"{scene_class}:{os.path.basename(output_path or 'preflight')}",
+                'submitted': submitted,
+                'predicted': predicted,
+                'features': features,
+                'profile': profile,
+                'mode': mode,
+                'client_job': current_job(),
+            }
+            heapq.heappush(self._pending, (priority, submitted, job_id, payload))
+            self._dispatch()
+        return future
+
+    def cancel(self, future, reason="cancelled"):
+        # Drops the job if it's still queued, otherwise kills its worker's
+        # process group; the future fails once the worker has been reaped.
+        finished = None
+        pid = None
+        with self._lock:
+            job_id = next((key for key, job in self._jobs.items() if job['future'] is future), None)
+            if job_id is None:
+                return False
+            job = self._jobs[job_id]
+            if any(item[2] == job_id for item in self._pending):
+                self._pending = [item for item in self._pending if item[2] != job_id]
+                heapq.heapify(self._pending)
+                finished = self._finish_job(job_id, error=RenderError(f"Render job {reason}"))
+            elif 'pid' in job:
+                pid = job['pid']
+                self._kill_reasons[pid] = reason
+            else:
+                job['cancelled'] = reason
+
+        if finished:
+            self._complete_job(*finished)
+        if pid:
+            print(f"Killing render worker {pid} ({job['scene']}): {reason}")
+            kill_process_tree(pid)
+        return True
+
+    def render(self, script_path, scene_class, output_path, media_dir, profile=DEFAULT_RENDER_PROFILE, timeout=None):
+        return self.submit(script_path, scene_class, output_path, media_dir, profile).result(timeout)
+
+    def export_vector(self, script_path, scene_class, output_path, media_dir, timeout=None):
+        return self.submit(script_path, scene_class, output_path, media_dir, "preview", mode="vector").result(timeout)
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            queued = [
+                {
+                    'scene': self._jobs[job_id]['scene'],
+                    'predicted': round(self._jobs[job_id]['predicted'], 3),
+                    'waiting': round(now - self._jobs[job_id]['submitted'], 3),
+                }
+                for _, _, job_id, _ in sorted(self._pending)
+            ]
+            running = [
+                {
+                    'scene': self._jobs[job_id]['scene'],
+                    'predicted': round(self._jobs[job_id]['predicted'], 3),
+                    'elapsed': round(now - self._jobs[job_id].get('started', now), 3),
+                }
+                for job_id in self._running.values() if job_id in self._jobs
+            ]
+            return {
+                'workers': len(self._workers),
+                'running': running,
+                'queued': queued,
+                'recent_jobs': list(self.recent_jobs),
+                'estimator': get_render_estimator().stats(),
+            }
+
+    def wait_ready(self, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                if len(self._ready) >= self.num_workers:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def shutdown(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            for _, _, job_id, _ in self._pending:
+                job = self._jobs.pop(job_id)
+                job['future'].set_exception(RenderError("Render pool is shut down"))
+            self._pending = []
+        for _ in list(self._workers):
+            self.job_queue.put(None)
+        for process in list(self._workers.values()):
+            process.join(timeout=5)
+            if process.is_alive():
+                kill_process_tree(process.pid)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+BENCH_SCENE = """from manim import *
+
+class FirstFrame(Scene):
+    def construct(self):
+        self.add(Square())
+        self.wait(0.1)
+"""
+
+
+def _first_partial_movie(media_dir):
+    # The first frames have been encoded once a partial movie file has data.
+    for root, _, files in os.walk(media_dir):
+        if os.path.basename(os.path.dirname(root)) != "partial_movie_files":
+            continue
+        for name in files:
+            try:
+                if name.endswith(".mp4") and os.path.getsize(os.path.join(root, name)) > 0:
+                    return True
+            except OSError:
+                pass
+    return False
+
+
+def _time_to_first_frame(media_dir, start, done):
+    # Polls until the render writes its first partial movie file; a render
+    # that finishes before a poll catches one counts its whole duration.
+    while not done():
+        if _first_partial_movie(media_dir):
+            return time.perf_counter() - start
+        time.sleep(0.005)
+    return time.perf_counter() - start
+
+
+def benchmark_time_to_first_frame(runs=3, quality="l"):
+    # Seconds from launching a render until its first frames are on disk,
+    # for a fresh manim subprocess and for a warm pool worker.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        script_path = os.path.join(temp_dir, "first_frame.py")
+        with open(script_path, "w", encoding="utf-8") as f:
+            f.write(BENCH_SCENE)
+
+        cold = []
+        for i in range(runs):
+            media_dir = os.path.join(temp_dir, f"cold_{i}")
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, "-m", "manim", script_path, "FirstFrame",
+                 "-o", f"cold_{i}", "--media_dir", media_dir,
+                 "-q", quality, "--disable_caching"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            cold.append(_time_to_first_frame(media_dir, start, lambda: process.poll() is not None))
+            if process.wait() != 0:
+                raise RenderError(f"manim exited with code {process.returncode}")
+
+        pool = RenderPool(workers=1, max_jobs_per_worker=runs + 1)
+        try:
+            pool.wait_ready()
+            warm = []
+            for i in range(runs):
+                media_dir = os.path.join(temp_dir, f"warm_{i}")
+                start = time.perf_counter()
+                future = pool.submit(script_path, "FirstFrame", os.path.join(temp_dir, f"warm_{i}.mp4"),
+                                     media_dir, quality)
+                warm.append(_time_to_first_frame(media_dir, start, future.done))
+                future.result()
+        finally:
+            pool.shutdown()
+
+    return {'cold': cold, 'warm': warm}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark time-to-first-frame: cold manim subprocess vs warm render pool")
+    parser.add_argument("--runs", type=int, default=3, help="Renders per mode")
+    parser.add_argument("--quality", default="l", help="manim quality flag (l/m/h/p/k)")
+
+    args = parser.parse_args()
+
+    timings = benchmark_time_to_first_frame(args.runs, args.quality)
+    for mode in ("cold", "warm"):
+        values = timings[mode]
+        print(f"{mode:>4}: mean {sum(values) / len(values):.2f}s  "
+              f"min {min(values):.2f}s  runs {', '.join(f'{v:.2f}' for v in values)}")
@@ -0,0 +1,83 @@
+import os
+import re
+import threading
+
+# 720p30 at CRF 23, what manim's -qm rendered before profiles existed.
+DEFAULT_RENDER_PROFILE = os.environ.get("DEFAULT_RENDER_PROFILE", "desktop")
+# Clients that don't name a profile get the mobile one when their viewport
+# (or, failing that, their User-Agent) says they are a phone.
+MOBILE_RENDER_PROFILE = os.environ.get("MOBILE_RENDER_PROFILE", "mobile")
+MOBILE_MAX_VIEWPORT = int(os.environ.get("MOBILE_MAX_VIEWPORT", "900"))
+MOBILE_USER_AGENT = re.compile(r"Mobi|Android|iPhone|iPod", re.IGNORECASE)
+
+RENDER_PROFILES = {
+    # Same frame as manim's -ql, used for previews and pre-flight.
+    "preview": {
+        "pixel_width": 854, "pixel_height": 480, "frame_rate": 15,
+        "preset": "ultrafast", "crf": 30, "audio_bitrate": "64k",
+    },
+    "mobile": {
+        "pixel_width": 854, "pixel_height": 480, "frame_rate": 24,
+        "preset": "veryfast", "crf": 28, "audio_bitrate": "96k",
+    },
+    "desktop": {
+        "pixel_width": 1280, "pixel_height": 720, "frame_rate": 30,
+        "preset": "medium", "crf": 23, "audio_bitrate": "128k",
+    },
+    "projector": {
+        "pixel_width": 1920, "pixel_height": 1080, "frame_rate": 30,
+        "preset": "slow", "crf": 20, "audio_bitrate": "192k",
+    },
+}
+
+# manim's -q letters still resolve, for the CLI benchmark and older callers.
+QUALITY_PROFILES = {"l": "preview", "m": "desktop", "h": "projector", "p": "projector", "k": "projector"}
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def resolve_profile(name=None):
+    name = QUALITY_PROFILES.get(name, name) or DEFAULT_RENDER_PROFILE
+    if name not in RENDER_PROFILES:
+        print(f"Unknown render profile {name!r}, using {DEFAULT_RENDER_PROFILE}")
+        name = DEFAULT_RENDER_PROFILE
+    return name
+
+
+def client_profile(user_agent=None, viewport_width=None):
+    try:
+        viewport_width = int(viewport_width) if viewport_width else None
+    except (TypeError, ValueError):
+        viewport_width = None
+    if viewport_width:
+        mobile = viewport_width <= MOBILE_MAX_VIEWPORT
+    else:
+        mobile = bool(user_agent and MOBILE_USER_AGENT.search(user_agent))
+    return MOBILE_RENDER_PROFILE if mobile else DEFAULT_RENDER_PROFILE
+
+
+def get_profile(name=None):
+    return RENDER_PROFILES[resolve_profile(name)]
+
+
+def record_render(name, render_time, size_bytes):
+    name = resolve_profile(name)
+    with _stats_lock:
+        entry = _stats.setdefault(name, {'renders': 0, 'render_time': 0.0, 'bytes': 0})
+        entry['renders'] += 1
+        entry['render_time'] += render_time
+        entry['bytes'] += size_bytes
+    print(f"Profile {name}: rendered in {render_time:.1f}s, {size_bytes / (1024 * 1024):.1f} MB")
+
+
+def profile_stats():
+    with _stats_lock:
+        return {
+            name: {
+                'renders': entry['renders'],
+                'mean_render_time': entry['render_time'] / entry['renders'],
+                'mean_size_mb': entry['bytes'] / entry['renders'] / (1024 * 1024),
+            }
+            for name, entry in _stats.items()
+        }
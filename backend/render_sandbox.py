@@ -0,0 +1,126 @@
+import os
+import time
+import signal
+import tempfile
+
+from filelock import FileLock, Timeout
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RENDER_TIMEOUT = int(os.environ.get("RENDER_TIMEOUT", "600"))
+RENDER_CPU_LIMIT = int(os.environ.get("RENDER_CPU_LIMIT", "900"))
+RENDER_MEMORY_LIMIT_MB = int(os.environ.get("RENDER_MEMORY_LIMIT_MB", "2048"))
+RENDER_HOST_SLOTS = int(os.environ.get("RENDER_HOST_SLOTS", str(os.cpu_count() or 2)))
+RENDER_CGROUP_ROOT = os.environ.get("RENDER_CGROUP_ROOT")
+RENDER_SLOT_DIR = os.environ.get("RENDER_SLOT_DIR", tempfile.gettempdir())
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def isolate_worker():
+    # Own process group, so latex/dvisvgm/ffmpeg children die with the worker.
+    if hasattr(os, "setsid"):
+        os.setsid()
+
+    if resource is not None and RENDER_MEMORY_LIMIT_MB > 0:
+        # Address space is a loose upper bound on RSS; the watchdog enforces RSS.
+        limit = RENDER_MEMORY_LIMIT_MB * 1024 * 1024 * 4
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    join_cgroup(os.getpid())
+
+
+def join_cgroup(pid):
+    if not RENDER_CGROUP_ROOT:
+        return None
+    path = os.path.join(RENDER_CGROUP_ROOT, f"render-{pid}")
+    try:
+        os.makedirs(path, exist_ok=True)
+        if RENDER_MEMORY_LIMIT_MB > 0:
+            with open(os.path.join(path, "memory.max"), "w") as f:
+                f.write(str(RENDER_MEMORY_LIMIT_MB * 1024 * 1024))
+        with open(os.path.join(path, "cgroup.procs"), "w") as f:
+            f.write(str(pid))
+        return path
+    except OSError as e:
+        print(f"Could not place render worker {pid} in cgroup {path}: {e}")
+        return None
+
+
+def remove_cgroup(pid):
+    if not RENDER_CGROUP_ROOT:
+        return
+    try:
+        os.rmdir(os.path.join(RENDER_CGROUP_ROOT, f"render-{pid}"))
+    except OSError:
+        pass
+
+
+def limit_job_cpu():
+    if resource is None or RENDER_CPU_LIMIT <= 0:
+        return
+    # RLIMIT_CPU counts the whole life of a recycled worker, so move the soft
+    # limit to "used so far + budget" before every job.
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + RENDER_CPU_LIMIT
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def process_tree_rss(pgid):
+    if not os.path.isdir("/proc"):
+        return 0
+    total = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # fields[0] is the state, so pgrp is fields[2] and rss (pages) fields[21].
+        if int(fields[2]) == pgid:
+            total += int(fields[21]) * PAGE_SIZE
+    return total
+
+
+def kill_process_tree(pid):
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(pid, signal.SIGKILL)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except OSError:
+        pass
+
+
+class HostSlot:
+
+    def __init__(self, slots=RENDER_HOST_SLOTS, slot_dir=RENDER_SLOT_DIR):
+        self.slots = max(1, slots)
+        self.slot_dir = slot_dir
+        self.lock = None
+
+    def __enter__(self):
+        while True:
+            for i in range(self.slots):
+                lock = FileLock(os.path.join(self.slot_dir, f"visionsolve-render-slot-{i}.lock"))
+                try:
+                    lock.acquire(timeout=0)
+                except Timeout:
+                    continue
+                self.lock = lock
+                return self
+            time.sleep(0.2)
+
+    def __exit__(self, *exc):
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
@@ -0,0 +1,197 @@
+import os
+import json
+import uuid
+import shutil
+import tempfile
+import threading
+
+from filelock import FileLock
+
+RENDER_SCRATCH_JOB_MB = int(os.environ.get("RENDER_SCRATCH_JOB_MB", "1024"))
+
+
+def _total_bytes(path):
+    try:
+        stat = os.statvfs(path)
+    except (OSError, AttributeError):
+        return 0
+    return stat.f_blocks * stat.f_frsize
+
+
+def _default_scratch_dir():
+    # Docker mounts a 64 MB /dev/shm unless the container is started with a
+    # bigger one (see docker-compose.yml); too small to hold even one job.
+    if os.path.isdir("/dev/shm") and _total_bytes("/dev/shm") >= RENDER_SCRATCH_JOB_MB * 1024 * 1024:
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+# tmpfs for render intermediates; jobs that don't fit spill to RENDER_SPILL_DIR.
+RENDER_SCRATCH_DIR = os.environ.get("RENDER_SCRATCH_DIR") or _default_scratch_dir()
+RENDER_SPILL_DIR = os.environ.get("RENDER_SPILL_DIR", tempfile.gettempdir())
+# How often a job's scratch tree is measured for its peak size.
+RENDER_SCRATCH_SAMPLE_SECONDS = float(os.environ.get("RENDER_SCRATCH_SAMPLE_SECONDS", "0.5"))
+# Reservations are shared by every process using the same scratch dir
+# (gunicorn workers, CLI runs), not just the threads of one.
+RESERVATIONS_PATH = os.path.join(RENDER_SCRATCH_DIR, "visionsolve-scratch-reservations.json")
+
+# Sizes, not write counts: the largest any job's trees got, and what the
+# jobs still held in scratch / on disk when they finished.
+_totals = {'jobs': 0, 'spilled_jobs': 0, 'peak_bytes': 0, 'scratch_end_bytes': 0, 'disk_end_bytes': 0}
+_lock = threading.Lock()
+
+
+def _free_bytes(path):
+    try:
+        stat = os.statvfs(path)
+    except (OSError, AttributeError):
+        return 0
+    return stat.f_bavail * stat.f_frsize
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _reservations_lock():
+    # A fresh lock object each time: filelock refuses instances inherited
+    # across fork (gunicorn workers).
+    return FileLock(RESERVATIONS_PATH + ".lock")
+
+
+def _read_reservations():
+    # Called with _reservations_lock() held. Entries are "<pid>:<id>" -> bytes;
+    # a process that died without releasing its reservations loses them here.
+    try:
+        with open(RESERVATIONS_PATH, "r", encoding="utf-8") as f:
+            reservations = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {key: size for key, size in reservations.items() if _alive(int(key.split(":")[0]))}
+
+
+def _write_reservations(reservations):
+    tmp_path = f"{RESERVATIONS_PATH}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(reservations, f)
+    os.replace(tmp_path, RESERVATIONS_PATH)
+
+
+class ScratchSpace:
+
+    def __init__(self, name, cap_bytes=RENDER_SCRATCH_JOB_MB * 1024 * 1024):
+        self.name = name
+        self.cap_bytes = cap_bytes
+        self.reserved = 0
+        self.reservation = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self.root = None
+        self.spill_root = None
+        self.peak_bytes = 0
+        self._done = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        try:
+            with _reservations_lock():
+                # Reserve the whole cap up front so concurrent jobs can't overfill tmpfs.
+                reservations = _read_reservations()
+                if _free_bytes(RENDER_SCRATCH_DIR) - sum(reservations.values()) >= self.cap_bytes:
+                    reservations[self.reservation] = self.cap_bytes
+                    _write_reservations(reservations)
+                    self.reserved = self.cap_bytes
+        except OSError as e:
+            print(f"Could not reserve scratch space for job {self.name}: {e}")
+
+        if self.reserved:
+            self.root = tempfile.mkdtemp(prefix=f"visionsolve-{self.name}-", dir=RENDER_SCRATCH_DIR)
+        else:
+            print(f"Not enough space in {RENDER_SCRATCH_DIR} for job {self.name}, using {RENDER_SPILL_DIR}")
+            self.root = tempfile.mkdtemp(prefix=f"visionsolve-{self.name}-", dir=RENDER_SPILL_DIR)
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        # Intermediates (partial movies, segments) are deleted before the job
+        # ends, so the size at exit says little about what the job needed.
+        while True:
+            self._measure()
+            if self._done.wait(RENDER_SCRATCH_SAMPLE_SECONDS):
+                return
+
+    def _measure(self):
+        size = _tree_size(self.root) + (_tree_size(self.spill_root) if self.spill_root else 0)
+        self.peak_bytes = max(self.peak_bytes, size)
+        return size
+
+    def dir_for(self, stage):
+        base = self.root
+        if self.reserved and _tree_size(self.root) >= self.cap_bytes:
+            # Over the cap: later stages of this job go to disk.
+            if self.spill_root is None:
+                self.spill_root = tempfile.mkdtemp(prefix=f"visionsolve-{self.name}-", dir=RENDER_SPILL_DIR)
+                print(f"Job {self.name} exceeded its {self.cap_bytes // (1024 * 1024)} MB scratch cap, "
+                      f"spilling to {self.spill_root}")
+            base = self.spill_root
+        path = os.path.join(base, stage)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def usage(self):
+        # Current size of each tree, plus the largest the job has been so far;
+        # bytes written and deleted between samples aren't counted.
+        self._measure()
+        in_scratch = _tree_size(self.root)
+        spilled = _tree_size(self.spill_root) if self.spill_root else 0
+        if not self.reserved:
+            in_scratch, spilled = 0, in_scratch + spilled
+        return {'peak_bytes': self.peak_bytes, 'scratch_end_bytes': in_scratch, 'disk_end_bytes': spilled}
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._sampler.join()
+        usage = self.usage()
+        for path in (self.root, self.spill_root):
+            if path:
+                shutil.rmtree(path, ignore_errors=True)
+        if self.reserved:
+            try:
+                with _reservations_lock():
+                    reservations = _read_reservations()
+                    reservations.pop(self.reservation, None)
+                    _write_reservations(reservations)
+            except OSError as e:
+                print(f"Could not release scratch space for job {self.name}: {e}")
+        with _lock:
+            _totals['jobs'] += 1
+            _totals['spilled_jobs'] += 1 if (self.spill_root or not self.reserved) else 0
+            _totals['peak_bytes'] = max(_totals['peak_bytes'], usage['peak_bytes'])
+            _totals['scratch_end_bytes'] += usage['scratch_end_bytes']
+            _totals['disk_end_bytes'] += usage['disk_end_bytes']
+
+
+def scratch_stats():
+    try:
+        with _reservations_lock():
+            reserved = sum(_read_reservations().values())
+    except OSError:
+        reserved = None
+    with _lock:
+        return dict(_totals, scratch_dir=RENDER_SCRATCH_DIR, reserved_bytes=reserved)
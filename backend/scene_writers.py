@@ -0,0 +1,113 @@
+import os
+
+import av
+from manim.animation.animation import Wait
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.scene.scene_file_writer import SceneFileWriter
+
+from render_profiles import get_profile
+
+# Encode a held frame (self.wait() with nothing moving) twice instead of once
+# per frame; the stream becomes variable frame rate with the same timeline.
+RENDER_ELIDE_STATIC = os.environ.get("RENDER_ELIDE_STATIC", "1") == "1"
+# Keyframe every this many seconds of movie time. x264's own keyint counts
+# encoded frames, which stops tracking time once holds are elided; HLS cuts
+# segments on these keyframes.
+RENDER_KEYFRAME_INTERVAL = float(os.environ.get("RENDER_KEYFRAME_INTERVAL", "2"))
+
+
+def profile_writer_class(profile, elide_static=RENDER_ELIDE_STATIC):
+    settings = get_profile(profile)
+    keyint = max(1, round(RENDER_KEYFRAME_INTERVAL * settings['frame_rate']))
+
+    class ProfileFileWriter(SceneFileWriter):
+
+        def __init__(self, *args, **kwargs):
+            self.encoded_frames = 0
+            super().__init__(*args, **kwargs)
+
+        def open_partial_movie_stream(self, file_path=None):
+            self.next_pts = 0
+            self.next_keyframe = 0
+            super().open_partial_movie_stream(file_path)
+            # manim hard-codes crf 23 and no preset; the codec is only opened
+            # on the first encoded frame, so the options can still change here.
+            codec = self.video_stream.codec_context
+            codec.options = dict(codec.options, crf=str(settings['crf']), preset=settings['preset'])
+
+        def encode_and_write_frame(self, frame, num_frames):
+            if not elide_static or num_frames <= 2:
+                offsets = range(num_frames)
+            else:
+                # First and last position of the hold, plus every keyframe
+                # that falls inside it; the container keeps the gaps, so the
+                # partial file still lasts num_frames frames.
+                keyframes = range(-self.next_pts % keyint, num_frames - 1, keyint)
+                offsets = sorted({0, num_frames - 1, *keyframes})
+
+            for offset in offsets:
+                av_frame = av.VideoFrame.from_ndarray(frame, format="rgba")
+                av_frame.pts = self.next_pts + offset
+                if av_frame.pts >= self.next_keyframe:
+                    av_frame.pict_type = "I"
+                    self.next_keyframe = (av_frame.pts // keyint + 1) * keyint
+                for packet in self.video_stream.encode(av_frame):
+                    self.video_container.mux(packet)
+                self.encoded_frames += 1
+            self.next_pts += num_frames
+
+        def combine_files(self, input_files, output_file, create_gif=False, includes_sound=False):
+            if create_gif or not elide_static:
+                return super().combine_files(input_files, output_file, create_gif, includes_sound)
+
+            file_list = self.partial_movie_directory / "partial_movie_file_list.txt"
+            with file_list.open("w", encoding="utf-8") as fp:
+                for path in input_files:
+                    fp.write(f"file 'file:{os.path.abspath(path)}'\n")
+
+            options = {"safe": "0"}
+            if not includes_sound:
+                options["an"] = "1"
+
+            # manim drops dts and lets libav guess it, which assumes a constant
+            # frame rate and cuts the movie short after a held frame. Keep the
+            # concat demuxer's dts and only nudge it where a file with B-frames
+            # follows one without.
+            with av.open(str(file_list), options=options, format="concat") as partial_movies:
+                input_stream = partial_movies.streams.video[0]
+                with av.open(str(output_file), mode="w") as output_container:
+                    output_stream = output_container.add_stream(template=input_stream)
+                    last_dts = None
+                    for packet in partial_movies.demux(input_stream):
+                        if packet.dts is None:
+                            continue
+                        if last_dts is not None and packet.dts <= last_dts:
+                            packet.dts = last_dts + 1
+                        last_dts = packet.dts
+                        packet.stream = output_stream
+                        output_container.mux(packet)
+
+    return ProfileFileWriter
+
+
+class TimelineRenderer(CairoRenderer):
+    # Records when every play()/wait() starts and ends and where self.clear()
+    # cuts the scene, in seconds of the rendered movie.
+
+    def init_scene(self, scene):
+        super().init_scene(scene)
+        self.events = []
+        clear = scene.clear
+
+        def recorded_clear():
+            self.events.append({'type': 'clear', 'time': self.time})
+            return clear()
+
+        scene.clear = recorded_clear
+
+    def play(self, scene, *args, **kwargs):
+        start = self.time
+        super().play(scene, *args, **kwargs)
+        if self.time > start:
+            waiting = all(isinstance(anim, Wait) for anim in scene.animations or ())
+            self.events.append({'type': 'wait' if waiting else 'animation', 'start': start, 'end': self.time})
@@ -0,0 +1,228 @@
+import os
+import ast
+import time
+import subprocess
+
+from render_pool import get_render_pool
+from render_engine import RenderError, shift_events
+from render_profiles import DEFAULT_RENDER_PROFILE
+
+MIN_PARALLEL_SECTIONS = 2
+
+
+def _is_self_call(node, method):
+    return (
+        isinstance(node, ast.Expr)
+        and isinstance(node.value, ast.Call)
+        and isinstance(node.value.func, ast.Attribute)
+        and node.value.func.attr == method
+        and isinstance(node.value.func.value, ast.Name)
+        and node.value.func.value.id == "self"
+    )
+
+
+def find_construct(tree, scene_class):
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == scene_class:
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name == "construct":
+                    return item
+    return None
+
+
+def split_construct(construct):
+    sections = [[]]
+    for stmt in construct.body:
+        if _is_self_call(stmt, "clear") and sections[-1]:
+            sections.append([])
+        sections[-1].append(stmt)
+    return sections
+
+
+def _names(node, ctx):
+    return {
+        n.id for n in ast.walk(node)
+        if isinstance(n, ast.Name) and isinstance(n.ctx, ctx)
+    }
+
+
+def _bound_targets(stmt):
+    # Loop targets and comprehension variables are bound by the statement itself.
+    targets = [
+        node.target for node in ast.walk(stmt)
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension))
+    ]
+    return set().union(*(_names(target, ast.Store) for target in targets))
+
+
+def _mutates_scene_state(stmt):
+    for node in ast.walk(stmt):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            return True
+        targets = []
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            targets = [node.target]
+        for target in targets:
+            # self.x = ..., self.camera.background_color = ... etc.
+            root = target
+            while isinstance(root, (ast.Attribute, ast.Subscript)):
+                root = root.value
+            if isinstance(root, ast.Name) and root.id == "self" and target is not root:
+                return True
+    return False
+
+
+def sections_share_state(sections):
+    defined_earlier = set()
+    for section in sections:
+        defined_here = set()
+        for stmt in section:
+            if _mutates_scene_state(stmt):
+                return True
+            stored = _names(stmt, ast.Store)
+            free = _names(stmt, ast.Load) - defined_here - _bound_targets(stmt)
+            if free & defined_earlier:
+                return True
+            defined_here |= stored
+            if isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+                defined_here.add(stmt.name)
+        defined_earlier |= defined_here
+    return False
+
+
+def build_section_script(manim_code, scene_class, sections):
+    parts = [manim_code.rstrip(), ""]
+    section_classes = []
+    for i, section in enumerate(sections):
+        class_name = f"{scene_class}Section{i:03d}"
+        body = "\n".join(ast.unparse(stmt) for stmt in section)
+        indented = "\n".join(f"        {line}" if line else "" for line in body.splitlines())
+        parts.append(f"\nclass {class_name}({scene_class}):\n    def construct(self):\n{indented}\n")
+        section_classes.append(class_name)
+    return "\n".join(parts), section_classes
+
+
+def concat_videos(video_paths, output_path):
+    list_file = f"{output_path}.concat.txt"
+    with open(list_file, 'w', encoding='utf-8') as f:
+        for path in video_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    try:
+        cmd = [
+            "ffmpeg", "-y", "-f", "concat", "-safe", "0",
+            "-i", list_file, "-c", "copy", output_path
+        ]
+        subprocess.run(cmd, check=True, capture_output=True)
+        return True
+    except subprocess.SubprocessError as e:
+        print(f"Error concatenating sections: {e}")
+        return False
+    finally:
+        os.remove(list_file)
+
+
+def plan_sections(manim_code, scene_class):
+    try:
+        tree = ast.parse(manim_code)
+    except SyntaxError:
+        return None
+
+    construct = find_construct(tree, scene_class)
+    if construct is None:
+        return None
+
+    sections = split_construct(construct)
+    if len(sections) < MIN_PARALLEL_SECTIONS:
+        return None
+    if sections_share_state(sections):
+        print("Sections share state across self.clear(), rendering serially")
+        return None
+    return sections
+
+
+def _render_serial(pool, script_path, scene_class, output_path, media_dir, profile, on_section):
+    result = pool.render(script_path, scene_class, output_path, media_dir, profile)
+    if on_section and result['path']:
+        on_section(0, result)
+    return result
+
+
+def _cancel_sections(pool, futures):
+    # The other sections' output won't be used; free their workers.
+    for future in futures:
+        if not future.done():
+            pool.cancel(future, "another section failed")
+
+
+def render_scene(script_path, manim_code, scene_class, output_path, media_dir, profile=DEFAULT_RENDER_PROFILE,
+                 parallel=True, on_section=None):
+    pool = get_render_pool()
+    sections = plan_sections(manim_code, scene_class) if parallel else None
+    if not sections:
+        return _render_serial(pool, script_path, scene_class, output_path, media_dir, profile, on_section)
+
+    start = time.perf_counter()
+    output_name = os.path.splitext(os.path.basename(output_path))[0]
+    section_code, section_classes = build_section_script(manim_code, scene_class, sections)
+    section_script = os.path.join(os.path.dirname(script_path), f"{output_name}_sections.py")
+    with open(section_script, "w", encoding="utf-8") as f:
+        f.write(section_code)
+
+    print(f"Rendering {len(section_classes)} sections of {scene_class} in parallel")
+    futures = [
+        pool.submit(section_script, class_name,
+                    os.path.join(media_dir, "sections", f"{output_name}_{i:03d}.mp4"),
+                    os.path.join(media_dir, f"section_{i:03d}"), profile)
+        for i, class_name in enumerate(section_classes)
+    ]
+
+    section_results = []
+    for future in futures:
+        try:
+            result = future.result()
+        except RenderError as e:
+            _cancel_sections(pool, futures)
+            if section_results and on_section:
+                # Sections already streamed out can't be taken back.
+                raise
+            print(f"Section render failed ({e}), falling back to serial render")
+            return _render_serial(pool, script_path, scene_class, output_path, media_dir, profile, on_section)
+        # Sections that only add/remove mobjects produce no frames.
+        if result['path']:
+            if on_section:
+                on_section(len(section_results), result)
+            section_results.append(result)
+
+    if not section_results:
+        raise RenderError(f"No section of {scene_class} produced any video")
+
+    if not concat_videos([r['path'] for r in section_results], output_path):
+        if on_section:
+            raise RenderError(f"Could not join the {len(section_results)} sections of {scene_class}")
+        print("Falling back to serial render")
+        return pool.render(script_path, scene_class, output_path, media_dir, profile)
+
+    events = []
+    offset = 0.0
+    for r in section_results:
+        events += shift_events(r.get('events', []), offset)
+        offset += r['duration']
+
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {len(section_results)} sections in {elapsed:.1f}s")
+    return {
+        'path': output_path,
+        'events': events,
+        'duration': sum(r['duration'] for r in section_results),
+        'frame_count': sum(r['frame_count'] for r in section_results),
+        'encoded_frames': sum(r['encoded_frames'] for r in section_results),
+        'frame_rate': section_results[0]['frame_rate'],
+        'sections': section_results,
+        'timings': {
+            'render': max(r['timings']['render'] for r in section_results),
+            'predicted': max(r['timings']['predicted'] for r in section_results),
+            'total': elapsed,
+        },
+    }
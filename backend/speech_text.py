@@ -0,0 +1,302 @@
+import re
+import time
+
+# One pass over every narration string sent to TTS: markers and stage
+# directions are dropped, LaTeX is read out ("\frac{a}{b}" -> "a over b",
+# "x^2" -> "x squared", "\int" -> "integral").
+#
+# Splitting on the special tokens leaves prose at the even indices and one
+# token at each odd index, so prose runs are copied through untouched.
+_SPLIT = re.compile(r"""(
+    \[(?:SYNC:\s*\d+|PAUSE)\]    # marker
+  | \[[^\]\n]*\]               # stage direction, or a \sqrt index
+  | \\[a-zA-Z]+                # command
+  | \\.                        # escape
+  | \$\$?                      # math delimiter
+  | [\\{}^_=+\-*/<>|\[\]]      # brace, script, operator or stray
+)""", re.VERBOSE | re.DOTALL)
+_MARKER = re.compile(r"\[(?:SYNC:\s*\d+|PAUSE)\]")
+_SPACE_BEFORE_PUNCTUATION = re.compile(r" ([.,;:!?)%])")
+# Anything the tokenizer would treat specially; plain prose skips it.
+_SPECIAL = re.compile(r"[\\{}^_$\[\]=+*/<>|]")
+_LETTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+GREEK = {name: name for name in (
+    "alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa", "lambda",
+    "mu", "nu", "xi", "pi", "rho", "sigma", "tau", "upsilon", "phi", "chi", "psi", "omega",
+)}
+GREEK.update({name.capitalize(): f"capital {name}" for name in (
+    "gamma", "delta", "theta", "lambda", "xi", "pi", "sigma", "upsilon", "phi", "psi", "omega",
+)})
+GREEK.update(varepsilon="epsilon", vartheta="theta", varphi="phi", varrho="rho", varsigma="sigma")
+
+SYMBOLS = {
+    'int': "integral", 'iint': "double integral", 'iiint': "triple integral", 'oint': "contour integral",
+    'partial': "partial", 'nabla': "del", 'infty': "infinity", 'sum': "sum", 'prod': "product",
+    'lim': "limit", 'cdot': "times", 'times': "times", 'div': "divided by", 'pm': "plus or minus",
+    'mp': "minus or plus", 'leq': "less than or equal to", 'le': "less than or equal to",
+    'geq': "greater than or equal to", 'ge': "greater than or equal to", 'neq': "not equal to",
+    'ne': "not equal to", 'approx': "approximately", 'equiv': "is equivalent to", 'sim': "similar to",
+    'propto': "proportional to", 'to': "to", 'rightarrow': "to", 'Rightarrow': "implies",
+    'implies': "implies", 'iff': "if and only if", 'in': "in", 'notin': "not in", 'subset': "subset of",
+    'cup': "union", 'cap': "intersection", 'forall': "for all", 'exists': "there exists",
+    'circ': "composed with", 'degree': "degrees", 'angle': "angle", 'perp': "perpendicular to",
+    'parallel': "parallel to", 'cdots': "and so on", 'ldots': "and so on", 'dots': "and so on",
+    'hbar': "h bar", 'ell': "l", 'sin': "sine", 'cos': "cosine", 'tan': "tangent", 'sec': "secant",
+    'csc': "cosecant", 'cot': "cotangent", 'arcsin': "arc sine", 'arccos': "arc cosine",
+    'arctan': "arc tangent", 'sinh': "hyperbolic sine", 'cosh': "hyperbolic cosine",
+    'tanh': "hyperbolic tangent", 'log': "log", 'ln': "natural log", 'exp': "exponential",
+    'max': "max", 'min': "min", 'det': "determinant",
+}
+SYMBOLS.update(GREEK)
+
+# Commands whose argument is spoken with a word before or after it.
+ACCENTS = {
+    'dot': (None, "dot"), 'ddot': (None, "double dot"), 'hat': (None, "hat"), 'bar': (None, "bar"),
+    'overline': (None, "bar"), 'tilde': (None, "tilde"), 'vec': ("vector", None),
+}
+# Commands whose argument is read as plain text.
+TEXT_COMMANDS = {
+    'text', 'textrm', 'textbf', 'textit', 'emph', 'mathrm', 'mathbf', 'mathit', 'mathcal', 'mathbb',
+    'operatorname', 'boldsymbol',
+}
+# Their sub/superscripts are limits: "sum from n equals 1 to infinity".
+LIMIT_WORDS = {'int': ("from", "to"), 'iint': ("over", None), 'iiint': ("over", None), 'oint': ("over", None),
+               'sum': ("from", "to"), 'prod': ("from", "to"), 'lim': ("as", None)}
+MATH_OPEN = {'\\(', '\\['}
+MATH_CLOSE = {'\\)', '\\]'}
+OPERATORS = {'=': "equals", '+': "plus", '<': "less than", '>': "greater than", '*': "times"}
+POWERS = {'2': "squared", '3': "cubed"}
+ROOTS = {'2': "square root of", '3': "cube root of"}
+
+
+_SPOKEN = {name: f" {words} " for name, words in SYMBOLS.items()}
+_SPOKEN_OPERATORS = {op: f" {words} " for op, words in OPERATORS.items()}
+# Commands that read arguments, and how many.
+FRACTIONS = {'frac', 'dfrac', 'tfrac'}
+ARGUMENTS = dict.fromkeys(FRACTIONS, 2)
+ARGUMENTS.update(binom=2, sqrt=1)
+ARGUMENTS.update(dict.fromkeys(ACCENTS, 1))
+ARGUMENTS.update(dict.fromkeys(TEXT_COMMANDS, 1))
+
+
+def _combine(name, extra, args):
+    if name in FRACTIONS:
+        return args[0] + [" over "] + args[1]
+    if name == 'binom':
+        return args[0] + [" choose "] + args[1]
+    if name == 'sqrt':
+        return [f" {ROOTS.get(extra, f'{extra}th root of')} "] + args[0]
+    if name in ACCENTS:
+        before, after = ACCENTS[name]
+        return [f" {before} " if before else " "] + args[0] + [f" {after} " if after else " "]
+    if name == 'sub':
+        return [" "] + args[0]
+    if name == 'sup':
+        spoken = "".join(args[0]).strip()
+        if spoken == SYMBOLS['circ']:
+            return [" degrees "]
+        if spoken in POWERS:
+            return [f" {POWERS[spoken]} "]
+        return [" to the power of "] + args[0]
+    if name == 'limit':
+        return [f" {extra} "] + args[0] if extra else args[0]
+    # TEXT_COMMANDS
+    return args[0]
+
+
+def _speak(text):
+    # Iterative, so nesting depth costs memory rather than stack: every
+    # command or script waiting for its arguments is a frame
+    # [name, extra, args, needed, is_argument, out] (limits add the command
+    # they bound), every open group a frame [None, is_argument]. An argument is a braced group, a command or
+    # (as in LaTeX) a single character.
+    parts = _SPLIT.split(text)
+    out = []
+    stack = []
+    awaiting = False
+    math = False
+    limits = None
+
+    def finish(value):
+        # value is the next argument of the frame on top of the stack.
+        nonlocal out, awaiting, limits
+        while True:
+            frame = stack[-1]
+            frame[2].append(value)
+            if len(frame[2]) < frame[3]:
+                awaiting = True
+                return
+            stack.pop()
+            if frame[0] == 'limit':
+                # Kept for the other bound: "from 0 to 1".
+                limits = frame[6]
+            value = _combine(frame[0], frame[1], frame[2])
+            if not frame[4]:
+                out = frame[5]
+                out += value
+                awaiting = False
+                return
+
+    i = 0
+    count = len(parts)
+    while i < count:
+        token = parts[i]
+        i += 1
+        if i & 1:
+            # Prose.
+            if not token:
+                continue
+            if awaiting:
+                stripped = token.lstrip()
+                if not stripped:
+                    continue
+                if len(stripped) > 1:
+                    i -= 1
+                    parts[i] = stripped[1:]
+                finish([f" {stripped[0]} "])
+            else:
+                if not token.isspace():
+                    limits = None
+                out.append(token)
+            continue
+
+        first = token[0]
+        if first == '}' and not awaiting and stack:
+            frame = stack.pop()
+            if frame[1]:
+                finish(out)
+            continue
+        if first == '{' and awaiting:
+            stack.append([None, True])
+            out = []
+            awaiting = False
+            continue
+        if first == '^' or first == '_':
+            scripted, limits = limits, None
+            if scripted:
+                word = LIMIT_WORDS[scripted][first == '^']
+                stack.append(['limit', word, [], 1, awaiting, out, scripted])
+            else:
+                stack.append(['sup' if first == '^' else 'sub', None, [], 1, awaiting, out])
+            awaiting = True
+            continue
+
+        limits = None
+        if first == '{':
+            stack.append([None, False])
+            continue
+        if first == '\\' and len(token) > 1 and token[1] in _LETTERS:
+            name = token[1:]
+            needed = ARGUMENTS.get(name)
+            if needed:
+                extra = None
+                if name == 'sqrt':
+                    extra = '2'
+                    if not parts[i] and i + 1 < count and parts[i + 1][0] == '[' and len(parts[i + 1]) > 1 \
+                            and not _MARKER.fullmatch(parts[i + 1]):
+                        extra = parts[i + 1][1:-1].strip()
+                        i += 2
+                stack.append([name, extra, [], needed, awaiting, out])
+                awaiting = True
+                continue
+            if name in LIMIT_WORDS:
+                limits = name
+            word = _SPOKEN.get(name, "")
+        elif first == '$':
+            math = not math
+            word = ""
+        elif first == '\\':
+            if token in MATH_OPEN:
+                math = True
+            elif token in MATH_CLOSE:
+                math = False
+            word = " percent " if token == '\\%' else " "
+        elif first in _SPOKEN_OPERATORS:
+            word = _SPOKEN_OPERATORS[first]
+        elif first == '-':
+            word = " minus " if math else "-"
+        elif first == '/':
+            word = " over " if math else " "
+        else:
+            # markers, stage directions, "|" and stray brackets.
+            word = " "
+
+        if awaiting:
+            finish([word])
+        else:
+            out.append(word)
+
+    # Unclosed groups and missing arguments at the end read as empty.
+    while stack:
+        if awaiting:
+            finish([])
+        elif stack.pop()[1]:
+            finish(out)
+    return "".join(out)
+
+
+def verbalize(text):
+    if _SPECIAL.search(text):
+        text = _speak(text)
+    spoken = " ".join(text.split())
+    return _SPACE_BEFORE_PUNCTUATION.sub(r"\1", spoken)
+
+
+_LEGACY_PASSES = [(re.compile(p), r) for p, r in (
+    (r'\[SYNC:\s*\d+\]', ''), (r'\[PAUSE\]', ''), (r'\\[a-zA-Z]+(?:\{[^}]*\})*', ' '), (r'[\\{}_\^]', ' '),
+    (r'\$\$[^$]*\$\$', 'equation'), (r'\$[^$]*\$', 'symbol'), (r'[<>=+*/|]', ' '), (r'\[([^\]]+)\]', ''),
+    (r'\s+', ' '),
+)]
+
+
+def _legacy_clean(text):
+    # The regex cascade verbalize() replaced, kept as the benchmark baseline.
+    for pattern, replacement in _LEGACY_PASSES:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+BENCH_PROSE = (
+    "[SYNC: 0] A circle is the set of points at a fixed distance from its center. "
+    "[SYNC: 4] That distance is the radius, and twice the radius is the diameter. "
+    "[SYNC: 9] Walking once around the circle covers its circumference, a well-known length."
+)
+BENCH_NARRATION = (
+    "[SYNC: 0] The area under $f(x) = x^2$ from $0$ to $1$ is $\\int_0^1 x^2 \\, dx = \\frac{1}{3}$. [PAUSE] "
+    "[SYNC: 4] Taking $\\frac{\\partial f}{\\partial x}$ gives the slope, and $\\nabla f$ points uphill. "
+    "[SYNC: 9] With $\\alpha = 30^\\circ$, $\\sin\\alpha = \\frac{1}{2}$ and $\\sqrt{3}/2 \\approx 0.866$. "
+    "[SYNC: 14] Finally $\\sum_{n=1}^{\\infty} \\frac{1}{n^2} = \\frac{\\pi^2}{6}$, a well-known result."
+)
+
+
+def benchmark_verbalizer(batch=2000, runs=3):
+    timings = {}
+    for kind, narration in (('math', BENCH_NARRATION), ('prose', BENCH_PROSE)):
+        texts = [f"{narration} ({i})" for i in range(batch)]
+        for name, fn in (('legacy', _legacy_clean), ('verbalize', verbalize)):
+            values = timings.setdefault(f"{kind}/{name}", [])
+            for _ in range(runs):
+                start = time.perf_counter()
+                for text in texts:
+                    fn(text)
+                values.append(time.perf_counter() - start)
+    return timings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark narration cleanup: regex cascade vs verbalize()")
+    parser.add_argument("--batch", type=int, default=2000, help="Narration scripts per run")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per implementation")
+
+    args = parser.parse_args()
+
+    print(f"legacy:    {_legacy_clean(BENCH_NARRATION)}")
+    print(f"verbalize: {verbalize(BENCH_NARRATION)}\n")
+    timings = benchmark_verbalizer(args.batch, args.runs)
+    for name, values in timings.items():
+        best = min(values)
+        print(f"{name:>15}: min {best:.3f}s  {best / args.batch * 1e6:.1f}us per script  "
+              f"runs {', '.join(f'{v:.3f}' for v in values)}")
@@ -1,35 +1,32 @@
 import re
 import os
+import json
+import shutil
 import subprocess
 import tempfile
-from pathlib import Path
+
+import av
+
+from media_info import media_duration
+from tts_engine import get_speech_synthesizer
+from speech_text import verbalize
+from media_graph import MediaGraph
+from render_profiles import DEFAULT_RENDER_PROFILE
+from av_media import MIX_SAMPLE_RATE, mix_placements, mux_audio, use_av
 
 def extract_sync_points(narration_script):
     sync_points = []
     sections = re.findall(r'\[SYNC:\s*(\d+)\]\s*(.*?)(?=\[SYNC:|$)', narration_script, re.DOTALL)
     
     for timestamp, text in sections:
-        try:
-            from test_generate_video import clean_text_for_speech
-            clean_text = clean_text_for_speech(text.strip())
-        except ImportError:
-            clean_text = re.sub(r'\[SYNC:\s*\d+\]', '', text.strip())
-            clean_text = re.sub(r'\[PAUSE\]', '', clean_text)
-            clean_text = re.sub(r'\[([^\]]+)\]', '', clean_text)
-            clean_text = re.sub(r'\\[a-zA-Z]+(?:\{[^}]*\})*', '', clean_text)
-            clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-        
         sync_points.append({
             'timestamp': int(timestamp),
-            'text': clean_text
+            'text': verbalize(text)
         })
     
     return sync_points
 
-def create_segmented_audio(narration_script, output_dir):
-    from manim_code_generater import generate_synced_narration
-    from test_generate_video import text_to_speech
-    
+def select_sync_points(narration_script):
     sync_points = extract_sync_points(narration_script)
     
     if len(sync_points) > 6:  
@@ -52,40 +49,33 @@ def create_segmented_audio(narration_script, output_dir):
         else:
             pass
     
-    audio_segments = []
-    
     for i, point in enumerate(sync_points):
-        segment_file = os.path.join(output_dir, f"segment_{i:03d}.mp3")
-        
-        text = point['text']
-        words = text.split()
+        words = point['text'].split()
         if len(words) > 25:  
             print(f"Truncating sync point {i} from {len(words)} words to 25 words")
-            text = ' '.join(words[:25])
-            point['text'] = text
-            
-        if text_to_speech(text, segment_file):
-            audio_segments.append({
-                'timestamp': point['timestamp'],
-                'file': segment_file,
-                'text': text
-            })
+            point['text'] = ' '.join(words[:25])
     
-    return audio_segments
+    return sync_points
 
-def create_silence_file(duration_sec, output_file):
-    try:
-        cmd = [
-            "ffmpeg", "-f", "lavfi", "-i", 
-            f"anullsrc=r=44100:cl=stereo", "-t", 
-            str(duration_sec), "-q:a", "0", "-c:a", "libmp3lame",
-            output_file
-        ]
-        subprocess.run(cmd, check=True, capture_output=True)
-        return True
-    except subprocess.SubprocessError as e:
-        print(f"Error creating silence file: {e}")
-        return False
+def create_segmented_audio(narration_script, output_dir, voice_quality='high'):
+    sync_points = select_sync_points(narration_script)
+    
+    # Segments synthesize concurrently; phrases seen before come from the cache.
+    clips = get_speech_synthesizer().synthesize_many([point['text'] for point in sync_points], voice_quality)
+    
+    audio_segments = []
+    for i, (point, clip) in enumerate(zip(sync_points, clips)):
+        if not clip:
+            continue
+        segment_file = os.path.join(output_dir, f"segment_{i:03d}{os.path.splitext(clip)[1]}")
+        shutil.copyfile(clip, segment_file)
+        audio_segments.append({
+            'timestamp': point['timestamp'],
+            'file': segment_file,
+            'text': point['text']
+        })
+    
+    return audio_segments
 
 def analyze_video_pacing(video_path):
     try:
@@ -103,76 +93,114 @@ def analyze_video_pacing(video_path):
                 if match:
                     scene_changes.append(float(match.group(1)))
         
-        if len(scene_changes) >= 2:
-            durations = [scene_changes[i+1] - scene_changes[i] for i in range(len(scene_changes)-1)]
-            avg_scene_duration = sum(durations) / len(durations)
-        else:
-            avg_scene_duration = 3.0 
-            
-        return {
-            'scene_changes': scene_changes,
-            'avg_scene_duration': avg_scene_duration
-        }
+        return _pacing(scene_changes)
     except Exception as e:
         print(f"Error analyzing video pacing: {e}")
         return {'scene_changes': [], 'avg_scene_duration': 3.0}
 
-def assemble_synchronized_audio(audio_segments, total_duration, output_file, video_analysis=None):
-    with tempfile.TemporaryDirectory() as temp_dir:
-        concat_file = os.path.join(temp_dir, "concat_list.txt")
-        with open(concat_file, 'w') as f:
-            last_end_time = 0
-            for i, segment in enumerate(audio_segments):
-                current_time = segment['timestamp']
-                
-                if video_analysis and video_analysis['scene_changes']:
-                    closest_scene = min(video_analysis['scene_changes'], 
-                                       key=lambda x: abs(x - current_time))
-                    if abs(closest_scene - current_time) < 1.5:
-                        current_time = closest_scene
-                
-                if current_time > last_end_time:
-                    silence_duration = current_time - last_end_time
-                    silence_file = os.path.join(temp_dir, f"silence_{i:03d}.mp3")
-                    if create_silence_file(silence_duration, silence_file):
-                        f.write(f"file '{os.path.abspath(silence_file)}'\n")
-                
-                f.write(f"file '{os.path.abspath(segment['file'])}'\n")
-                
-                if 'text' in segment:
-                    word_count = len(segment['text'].split())
-                else:
-                    try:
-                        audio_info_cmd = ["ffprobe", "-i", segment['file'], "-show_format", "-v", "quiet", "-print_format", "json"]
-                        audio_info = subprocess.run(audio_info_cmd, capture_output=True, text=True)
-                        import json
-                        duration = float(json.loads(audio_info.stdout)["format"]["duration"])
-                        word_count = int(duration * 2.5)
-                    except:
-                        word_count = 10  
-                
-                segment_duration = max(1.5, word_count / 2.5)  
-                last_end_time = current_time + segment_duration
+def _pacing(scene_changes):
+    if len(scene_changes) >= 2:
+        durations = [scene_changes[i+1] - scene_changes[i] for i in range(len(scene_changes)-1)]
+        avg_scene_duration = sum(durations) / len(durations)
+    else:
+        avg_scene_duration = 3.0
+    return {'scene_changes': scene_changes, 'avg_scene_duration': avg_scene_duration}
+
+def read_render_timeline(timeline_path):
+    # The renderer's sidecar has the exact cut points: every self.clear() and
+    # the start of every animation that follows a pause.
+    try:
+        with open(timeline_path, 'r', encoding='utf-8') as f:
+            timeline = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read render timeline {timeline_path}: {e}")
+        return None
+    
+    changes = set()
+    last_end = None
+    for event in timeline.get('events', []):
+        if event['type'] == 'clear':
+            changes.add(event['time'])
+        elif event['type'] == 'animation':
+            if last_end is None or event['start'] > last_end:
+                changes.add(event['start'])
+            last_end = event['end']
+        else:
+            last_end = None
+    return _pacing(sorted(changes))
+
+def plan_audio_timeline(audio_segments, video_analysis=None):
+    # Start time of each segment: its sync timestamp (snapped to a nearby
+    # scene change), but never before the previous segment has finished.
+    placements = []
+    last_end_time = 0
+    for segment in audio_segments:
+        current_time = segment['timestamp']
         
-        if total_duration > last_end_time:
-            final_silence = os.path.join(temp_dir, "final_silence.mp3")
-            if create_silence_file(total_duration - last_end_time, final_silence):
-                with open(concat_file, 'a') as f:
-                    f.write(f"file '{os.path.abspath(final_silence)}'\n")
+        if video_analysis and video_analysis['scene_changes']:
+            closest_scene = min(video_analysis['scene_changes'], 
+                               key=lambda x: abs(x - current_time))
+            if abs(closest_scene - current_time) < 1.5:
+                current_time = closest_scene
         
-        try:
-            cmd = [
-                "ffmpeg", "-f", "concat", "-safe", "0",
-                "-i", concat_file, "-c:a", "libmp3lame",
-                "-q:a", "0", output_file
-            ]
-            subprocess.run(cmd, check=True)
-            return True
-        except subprocess.SubprocessError as e:
-            print(f"Error assembling audio: {e}")
-            return False
+        start_time = max(current_time, last_end_time)
+        duration = media_duration(segment['file'])
+        if not duration:
+            word_count = len(segment.get('text', '').split()) or 10
+            duration = max(1.5, word_count / 2.5)
+        
+        placement = {'file': segment['file'], 'start': start_time, 'duration': duration}
+        if 'samples' in segment:
+            placement['samples'] = segment['samples']
+        placements.append(placement)
+        last_end_time = start_time + duration
+    
+    return placements
 
-def synchronize_audio_with_video(video_path, narration_script_path, output_path):
+def assemble_synchronized_audio(audio_segments, total_duration, output_file, video_analysis=None):
+    placements = plan_audio_timeline(audio_segments, video_analysis)
+    if not placements:
+        return False
+    
+    # One ffmpeg run: every segment is delayed to its start time and the
+    # (non-overlapping) results are summed, instead of writing a silence file
+    # per gap and concatenating re-encoded pieces.
+    end_time = max(total_duration, placements[-1]['start'] + placements[-1]['duration'])
+    cmd = ["ffmpeg", "-y"]
+    filters = []
+    for i, placement in enumerate(placements):
+        cmd += ["-i", placement['file']]
+        delay_ms = int(round(placement['start'] * 1000))
+        # Padded to a common length so every input stays active for the whole
+        # mix and amix's 1/N scale is constant.
+        filters.append(f"[{i}:a]aformat=sample_rates=44100:channel_layouts=stereo,"
+                       f"adelay=delays={delay_ms}:all=1,apad=whole_dur={end_time:.3f}[a{i}]")
+    
+    # amix's normalize=0 needs ffmpeg 4.4; the Docker image ships 4.3, so the
+    # 1/N scale is undone with volume instead.
+    mix = "".join(f"[a{i}]" for i in range(len(placements)))
+    mix += f"amix=inputs={len(placements)}:duration=longest:dropout_transition=0,volume={len(placements)}"
+    filters.append(mix + "[out]")
+    
+    # PCM unless the caller asks for MP3; the only lossy encode should be the
+    # AAC track written by the final mux.
+    if output_file.endswith(".mp3"):
+        codec = ["-c:a", "libmp3lame", "-q:a", "0"]
+    else:
+        codec = ["-c:a", "pcm_s16le"]
+    cmd += ["-filter_complex", ";".join(filters), "-map", "[out]"] + codec + [output_file]
+    try:
+        subprocess.run(cmd, check=True)
+        return True
+    except subprocess.SubprocessError as e:
+        print(f"Error assembling audio: {e}")
+        return False
+
+def synchronize_audio_with_video(video_path, narration_script_path, output_path, audio_bitrate="128k", voice_quality='high',
+                                 speed_factor=1.0, profile=DEFAULT_RENDER_PROFILE, timeline_path=None, audio_segments=None,
+                                 offset=0.0):
+    # offset: seconds of intro clip spliced in front of the lesson; [SYNC:]
+    # timestamps count from the start of the lesson, not of the video.
     if isinstance(narration_script_path, str) and os.path.exists(narration_script_path):
         with open(narration_script_path, 'r', encoding='utf-8') as f:
             narration_script = f.read()
@@ -180,48 +208,59 @@ def synchronize_audio_with_video(video_path, narration_script_path, output_path)
         narration_script = narration_script_path 
         
     with tempfile.TemporaryDirectory() as temp_dir:
-        video_analysis = analyze_video_pacing(video_path)
-        duration_cmd = ["ffmpeg", "-i", video_path, "-f", "null", "-"]
-        result = subprocess.run(duration_cmd, stderr=subprocess.PIPE, text=True, check=False)
-        duration_match = re.search(r"Duration: (\d{2}):(\d{2}):(\d{2}\.\d{2})", result.stderr)
+        video_analysis = read_render_timeline(timeline_path) if timeline_path else None
+        if video_analysis is None:
+            video_analysis = analyze_video_pacing(video_path)
+        video_duration = media_duration(video_path)
         
-        if duration_match:
-            hours, minutes, seconds = map(float, duration_match.groups())
-            video_duration = hours * 3600 + minutes * 60 + seconds
+        if video_duration:
+            # The speed change happens in the final mux, so narration is laid
+            # out against the slowed-down timeline.
+            video_duration /= speed_factor
+            video_analysis['scene_changes'] = [t / speed_factor for t in video_analysis['scene_changes']]
             
-            audio_segments = create_segmented_audio(narration_script, temp_dir)
+            # Narration-first jobs synthesized (and timed the scene to) the
+            # segments before rendering.
+            if audio_segments is None:
+                audio_segments = create_segmented_audio(narration_script, temp_dir, voice_quality)
             if not audio_segments:
                 print("Error: Failed to create audio segments")
                 return False
+            if offset:
+                audio_segments = [dict(segment, timestamp=segment['timestamp'] + offset / speed_factor)
+                                  for segment in audio_segments]
+            
+            if use_av():
+                # Decode, place and mix the clips in memory and encode the
+                # result straight into the output; nothing else is written.
+                try:
+                    track = mix_placements(plan_audio_timeline(audio_segments, video_analysis), video_duration)
+                except (av.FFmpegError, OSError) as e:
+                    print(f"Error mixing narration in-process: {e}")
+                    track = None
+                if track is not None:
+                    print(f"Video duration: {video_duration:.1f}s, Audio duration: {track.shape[1] / MIX_SAMPLE_RATE:.1f}s")
+                    if mux_audio(video_path, track, output_path, audio_bitrate, speed_factor):
+                        print(f"Synchronized video created at {output_path}")
+                        return True
+                print("In-process mix failed, falling back to ffmpeg")
             
-            synchronized_audio = os.path.join(temp_dir, "synchronized_audio.mp3")
+            synchronized_audio = os.path.join(temp_dir, "synchronized_audio.wav")
             if not assemble_synchronized_audio(audio_segments, video_duration, synchronized_audio, video_analysis):
                 print("Error: Failed to assemble synchronized audio")
                 return False
             
-            audio_duration_cmd = ["ffmpeg", "-i", synchronized_audio, "-f", "null", "-"]
-            audio_result = subprocess.run(audio_duration_cmd, stderr=subprocess.PIPE, text=True, check=False)
-            audio_match = re.search(r"Duration: (\d{2}):(\d{2}):(\d{2}\.\d{2})", audio_result.stderr)
+            audio_duration = media_duration(synchronized_audio)
             
-            if audio_match:
-                hours, minutes, seconds = map(float, audio_match.groups())
-                audio_duration = hours * 3600 + minutes * 60 + seconds
-                
+            if audio_duration:
                 print(f"Video duration: {video_duration:.1f}s, Audio duration: {audio_duration:.1f}s")
                 
-                try:
-                    cmd = [
-                        "ffmpeg", "-i", video_path, "-i", synchronized_audio,
-                        "-map", "0:v", "-map", "1:a", 
-                        "-c:v", "copy", "-c:a", "aac", 
-                        "-shortest", output_path
-                    ]
-                    subprocess.run(cmd, check=True)
-                    print(f"Synchronized video created at {output_path}")
-                    return True
-                except subprocess.SubprocessError as e:
-                    print(f"Error combining video with synchronized audio: {e}")
+                graph = MediaGraph(video_path, profile).speed(speed_factor).audio(synchronized_audio, bitrate=audio_bitrate)
+                if not graph.run(output_path):
+                    print("Error combining video with synchronized audio")
                     return False
+                print(f"Synchronized video created at {output_path}")
+                return True
             else:
                 print("Error: Could not determine audio duration")
                 return False
@@ -1,221 +1,95 @@
 import os
-import tempfile
+import json
 import shutil
 import re
+import time
 import subprocess
-import glob
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import av
 from manim_code_generater import generate_and_validate
+from render_engine import RenderError, VECTOR_FORMAT_VERSION, export_vector, render_script
+from preflight import preflight_and_repair
+from artifact_store import artifact_key, get_artifact_store
+from render_profiles import DEFAULT_RENDER_PROFILE, get_profile, resolve_profile, record_render
+from render_scratch import ScratchSpace
+from media_info import media_duration
+from tts_engine import get_speech_synthesizer
+from speech_text import verbalize
+from media_graph import MediaGraph
+from av_media import decode_segments, encode_audio_file, mux_audio_file, use_av
+from narration_timing import NARRATION_FIRST, fit_scene_to_narration
 
-def clean_text_for_speech(text):
-    cleaned = re.sub(r'\[SYNC:\s*\d+\]', '', text)
-    
-    cleaned = re.sub(r'\[PAUSE\]', '', cleaned)
-    
-    cleaned = re.sub(r'\\[a-zA-Z]+(?:\{[^}]*\})*', ' ', cleaned)
-    
-    cleaned = re.sub(r'[\\{}_\^]', ' ', cleaned)
-    
-    cleaned = re.sub(r'\$\$[^$]*\$\$', 'equation', cleaned) 
-    cleaned = re.sub(r'\$[^$]*\$', 'symbol', cleaned)  
-    
-    cleaned = re.sub(r'[<>=+*/|]', ' ', cleaned)
-    
-    cleaned = re.sub(r'\[([^\]]+)\]', '', cleaned)
-    
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    
-    replacements = {
-        'K_{\mu\nu}': 'K mu nu',
-        '\dot{g}_{\mu\nu}': 'g dot mu nu',
-        '\partial': 'partial',
-        '\nabla': 'del',
-        '\infty': 'infinity',
-        '\int': 'integral',
-        '\sum': 'sum',
-        '\prod': 'product',
-    }
-    
-    for old, new in replacements.items():
-        cleaned = cleaned.replace(old, new)
-    
-    return cleaned.strip()
+NARRATION_WORKERS = int(os.environ.get("NARRATION_WORKERS", "2"))
 
 def text_to_speech(text, output_file, voice_quality='high'):
-    try:
-        cleaned_text = clean_text_for_speech(text)
-        
-        output_file = str(output_file)
-        
-        try:
-            from gtts import gTTS
-            tts = gTTS(text=cleaned_text, lang='en', slow=False)
-            tts.save(output_file)
-            print(f"Audio generated with gTTS and saved to {output_file}")
-            return True
-        except ImportError:
-            print("gTTS not available, trying alternative TTS...")
-        
-        try:
-            import pyttsx3
-            engine = pyttsx3.init()
-            
-            if voice_quality == 'high':
-                voices = engine.getProperty('voices')
-                if len(voices) > 1:
-                    engine.setProperty('voice', voices[1].id)
-                
-                engine.setProperty('rate', 150)  
-                engine.setProperty('volume', 0.9) 
-            
-            engine.save_to_file(cleaned_text, output_file)
-            engine.runAndWait()
-            print(f"Audio generated with pyttsx3 and saved to {output_file}")
-            
-            if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-                return True
-            else:
-                print(f"Warning: Audio file was not created at {output_file}")
-                return False
-                
-        except ImportError:
-            print("pyttsx3 not available, trying system commands...")
-        
-        if os.name == 'posix':
-            if os.path.exists('/usr/bin/say'):  
-                subprocess.run(['say', '-o', output_file, cleaned_text], check=True)
-                print(f"Audio generated with macOS 'say' command and saved to {output_file}")
-                return True
-            elif os.path.exists('/usr/bin/espeak'):  
-                subprocess.run(['espeak', '-w', output_file, cleaned_text], check=True)
-                print(f"Audio generated with 'espeak' command and saved to {output_file}")
-                return True
-        elif os.name == 'nt':
-            try:
-              
-                ps_script = f'Add-Type -AssemblyName System.Speech; $synth = New-Object System.Speech.Synthesis.SpeechSynthesizer; $synth.SetOutputToWaveFile("{output_file}"); $synth.Speak("{cleaned_text}"); $synth.Dispose();'
-                subprocess.run(['powershell', '-command', ps_script], check=True, capture_output=True)
-                print(f"Audio generated with Windows speech synthesis and saved to {output_file}")
-                return True
-            except subprocess.SubprocessError:
-                pass
-                
-        print("No TTS library or command found. Please install gtts or pyttsx3:")
+    cleaned_text = verbalize(text)
+    cached_path = get_speech_synthesizer().synthesize(cleaned_text, voice_quality)
+    if not cached_path:
+        print("No TTS backend could synthesize the narration. Install gtts (online) or pyttsx3/espeak (offline):")
         print("pip install gtts pyttsx3")
         return False
     
-    except Exception as e:
-        print(f"Error generating audio: {e}")
-        return False
-
-def combine_video_audio(video_path, audio_path, output_path):
-    try:
-        
-        video_path = str(video_path)
-        audio_path = str(audio_path)
-        output_path = str(output_path)
-        
-        if not os.path.exists(video_path):
-            print(f"Error: Video file does not exist: {video_path}")
-            return False
-            
-        if not os.path.exists(audio_path):
-            print(f"Error: Audio file does not exist: {audio_path}")
-            return False
-        
-        print(f"Combining video ({video_path}) with audio ({audio_path})")
-        
-        try:
-            subprocess.run(["ffmpeg", "-version"], check=True, capture_output=True)
-        except (FileNotFoundError, subprocess.SubprocessError):
-            print("Error: ffmpeg not found. Please install ffmpeg and make sure it's in your PATH.")
-            return False
+    # The clip keeps the format it was cached in (PCM WAV for every backend
+    # PyAV can convert); output_file's extension is replaced to match.
+    output_file = os.path.splitext(str(output_file))[0] + os.path.splitext(cached_path)[1]
+    shutil.copyfile(cached_path, output_file)
+    print(f"Audio generated and saved to {output_file}")
+    return output_file
 
-        video_duration_cmd = ["ffmpeg", "-i", video_path, "-f", "null", "-"]
-        result = subprocess.run(video_duration_cmd, stderr=subprocess.PIPE, text=True, check=False)
-        duration_match = re.search(r"Duration: (\d{2}):(\d{2}):(\d{2}\.\d{2})", result.stderr)
-        
-        if duration_match:
-            hours, minutes, seconds = map(float, duration_match.groups())
-            video_duration = hours * 3600 + minutes * 60 + seconds
-            print(f"Video duration: {video_duration:.2f} seconds")
-            
-            audio_duration_cmd = ["ffmpeg", "-i", audio_path, "-f", "null", "-"]
-            audio_result = subprocess.run(audio_duration_cmd, stderr=subprocess.PIPE, text=True, check=False)
-            audio_match = re.search(r"Duration: (\d{2}):(\d{2}):(\d{2}\.\d{2})", audio_result.stderr)
-            
-            if audio_match:
-                hours, minutes, seconds = map(float, audio_match.groups())
-                audio_duration = hours * 3600 + minutes * 60 + seconds
-                print(f"Audio duration: {audio_duration:.2f} seconds")
-                
-                audio_input = audio_path
-                if audio_duration < video_duration:
-                    print("Audio is shorter than video, extending audio...")
-                    loops = int(video_duration / audio_duration) + 1
-                    temp_audio = output_path.replace(".mp4", "_temp.mp3")
-                    loop_cmd = [
-                        "ffmpeg", "-i", audio_path, 
-                        "-filter_complex", f"aloop=loop={loops}:size=32767", 
-                        "-t", str(video_duration), temp_audio
-                    ]
-                    subprocess.run(loop_cmd, check=True)
-                    audio_input = temp_audio
-                
-                cmd = [
-                    "ffmpeg", 
-                    "-i", video_path, 
-                    "-i", audio_input, 
-                    "-map", "0:v", 
-                    "-map", "1:a", 
-                    "-c:v", "copy", 
-                    "-shortest",
-                    output_path
-                ]
-                
-                subprocess.run(cmd, check=True)
-                print(f"Video with audio saved to {output_path}")
-                
-                if audio_input != audio_path and os.path.exists(audio_input):
-                    os.remove(audio_input)
-                
-                return True
-        
-        print("Combining video and audio directly...")
-        cmd = [
-            "ffmpeg", 
-            "-i", video_path, 
-            "-i", audio_path, 
-            "-c:v", "copy", 
-            "-c:a", "aac", 
-            "-shortest", 
-            output_path
-        ]
-        subprocess.run(cmd, check=True)
-        print(f"Video with audio saved to {output_path}")
-        return True
+def combine_video_audio(video_path, audio_path, output_path, audio_bitrate="128k", speed_factor=1.0,
+                        profile=DEFAULT_RENDER_PROFILE, delay=0.0):
+    # delay: seconds (of output) before the narration starts, i.e. the intro clip.
+    video_path = str(video_path)
+    audio_path = str(audio_path)
+    output_path = str(output_path)
+    
+    if not os.path.exists(video_path):
+        print(f"Error: Video file does not exist: {video_path}")
+        return False
         
-    except subprocess.SubprocessError as e:
-        print(f"Error combining video and audio: {e}")
+    if not os.path.exists(audio_path):
+        print(f"Error: Audio file does not exist: {audio_path}")
         return False
-
-def adjust_video_speed(video_path, output_path, speed_factor=0.75):
+    
+    print(f"Combining video ({video_path}) with audio ({audio_path})")
+    if speed_factor != 1.0:
+        print(f"Slowing video down by factor {1.0 / speed_factor:.2f} to better match narration")
+    
+    if use_av():
+        # Loops or cuts the narration to the video's length while copying the
+        # video packets, without starting ffmpeg.
+        if mux_audio_file(video_path, audio_path, output_path, audio_bitrate, speed_factor, loop=True, delay=delay):
+            print(f"Video with audio saved to {output_path}")
+            return True
+        print("In-process mux failed, falling back to ffmpeg")
+    
     try:
-        slowdown_factor = 1.0 / speed_factor
-        cmd = [
-            "ffmpeg", "-i", video_path,
-            "-filter:v", f"setpts={slowdown_factor}*PTS",
-            "-c:v", "libx264", "-preset", "medium", "-crf", "23",
-            output_path
-        ]
-        subprocess.run(cmd, check=True)
-        print(f"Video speed adjusted (slowed down by factor: {slowdown_factor:.2f}) and saved to {output_path}")
-        return True
-    except subprocess.SubprocessError as e:
-        print(f"Error adjusting video speed: {e}")
+        subprocess.run(["ffmpeg", "-version"], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.SubprocessError):
+        print("Error: ffmpeg not found. Please install ffmpeg and make sure it's in your PATH.")
+        return False
+    
+    # Speed change, audio loop and mux run as one ffmpeg process.
+    graph = MediaGraph(video_path, profile).speed(speed_factor).audio(audio_path, bitrate=audio_bitrate, delay=delay)
+    
+    video_duration = media_duration(video_path)
+    audio_duration = media_duration(audio_path)
+    if video_duration and audio_duration:
+        video_duration /= speed_factor
+        print(f"Video duration: {video_duration:.2f} seconds, audio duration: {audio_duration:.2f} seconds")
+        if delay + audio_duration < video_duration:
+            print("Audio is shorter than video, looping it...")
+            graph.audio(audio_path, bitrate=audio_bitrate, loop=True, delay=delay).trim(video_duration)
+    
+    if not graph.run(output_path):
         return False
+    print(f"Video with audio saved to {output_path}")
+    return True
 
-def generate_educational_video(prompt, with_audio=True, sync_narration=False, voice_quality='high', adjust_speed=False):
+def prepare_video_script(prompt, with_audio=True, sync_narration=False):
     print(f"Generating Manim code for: {prompt}")
     
     manim_prompt = f"An educational video about: {prompt}."
@@ -257,154 +131,407 @@ def generate_educational_video(prompt, with_audio=True, sync_narration=False, vo
     print("\nManim code generated:")
     print(manim_code)
     
+    print("\nRunning pre-flight check (animations skipped)...")
+    manim_code = preflight_and_repair(manim_code)
+    if manim_code is None:
+        return None, None, None
+    
     if sync_narration and narration_script and "[SYNC:" in narration_script:
         print("\nProcessing synchronized narration script...")
         processed_script = process_synced_narration(narration_script)
     else:
         processed_script = narration_script
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        script_path = os.path.join(temp_dir, "manim_script.py")
-        with open(script_path, "w", encoding='utf-8') as f:
-            f.write(manim_code)
-        
-        scene_class_match = re.search(r"class\s+(\w+)\s*\(\s*Scene\s*\)", manim_code)
-        if not scene_class_match:
-            print("Could not detect a Scene class in the generated code.")
+    return manim_code, narration_script, processed_script
+
+def generate_educational_video(prompt, with_audio=True, sync_narration=False, voice_quality='high', adjust_speed=False, profile=DEFAULT_RENDER_PROFILE):
+    manim_code, narration_script, processed_script = prepare_video_script(prompt, with_audio, sync_narration)
+    if manim_code is None:
+        print("Failed to generate a working scene")
+        return None
+    
+    return render_educational_video(prompt, manim_code, narration_script, processed_script,
+                                    with_audio=with_audio, sync_narration=sync_narration,
+                                    voice_quality=voice_quality, adjust_speed=adjust_speed,
+                                    profile=profile)
+
+def generate_progressive_video(prompt, on_final, with_audio=True, sync_narration=False, voice_quality='high',
+                               adjust_speed=False, preview_profile="preview", final_profile=DEFAULT_RENDER_PROFILE):
+    manim_code, narration_script, processed_script = prepare_video_script(prompt, with_audio, sync_narration)
+    if manim_code is None:
+        print("Failed to generate a working scene")
+        return None
+    
+    print(f"Rendering {preview_profile} preview...")
+    preview_path = render_educational_video(prompt, manim_code, narration_script, processed_script,
+                                            with_audio=False, profile=preview_profile)
+    
+    def render_final():
+        print(f"Rendering {final_profile} version in the background...")
+        final_path = None
+        try:
+            final_path = render_educational_video(prompt, manim_code, narration_script, processed_script,
+                                                  with_audio=with_audio, sync_narration=sync_narration,
+                                                  voice_quality=voice_quality, adjust_speed=adjust_speed,
+                                                  profile=final_profile)
+        except Exception as e:
+            print(f"Background render failed: {e}")
+        on_final(final_path)
+    
+    # The copied context carries the caller's job, which collects the render timings.
+    threading.Thread(target=contextvars.copy_context().run, args=(render_final,), daemon=True).start()
+    
+    return preview_path
+
+def generate_streaming_video(prompt, on_section, on_final, with_audio=True, sync_narration=False,
+                             voice_quality='high', adjust_speed=False, profile=DEFAULT_RENDER_PROFILE):
+    # Sections are handed to on_section as soon as they render, with the
+    # narration track once it is synthesized (audio_path); on_final
+    # gets the finished, narrated video.
+    def run():
+        final_path = None
+        try:
+            manim_code, narration_script, processed_script = prepare_video_script(prompt, with_audio, sync_narration)
+            if manim_code is None:
+                print("Failed to generate a working scene")
+            else:
+                final_path = render_educational_video(prompt, manim_code, narration_script, processed_script,
+                                                      with_audio=with_audio, sync_narration=sync_narration,
+                                                      voice_quality=voice_quality, adjust_speed=adjust_speed,
+                                                      profile=profile, on_section=on_section)
+        except Exception as e:
+            print(f"Streaming render failed: {e}")
+        on_final(final_path)
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True)
+    thread.start()
+    return thread
+
+def generate_vector_video(prompt, with_audio=True, voice_quality='high', profile=DEFAULT_RENDER_PROFILE, on_fallback=None):
+    # Timeline JSON for the client's vector player; scenes it can't draw get the MP4.
+    # With on_fallback, the MP4 is rendered in the background as well and handed
+    # to it, for browsers where the player fails.
+    manim_code, narration_script, processed_script = prepare_video_script(prompt, with_audio)
+    if manim_code is None:
+        print("Failed to generate a working scene")
+        return None
+    
+    timeline_path = render_vector_lesson(prompt, manim_code, narration_script, processed_script,
+                                         with_audio=with_audio, voice_quality=voice_quality)
+    if timeline_path:
+        if on_fallback:
+            def render_fallback():
+                video_path = None
+                try:
+                    video_path = render_educational_video(prompt, manim_code, narration_script, processed_script,
+                                                          with_audio=with_audio, voice_quality=voice_quality,
+                                                          profile=profile)
+                except Exception as e:
+                    print(f"Fallback render failed: {e}")
+                if video_path:
+                    print(f"Vector lesson {os.path.getsize(timeline_path) / 1024:.1f} KB, "
+                          f"{profile} MP4 {os.path.getsize(video_path) / 1024:.1f} KB")
+                on_fallback(video_path)
+            
+            threading.Thread(target=contextvars.copy_context().run, args=(render_fallback,), daemon=True).start()
+        return {'vector': timeline_path, 'video': None}
+    
+    print("Vector export not possible, rendering MP4 instead...")
+    video_path = render_educational_video(prompt, manim_code, narration_script, processed_script,
+                                          with_audio=with_audio, voice_quality=voice_quality, profile=profile)
+    if not video_path:
+        return None
+    return {'vector': None, 'video': video_path}
+
+def render_vector_lesson(prompt, manim_code, narration_script, processed_script, with_audio=True, voice_quality='high'):
+    narrated = bool(with_audio and processed_script)
+    settings = {
+        'format': 'vector',
+        'format_version': VECTOR_FORMAT_VERSION,
+        'with_audio': narrated,
+        'voice_quality': voice_quality,
+    }
+    key = artifact_key(manim_code, narration_script if narrated else None, settings)
+    audio_key = f"{key}-narration"
+    
+    store = get_artifact_store()
+    cached_path = store.lookup(key)
+    # The narration is a separate artifact and may have been evicted on its own.
+    if cached_path and (not narrated or store.lookup(audio_key)):
+        print(f"Artifact cache hit ({key}), skipping export: {cached_path}")
+        if narrated:
+            # Only the timeline is handed to the caller (and released when published).
+            store.release(audio_key)
+        return cached_path
+    if cached_path:
+        # Re-exported below; don't pin the stale timeline meanwhile.
+        store.release(key)
+    
+    start = time.perf_counter()
+    with ScratchSpace(key) as scratch:
+        timeline_path = os.path.join(scratch.dir_for("vector"), f"{key}.json")
+        try:
+            result = export_vector(manim_code, timeline_path, work_dir=scratch.dir_for("render"))
+        except RenderError as e:
+            print(f"Vector export failed: {e}")
+            print(e.details)
+            return None
+        if result is None:
             return None
         
-        scene_class = scene_class_match.group(1)
-        print(f"Detected scene class: {scene_class}")
+        audio_artifact = None
+        if narrated:
+            print("Generating audio narration...")
+            audio_path = text_to_speech(processed_script, os.path.join(scratch.dir_for("audio"), f"{key}_audio"),
+                                        voice_quality=voice_quality)
+            if audio_path and os.path.getsize(audio_path) > 0:
+                # The browser gets one AAC encode of the PCM narration.
+                narration_path = os.path.join(scratch.dir_for("audio"), f"{key}_narration.m4a")
+                try:
+                    audio_path = encode_audio_file(audio_path, narration_path)
+                except (av.FFmpegError, OSError) as e:
+                    print(f"Could not encode the narration to AAC, storing it as is: {e}")
+                audio_artifact = store.put(audio_key, audio_path, metadata={'prompt': prompt[:200], 'narration_for': key})
+            else:
+                print("Audio narration failed, exporting the timeline without it")
+                settings['with_audio'] = False
+                key = artifact_key(manim_code, None, settings)
         
-        import hashlib
-        output_id = hashlib.md5(prompt.encode()).hexdigest()[:8]
+        if audio_artifact:
+            # The player resolves the narration next to the timeline's own URL.
+            with open(timeline_path, 'r', encoding='utf-8') as f:
+                timeline = json.load(f)
+            timeline['audio'] = os.path.basename(audio_artifact)
+            with open(timeline_path, 'w', encoding='utf-8') as f:
+                json.dump(timeline, f, separators=(',', ':'))
+            store.release_path(audio_artifact)
         
-        output_dir = Path("videos")
-        output_dir.mkdir(exist_ok=True)
-        output_video = output_dir / f"{output_id}.mp4"
+        render_time = time.perf_counter() - start
+        size_bytes = os.path.getsize(timeline_path)
+        print(f"Vector lesson {key}: {size_bytes / 1024:.1f} KB timeline in {render_time:.1f}s")
         
-        media_dir = os.path.join(temp_dir, "media")
-        os.makedirs(media_dir, exist_ok=True)
+        metadata = {'prompt': prompt[:200], 'render_time': render_time, 'size_bytes': size_bytes, **settings}
+        return store.put(key, timeline_path, metadata=metadata)
+
+def render_educational_video(prompt, manim_code, narration_script, processed_script, with_audio=True,
+                             sync_narration=False, voice_quality='high', adjust_speed=False, profile=DEFAULT_RENDER_PROFILE,
+                             on_section=None):
+    narrated = bool(with_audio and processed_script)
+    profile = resolve_profile(profile)
+    settings = {
+        'profile': profile,
+        # Editing a profile's encoder settings invalidates its artifacts.
+        'profile_settings': get_profile(profile),
+        'with_audio': narrated,
+        'sync_narration': sync_narration,
+        'voice_quality': voice_quality,
+        'adjust_speed': adjust_speed,
+        'narration_first': narrated and _narration_first(sync_narration, narration_script),
+    }
+    key = artifact_key(manim_code, narration_script if narrated else None, settings)
+    
+    store = get_artifact_store()
+    cached_path = store.lookup(key)
+    if cached_path:
+        print(f"Artifact cache hit ({key}), skipping render: {cached_path}")
+        return cached_path
+    
+    start = time.perf_counter()
+    with ScratchSpace(key) as scratch:
+        result = _render_video_files(scratch, key, manim_code, narration_script, processed_script,
+                                     with_audio=with_audio, sync_narration=sync_narration,
+                                     voice_quality=voice_quality, adjust_speed=adjust_speed,
+                                     profile=profile, on_section=on_section)
+        if result is None:
+            return None
+        
+        final_path, has_audio = result
+        if narrated and not has_audio:
+            settings['with_audio'] = False
+            key = artifact_key(manim_code, None, settings)
+        
+        render_time = time.perf_counter() - start
+        size_bytes = os.path.getsize(final_path)
+        record_render(profile, render_time, size_bytes)
         
-        print("Generating video, please wait...")
-        cmd = [
-            "python", "-m", "manim", 
-            script_path, 
-            scene_class,
-            "-o", output_id,
-            "--media_dir", media_dir,
-            "-q", "m"  
-        ]
+        # Everything but the artifact itself stays in scratch and is dropped.
+        io = dict(scratch.usage(), artifact_bytes=size_bytes)
+        print(f"Job {key} peaked at {io['peak_bytes'] / (1024 * 1024):.1f} MB of scratch, "
+              f"ended holding {io['scratch_end_bytes'] / (1024 * 1024):.1f} MB in scratch and "
+              f"{io['disk_end_bytes'] / (1024 * 1024):.1f} MB spilled to disk, "
+              f"{size_bytes / (1024 * 1024):.1f} MB artifact")
         
+        metadata = {'prompt': prompt[:200], 'render_time': render_time, 'size_bytes': size_bytes, 'io': io, **settings}
+        return store.put(key, final_path, metadata=metadata)
+
+# Narration for a job is synthesized on one of these threads while its
+# render runs in the render pool.
+_narration_pool = ThreadPoolExecutor(max_workers=NARRATION_WORKERS, thread_name_prefix="narration")
+
+def _discard(narration):
+    # The job's scratch space is about to go away; don't leave a synthesis
+    # writing into it.
+    if narration is not None and not narration.cancel():
+        narration.exception()
+
+def _stream_with_narration(on_section, narration):
+    # Sections go out from their own thread, each with the narration track
+    # (cut to the section by the stream), so neither the render nor the intro
+    # clip waits on the synthesis. As in the final video, the intro is silent
+    # and the narration starts with the lesson (audio_start).
+    streamer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream")
+    lead = {'intro': 0.0}
+
+    def send(index, part):
+        if index == 0 and part.get('clip'):
+            # A silent track, so every segment of the stream has audio.
+            lead['intro'] = part['duration']
+            section = dict(part, audio_path=None, silent=True)
+        else:
+            audio_path = None
+            try:
+                audio_path = narration.result()['audio_path']
+            except Exception as e:
+                print(f"Narration failed, streaming section {index} without it: {e}")
+            section = dict(part, audio_path=audio_path, audio_start=lead['intro'])
         try:
-            process = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            print("Manim execution stdout:")
-            print(process.stdout)
-            
-            file_ready_match = re.search(r"File ready at\s+'(.+?\.mp4)'", process.stdout)
-            
-            if file_ready_match:
-                generated_video_path = file_ready_match.group(1)
-                print(f"Found video path in output: {generated_video_path}")
-            else:
-                print("Searching for the video file...")
-                video_pattern = os.path.join(media_dir, "**", f"*{output_id}.mp4")
-                video_files = glob.glob(video_pattern, recursive=True)
-                
-                if (video_files):
-                    generated_video_path = video_files[0]
-                    print(f"Found video by searching: {generated_video_path}")
-                else:
-                    video_files = glob.glob(os.path.join(media_dir, "**", "*.mp4"), recursive=True)
-                    if video_files:
-                        video_files.sort(key=os.path.getctime, reverse=True)
-                        generated_video_path = video_files[0]
-                        print(f"Found most recent video: {generated_video_path}")
-                    else:
-                        print("ERROR: Could not find any generated video files")
-                        return None
-            
-            if os.path.exists(generated_video_path):
-                try:
-                    shutil.copy(generated_video_path, output_video)
-                    print(f"\nVideo successfully generated and saved to: {output_video}")
-                except Exception as e:
-                    print(f"Error copying video file: {e}")
-                    return None
-            else:
-                print(f"ERROR: Found video path '{generated_video_path}' but file does not exist")
-                return None
-                
-        except subprocess.CalledProcessError as e:
-            print(f"Manim execution failed with return code {e.returncode}")
-            print("STDOUT:", e.stdout)
-            print("STDERR:", e.stderr)
-            print("\nFailed to generate video")
-            print("Make sure FFmpeg and LaTeX (optional) are properly installed.")
-            return None
+            on_section(index, section)
         except Exception as e:
-            print(f"An unexpected error occurred: {str(e)}")
-            return None
+            print(f"Could not stream section {index}: {e}")
+
+    return (lambda index, part: streamer.submit(send, index, part)), streamer
+
+def _narration_first(sync_narration, narration_script):
+    return NARRATION_FIRST and sync_narration and bool(narration_script) and "[SYNC:" in narration_script
+
+def _prepare_narration(processed_script, narration_script, audio_path, audio_dir, voice_quality, sync, audio_segments):
+    # Runs alongside the render: everything the mux needs that doesn't depend
+    # on the finished video.
+    prepared = {'audio_path': None, 'segments': audio_segments}
+    audio_path = text_to_speech(processed_script, audio_path, voice_quality=voice_quality)
+    if audio_path and os.path.getsize(audio_path) > 0:
+        prepared['audio_path'] = audio_path
+    if sync and prepared['segments'] is None:
+        from sync_audio_video import create_segmented_audio
+        prepared['segments'] = create_segmented_audio(narration_script, audio_dir, voice_quality) or None
+    if prepared['segments'] and use_av():
+        decode_segments(prepared['segments'])
+    return prepared
+
+def _render_video_files(scratch, output_id, manim_code, narration_script, processed_script, with_audio=True,
+                        sync_narration=False, voice_quality='high', adjust_speed=False, profile=DEFAULT_RENDER_PROFILE,
+                        on_section=None):
+    output_dir = Path(scratch.dir_for("videos"))
+    output_video = output_dir / f"{output_id}.mp4"
+    audio_dir = os.path.abspath(scratch.dir_for("audio"))
+    sync = bool(sync_narration and narration_script and "[SYNC:" in narration_script)
+    
+    audio_segments = None
+    if with_audio and processed_script and _narration_first(sync_narration, narration_script):
+        print("Synthesizing narration first and fitting the scene timing to it...")
+        fitted = fit_scene_to_narration(manim_code, narration_script, audio_dir, voice_quality)
+        if fitted:
+            manim_code, audio_segments = fitted
+        else:
+            print("Could not fit the scene to its narration, syncing after the render instead")
+    
+    narration = None
+    if with_audio and processed_script:
+        print("Generating audio narration while the video renders...")
+        audio_path = os.path.join(audio_dir, f"{output_id}_audio")
+        narration = _narration_pool.submit(_prepare_narration, processed_script, narration_script, audio_path,
+                                           audio_dir, voice_quality, sync, audio_segments)
+    
+    streamer = None
+    if on_section and narration is not None:
+        on_section, streamer = _stream_with_narration(on_section, narration)
+    
+    print("Generating video, please wait...")
+    
+    try:
+        result = render_script(manim_code, str(output_video), profile=profile, on_section=on_section,
+                               work_dir=scratch.dir_for("render"))
+        print(f"\nVideo successfully generated and saved to: {result['path']}")
+    except RenderError as e:
+        print(f"Manim execution failed: {e}")
+        print(e.details)
+        print("\nFailed to generate video")
+        print("Make sure FFmpeg and LaTeX (optional) are properly installed.")
+        _discard(narration)
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred: {str(e)}")
+        _discard(narration)
+        return None
+    finally:
+        # Every streamed section has to be segmented before the caller ends
+        # the stream and the scratch space goes away.
+        if streamer is not None:
+            streamer.shutdown(wait=True)
+    
+    if not os.path.exists(output_video):
+        print(f"ERROR: Expected output video not found at {output_video}")
+        _discard(narration)
+        return None
         
-        if not os.path.exists(output_video):
-            print(f"ERROR: Expected output video not found at {output_video}")
-            return None
+    if narration is not None:
+        try:
+            prepared = narration.result()
+        except Exception as e:
+            print(f"Narration failed: {e}")
+            prepared = {'audio_path': None, 'segments': None}
+        audio_path = prepared['audio_path']
+        
+        if audio_path:
+            print(f"Audio narration ready at {audio_path}")
             
-        if with_audio and processed_script:
-            print("Generating audio narration...")
-            audio_dir = os.path.abspath(str(output_dir))
-            audio_path = os.path.join(audio_dir, f"{output_id}_audio.mp3")
+            output_video_abs = os.path.abspath(str(output_video))
+            # Applied while muxing rather than as a separate re-encode.
+            # A scene fitted to its narration already runs at the right pace.
+            speed_factor = 0.75 if adjust_speed and audio_segments is None else 1.0
             
-            if text_to_speech(processed_script, audio_path, voice_quality=voice_quality):
-                print("Audio narration generated successfully")
-                
-                if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
-                    print(f"Audio file confirmed at {audio_path}")
-                    
-                    output_video_abs = os.path.abspath(str(output_video))
-                    
-                    if adjust_speed:
-                        print("Adjusting video speed to better match narration...")
-                        slowed_video_path = os.path.join(audio_dir, f"{output_id}_slowed.mp4")
-                        
-                        if adjust_video_speed(output_video_abs, slowed_video_path, speed_factor=0.75):
-                            print("Video speed adjusted successfully")
-                            output_video_abs = slowed_video_path
-                    
-                    output_with_audio = os.path.join(audio_dir, f"{output_id}_with_audio.mp4")
-                    
-                    if sync_narration and "[SYNC:" in narration_script:
-                        print("Using advanced audio-video synchronization...")
-                        try:
-                            from sync_audio_video import synchronize_audio_with_video
-                            script_file = os.path.join(audio_dir, f"{output_id}_narration.txt")
-                            with open(script_file, 'w', encoding='utf-8') as f:
-                                f.write(narration_script)
-                            
-                            if synchronize_audio_with_video(output_video_abs, script_file, output_with_audio):
-                                print(f"Synchronized video created at {output_with_audio}")
-                                return output_with_audio
-                        except ImportError:
-                            print("Advanced synchronization not available, falling back to standard method")
-                            pass
-                    
-                    print("Combining video and audio...")
-                    if combine_video_audio(output_video_abs, audio_path, output_with_audio):
-                        print(f"Video with audio created at {output_with_audio}")
-                        return output_with_audio
-                else:
-                    print(f"Error: Audio file not found at {audio_path}")
+            output_with_audio = os.path.join(audio_dir, f"{output_id}_with_audio.mp4")
             
-            print("Audio processing failed or skipped, returning video without audio")
+            if sync:
+                print("Using advanced audio-video synchronization...")
+                try:
+                    from sync_audio_video import synchronize_audio_with_video
+                    script_file = os.path.join(audio_dir, f"{output_id}_narration.txt")
+                    with open(script_file, 'w', encoding='utf-8') as f:
+                        f.write(narration_script)
+                    
+                    if synchronize_audio_with_video(output_video_abs, script_file, output_with_audio,
+                                                    audio_bitrate=get_profile(profile)['audio_bitrate'],
+                                                    voice_quality=voice_quality, speed_factor=speed_factor,
+                                                    profile=profile, timeline_path=result.get('timeline'),
+                                                    audio_segments=prepared['segments'],
+                                                    offset=result.get('intro_duration', 0.0)):
+                        print(f"Synchronized video created at {output_with_audio}")
+                        return output_with_audio, True
+                except ImportError:
+                    print("Advanced synchronization not available, falling back to standard method")
+                    pass
             
-        return str(output_video)
+            print("Combining video and audio...")
+            if combine_video_audio(output_video_abs, audio_path, output_with_audio,
+                                   audio_bitrate=get_profile(profile)['audio_bitrate'],
+                                   speed_factor=speed_factor, profile=profile,
+                                   delay=result.get('intro_duration', 0.0) / speed_factor):
+                print(f"Video with audio created at {output_with_audio}")
+                return output_with_audio, True
+        else:
+            print("Error: No audio narration was generated")
+        
+        print("Audio processing failed or skipped, returning video without audio")
+        
+    return str(output_video), False
 
 def process_synced_narration(narration_script):
     sections = re.findall(r'\[SYNC:\s*(\d+)\]\s*(.*?)(?=\[SYNC:|$)', narration_script, re.DOTALL)
     
     if not sections:
         print("Warning: Could not parse synchronized narration markers. Using script as is.")
-        return clean_text_for_speech(narration_script)
+        return verbalize(narration_script)
     
     if len(sections) > 5:
         print(f"Warning: Found {len(sections)} sync points, which is more than recommended. Using only the first 5.")
@@ -412,7 +539,7 @@ def process_synced_narration(narration_script):
     
     processed_sections = []
     for timestamp, content in sections:
-        cleaned_content = clean_text_for_speech(content)
+        cleaned_content = verbalize(content)
         
         words = cleaned_content.split()
         if len(words) > 20:
@@ -458,7 +585,6 @@ if __name__ == "__main__":
             if os.name == 'nt':  
                 os.startfile(video_path)
             elif os.name == 'posix':  
-                import subprocess
                 subprocess.call(('open' if os.uname().sysname == 'Darwin' else 'xdg-open', video_path))
         except Exception as e:
             print(f"Could not automatically open the video: {e}")
@@ -0,0 +1,90 @@
+import os
+import time
+
+import artifact_store
+from artifact_store import ArtifactStore, artifact_key
+
+
+def _video(tmp_path, name, size=100):
+    path = tmp_path / "src" / f"{name}.mp4"
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_artifact_key_depends_on_settings():
+    assert artifact_key("code", "narration", {'profile': "desktop"}) == artifact_key("code", "narration", {'profile': "desktop"})
+    assert artifact_key("code", "narration", {'profile': "desktop"}) != artifact_key("code", "narration", {'profile': "mobile"})
+
+
+def test_lookup_returns_stored_path(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"), quota_bytes=1000)
+    path = store.put("a", _video(tmp_path, "a"))
+    assert store.lookup("a") == path
+    assert store.lookup("missing") is None
+
+
+def test_evicts_released_before_held(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"), quota_bytes=250)
+    a = store.put("a", _video(tmp_path, "a"))
+    b = store.put("b", _video(tmp_path, "b"))
+    store.release("b")
+
+    # a is the least recently used, but still held.
+    store.put("c", _video(tmp_path, "c"))
+    assert os.path.exists(a)
+    assert not os.path.exists(b)
+    assert store.lookup("b") is None
+
+
+def test_leaked_holds_expire(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "store"), quota_bytes=150)
+    a = store.put("a", _video(tmp_path, "a"))
+
+    monkeypatch.setattr(artifact_store, "ARTIFACT_HOLD_SECONDS", 0)
+    time.sleep(0.01)
+    store.put("b", _video(tmp_path, "b"))
+    assert not os.path.exists(a)
+
+
+def test_hits_are_journaled_until_the_next_put(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"), quota_bytes=1000)
+    store.put("a", _video(tmp_path, "a"))
+    before = os.path.getmtime(store.index_path)
+
+    store.lookup("a")
+    store.lookup("a")
+    assert os.path.exists(store.journal_path)
+    assert os.path.getmtime(store.index_path) == before
+    assert store._load_index()["a"]['refs'] == 3
+
+    store.put("b", _video(tmp_path, "b"))
+    assert not os.path.exists(store.journal_path)
+    assert store._load_index()["a"]['refs'] == 3
+
+
+def test_journal_is_folded_once_it_grows(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact_store, "ARTIFACT_JOURNAL_BYTES", 200)
+    store = ArtifactStore(str(tmp_path / "store"), quota_bytes=1000)
+    store.put("a", _video(tmp_path, "a"))
+    for _ in range(10):
+        store.lookup("a")
+        store.release("a")
+    assert not os.path.exists(store.journal_path) or os.path.getsize(store.journal_path) <= 200
+    assert store._load_index()["a"]['refs'] == 1
+
+
+def test_released_path_is_evictable_while_a_held_one_is_not(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"), quota_bytes=250)
+    held = store.put("held", _video(tmp_path, "held"))
+    published = store.put("published", _video(tmp_path, "published"))
+    # A cache hit takes a second hold; publishing drops both.
+    assert store.lookup("published") == published
+    store.release_path(published)
+    store.release_path(published)
+    store.release_path(_video(tmp_path, "elsewhere"))
+    assert store._load_index()["published"]['refs'] == 0
+
+    store.put("new", _video(tmp_path, "new"))
+    assert os.path.exists(held)
+    assert not os.path.exists(published)
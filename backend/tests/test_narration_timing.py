@@ -0,0 +1,94 @@
+import ast
+
+import narration_timing
+from narration_timing import _lay_out_section, _text_lengths, estimate_seconds, fit_scene_to_narration
+
+SCENE = """from manim import *
+
+class Lesson(Scene):
+    def construct(self):
+        title = Text("Pythagorean theorem")
+        self.play(Write(title))
+        self.wait(2)
+        self.clear()
+        self.play(Write(Text("a+b")), FadeIn(Square(), run_time=3))
+        for i in range(2):
+            self.play(Create(Circle()))
+        self.wait()
+"""
+
+
+def _construct(code=SCENE):
+    tree = ast.parse(code)
+    return tree, tree.body[1].body[0]
+
+
+def test_estimate_seconds_uses_animation_defaults():
+    tree, construct = _construct()
+    lengths = _text_lengths(tree)
+    assert lengths == {'title': 18}
+    # Write of a long text lasts 2s, of a short one 1s; play() lasts as long
+    # as its longest animation, loops repeat their body.
+    assert estimate_seconds(construct.body, lengths) == 2 + 2 + 3 + 2 + 1
+
+
+def test_explicit_run_time_wins():
+    code = SCENE.replace("self.play(Write(title))", "self.play(Write(title), run_time=0.5)")
+    tree, construct = _construct(code)
+    assert estimate_seconds(construct.body[:3], _text_lengths(tree)) == 0.5 + 2
+
+
+def test_lay_out_section_keeps_sync_spacing():
+    segments = [{'timestamp': 4, 'duration': 1.0}, {'timestamp': 7, 'duration': 1.0}]
+    offsets, end = _lay_out_section(segments)
+    assert offsets == [0.0, 3.0]
+    assert end == 3.0 + 1.0 + narration_timing.NARRATION_GAP
+
+
+def test_lay_out_section_never_overlaps():
+    segments = [{'timestamp': 0, 'duration': 2.5}, {'timestamp': 1, 'duration': 1.0}]
+    offsets, _ = _lay_out_section(segments)
+    assert offsets == [0.0, 2.5 + narration_timing.NARRATION_GAP]
+
+
+def _section_seconds(code):
+    tree, construct = _construct(code)
+    lengths = _text_lengths(tree)
+    return [round(estimate_seconds(section, lengths), 2) for section in narration_timing.split_construct(construct)]
+
+
+class _Synthesizer:
+
+    def __init__(self, tmp_path):
+        self.tmp_path = tmp_path
+
+    def synthesize_many(self, texts, voice_quality):
+        clips = []
+        for i, text in enumerate(texts):
+            path = self.tmp_path / f"clip_{i}.wav"
+            path.write_bytes(b"RIFF")
+            clips.append(str(path))
+        return clips
+
+
+def test_fit_stretches_sections_to_their_narration(tmp_path, monkeypatch):
+    monkeypatch.setattr(narration_timing, "get_speech_synthesizer", lambda: _Synthesizer(tmp_path))
+    monkeypatch.setattr(narration_timing, "media_duration", lambda path: 6.0)
+    narration = "[SYNC:0] The theorem relates the sides. [SYNC:4] Here are the shapes."
+
+    code, segments = fit_scene_to_narration(SCENE, narration, str(tmp_path))
+    target = round(6.0 + narration_timing.NARRATION_GAP, 2)
+    assert _section_seconds(code) == [target, target]
+    assert [round(segment['timestamp'], 2) for segment in segments] == [0.0, target]
+
+
+def test_fit_shrinks_waits_before_animations(tmp_path, monkeypatch):
+    monkeypatch.setattr(narration_timing, "get_speech_synthesizer", lambda: _Synthesizer(tmp_path))
+    monkeypatch.setattr(narration_timing, "media_duration", lambda path: 1.0)
+    narration = "[SYNC:0] The theorem. [SYNC:4] The shapes."
+
+    code, segments = fit_scene_to_narration(SCENE, narration, str(tmp_path))
+    # Waits go down to MIN_WAIT, then the top-level plays speed up to at most
+    # 1 / MIN_RUN_TIME_SCALE; the loop is left alone.
+    assert _section_seconds(code) == [0.5 + 2 * 0.6, 3 * 0.6 + 2 + 0.5]
+    assert [round(segment['timestamp'], 2) for segment in segments] == [0.0, 1.7]
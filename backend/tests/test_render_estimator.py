@@ -0,0 +1,56 @@
+import json
+
+from render_estimator import RenderEstimator, _solve, script_features
+
+SCENE = """from manim import *
+
+class Lesson(Scene):
+    def construct(self):
+        title = MathTex("x^2")
+        self.play(Write(title), run_time=2)
+        for i in range(3):
+            self.play(FadeIn(Square()))
+            self.wait(0.5)
+        axes = Axes()
+        self.play(Create(axes.plot(lambda x: x)))
+        self.wait()
+"""
+
+
+def test_script_features_counts_loops_and_durations():
+    counts = script_features(SCENE, "Lesson")
+    assert counts == {'plays': 5, 'waits': 4, 'run_time': 6.0, 'wait_time': 2.5, 'tex': 1, 'graphs': 2}
+
+
+def test_script_features_without_a_scene():
+    assert script_features("x = (", "Lesson") is None
+    assert script_features(SCENE, "Other") is None
+
+
+def test_solve():
+    assert _solve([[2.0, 1.0], [1.0, 3.0]], [5.0, 10.0]) == [1.0, 3.0]
+    assert _solve([[1.0, 2.0], [2.0, 4.0]], [1.0, 2.0]) is None
+
+
+def test_preflight_prediction_skips_animation_time(tmp_path):
+    estimator = RenderEstimator(str(tmp_path / "timings.json"))
+    counts = script_features(SCENE, "Lesson")
+    assert estimator.predict(counts, "desktop", preflight=True) < estimator.predict(counts, "desktop")
+    assert estimator.predict(None, "desktop") is None
+
+
+def test_record_fits_towards_measured_times(tmp_path):
+    timings_file = str(tmp_path / "timings.json")
+    estimator = RenderEstimator(timings_file)
+    counts = script_features(SCENE, "Lesson")
+    before = estimator.predict(counts, "desktop")
+    actual = before * 3
+    for _ in range(50):
+        estimator.record(counts, "desktop", actual)
+
+    after = estimator.predict(counts, "desktop")
+    assert abs(after - actual) < abs(before - actual) / 2
+    with open(timings_file, 'r', encoding='utf-8') as f:
+        assert len(json.load(f)) == 50
+    # Another process starts from the recorded history.
+    assert RenderEstimator(timings_file).predict(counts, "desktop") == after
@@ -0,0 +1,92 @@
+import time
+import heapq
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import render_pool
+import render_jobs
+from render_pool import RenderPool
+
+
+class _Estimator:
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.recorded = []
+
+    def record(self, counts, profile, actual):
+        self.recorded.append((profile, actual, self.pool._lock.locked()))
+
+
+def _pool():
+    # The bookkeeping only; no worker processes.
+    pool = object.__new__(RenderPool)
+    pool._lock = threading.Lock()
+    pool._jobs = {}
+    pool._running = {}
+    pool._pending = []
+    pool._kill_reasons = {}
+    pool.recent_jobs = deque(maxlen=100)
+    return pool
+
+
+def _add_job(pool, job_id, mode="render", **fields):
+    future = Future()
+    now = time.time()
+    pool._jobs[job_id] = dict({
+        'future': future,
+        'scene': f"Lesson:{job_id}.mp4",
+        'submitted': now - 2.0,
+        'predicted': 1.5,
+        'features': {},
+        'profile': "desktop",
+        'mode': mode,
+        'client_job': render_jobs.current_job(),
+    }, **fields)
+    return future
+
+
+def test_finished_job_is_recorded_outside_the_lock_and_reported_to_its_request(monkeypatch):
+    pool = _pool()
+    estimator = _Estimator(pool)
+    monkeypatch.setattr(render_pool, "get_render_estimator", lambda: estimator)
+    request_job = render_jobs.create_job(status='rendering')
+    with render_jobs.job_context(request_job):
+        future = _add_job(pool, "a", started=time.time() - 1.0, pid=42)
+    pool._running[42] = "a"
+
+    with pool._lock:
+        finished = pool._finish_job("a", result={'path': "a.mp4"})
+    pool._complete_job(*finished)
+
+    assert future.result()['timings']['predicted'] == 1.5
+    assert estimator.recorded == [("desktop", finished[1]['render_time'], False)]
+    job = render_jobs.get_job(request_job)
+    assert job['predicted_seconds'] == 1.5
+    assert job['render_seconds'] == finished[1]['render_time']
+    assert [render['job_id'] for render in job['renders']] == ["a"]
+
+
+def test_cancel_drops_a_queued_job():
+    pool = _pool()
+    future = _add_job(pool, "a", mode="preflight")
+    heapq.heappush(pool._pending, (1.0, time.time(), "a", None))
+
+    assert pool.cancel(future, "timed out")
+    assert pool._pending == []
+    assert "timed out" in str(future.exception())
+    assert not pool.cancel(Future())
+
+
+def test_cancel_kills_a_running_job(monkeypatch):
+    pool = _pool()
+    killed = []
+    monkeypatch.setattr(render_pool, "kill_process_tree", killed.append)
+    future = _add_job(pool, "a", started=time.time(), pid=42)
+
+    assert pool.cancel(future, "timed out")
+    assert killed == [42]
+    assert pool._kill_reasons == {42: "timed out"}
+    # Failed by the reaper once the worker is gone.
+    assert not future.done()
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+import render_scratch
+from render_scratch import ScratchSpace, scratch_stats
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    scratch_dir = tmp_path / "shm"
+    spill_dir = tmp_path / "disk"
+    scratch_dir.mkdir()
+    spill_dir.mkdir()
+    monkeypatch.setattr(render_scratch, "RENDER_SCRATCH_DIR", str(scratch_dir))
+    monkeypatch.setattr(render_scratch, "RENDER_SPILL_DIR", str(spill_dir))
+    monkeypatch.setattr(render_scratch, "RESERVATIONS_PATH", str(tmp_path / "reservations.json"))
+    monkeypatch.setattr(render_scratch, "_free_bytes", lambda path: 3 * MB)
+    return scratch_dir, spill_dir
+
+
+def _write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b"\0" * size)
+
+
+def test_reservation_is_held_while_the_job_runs(dirs):
+    scratch_dir, _ = dirs
+    with ScratchSpace("a", cap_bytes=2 * MB) as scratch:
+        assert scratch.reserved == 2 * MB
+        assert os.path.dirname(scratch.root) == str(scratch_dir)
+        assert scratch_stats()['reserved_bytes'] == 2 * MB
+    assert scratch_stats()['reserved_bytes'] == 0
+    assert not os.path.exists(scratch.root)
+
+
+def test_job_that_does_not_fit_spills_to_disk(dirs):
+    _, spill_dir = dirs
+    before = scratch_stats()['spilled_jobs']
+    with ScratchSpace("a", cap_bytes=2 * MB) as first:
+        # 3 MB free, 2 MB already reserved by the first job.
+        with ScratchSpace("b", cap_bytes=2 * MB) as second:
+            assert second.reserved == 0
+            assert os.path.dirname(second.root) == str(spill_dir)
+            assert scratch_stats()['reserved_bytes'] == 2 * MB
+        assert first.reserved == 2 * MB
+    assert scratch_stats()['spilled_jobs'] == before + 1
+
+
+def test_later_stages_switch_to_disk_once_over_the_cap(dirs):
+    scratch_dir, spill_dir = dirs
+    with ScratchSpace("a", cap_bytes=MB) as scratch:
+        frames = scratch.dir_for("frames")
+        assert frames.startswith(str(scratch_dir))
+        _write(os.path.join(frames, "partial.mp4"), MB)
+        videos = scratch.dir_for("videos")
+        assert videos.startswith(str(spill_dir))
+        _write(os.path.join(videos, "out.mp4"), MB // 2)
+        usage = scratch.usage()
+    assert usage == {'peak_bytes': MB + MB // 2, 'scratch_end_bytes': MB, 'disk_end_bytes': MB // 2}
+    assert not os.path.exists(scratch.spill_root)
+
+
+def test_peak_survives_intermediates_deleted_before_exit(dirs):
+    with ScratchSpace("a", cap_bytes=2 * MB) as scratch:
+        partial = os.path.join(scratch.dir_for("frames"), "partial.mp4")
+        _write(partial, MB)
+        scratch._measure()
+        os.remove(partial)
+        usage = scratch.usage()
+    assert usage['peak_bytes'] == MB
+    assert usage['scratch_end_bytes'] == 0
@@ -0,0 +1,113 @@
+import ast
+from concurrent.futures import Future
+
+import section_renderer
+from render_engine import RenderError
+from section_renderer import build_section_script, find_construct, plan_sections, sections_share_state, split_construct
+
+SCENE = """from manim import *
+
+class Lesson(Scene):
+    def construct(self):
+        title = Text("One")
+        self.play(Write(title))
+        self.clear()
+        square = Square()
+        self.play(Create(square))
+        self.wait(1)
+        self.clear()
+        self.play(FadeIn(Circle()))
+"""
+
+
+def _sections(code, scene_class="Lesson"):
+    return split_construct(find_construct(ast.parse(code), scene_class))
+
+
+def test_split_construct_starts_a_section_at_each_clear():
+    sections = _sections(SCENE)
+    assert [len(section) for section in sections] == [2, 4, 2]
+    assert ast.unparse(sections[1][0]) == "self.clear()"
+
+
+def test_leading_clear_does_not_make_an_empty_section():
+    code = SCENE.replace('        title = Text("One")\n        self.play(Write(title))\n', '')
+    assert [len(section) for section in _sections(code)] == [4, 2]
+
+
+def test_plan_sections_needs_a_clear():
+    code = SCENE.replace("        self.clear()\n", "")
+    assert plan_sections(code, "Lesson") is None
+    assert plan_sections("not python (", "Lesson") is None
+    assert len(plan_sections(SCENE, "Lesson")) == 3
+
+
+def test_names_used_across_a_clear_share_state():
+    shared = SCENE.replace("self.play(FadeIn(Circle()))", "self.play(FadeIn(square))")
+    assert sections_share_state(_sections(shared))
+    assert plan_sections(shared, "Lesson") is None
+
+
+def test_scene_attributes_share_state():
+    shared = SCENE.replace("square = Square()", "self.square = Square()")
+    assert sections_share_state(_sections(shared))
+
+
+def test_loop_variables_are_local_to_their_section():
+    code = SCENE.replace("self.play(FadeIn(Circle()))", "for square in [Square()]:\n            self.add(square)")
+    assert not sections_share_state(_sections(code))
+
+
+def test_rebinding_a_name_from_an_earlier_section_shares_state():
+    code = SCENE.replace("self.play(FadeIn(Circle()))", "square = square.scale(2)\n        self.add(square)")
+    assert sections_share_state(_sections(code))
+
+
+def test_comprehension_variables_are_local_to_their_section():
+    code = SCENE.replace("self.play(FadeIn(Circle()))", "self.add(*[square for square in [Square()]])")
+    assert not sections_share_state(_sections(code))
+
+
+def test_build_section_script_subclasses_the_scene():
+    sections = _sections(SCENE)
+    code, classes = build_section_script(SCENE, "Lesson", sections)
+    assert classes == ["LessonSection000", "LessonSection001", "LessonSection002"]
+    tree = ast.parse(code)
+    section = find_construct(tree, "LessonSection001")
+    assert [ast.unparse(stmt) for stmt in section.body] == [ast.unparse(stmt) for stmt in sections[1]]
+
+
+class _FakePool:
+
+    def __init__(self):
+        self.futures = []
+        self.cancelled = []
+        self.serial = []
+
+    def submit(self, script_path, scene_class, output_path, media_dir, profile):
+        future = Future()
+        if not self.futures:
+            future.set_exception(RenderError("Manim render failed", "boom"))
+        self.futures.append(future)
+        return future
+
+    def cancel(self, future, reason="cancelled"):
+        self.cancelled.append(future)
+        return True
+
+    def render(self, script_path, scene_class, output_path, media_dir, profile):
+        self.serial.append(scene_class)
+        return {'path': output_path}
+
+
+def test_failed_section_cancels_the_rest_before_the_serial_render(tmp_path, monkeypatch):
+    pool = _FakePool()
+    monkeypatch.setattr(section_renderer, "get_render_pool", lambda: pool)
+    script_path = tmp_path / "scene.py"
+    script_path.write_text(SCENE)
+
+    result = section_renderer.render_scene(str(script_path), SCENE, "Lesson", str(tmp_path / "out.mp4"),
+                                           str(tmp_path / "media"))
+    assert result['path'] == str(tmp_path / "out.mp4")
+    assert pool.cancelled == pool.futures[1:]
+    assert pool.serial == ["Lesson"]
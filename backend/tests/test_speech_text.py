@@ -0,0 +1,45 @@
+import pytest
+
+from speech_text import verbalize
+
+
+@pytest.mark.parametrize("text, spoken", [
+    (r"$\frac{1}{2}$", "1 over 2"),
+    (r"$x^2 + y^2 = z^2$", "x squared plus y squared equals z squared"),
+    (r"$\sqrt{x+1}$", "square root of x plus 1"),
+    (r"$\sqrt[3]{8}$", "cube root of 8"),
+    (r"$\int_0^1 x\,dx$", "integral from 0 to 1 x dx"),
+    (r"$\sum_{n=1}^{\infty} \frac{1}{n^2}$", "sum from n equals 1 to infinity 1 over n squared"),
+    (r"$\lim_{x \to 0} \frac{\sin x}{x}$", "limit as x to 0 sine x over x"),
+    (r"$90^\circ$", "90 degrees"),
+    (r"$\binom{n}{k}$", "n choose k"),
+    (r"$\vec{v} \cdot \hat{n}$", "vector v times n hat"),
+    (r"$\text{area} = \pi r^2$", "area equals pi r squared"),
+    (r"$$e^{i\pi} + 1 = 0$$", "e to the power of i pi plus 1 equals 0"),
+    (r"\(\alpha + \Omega\)", "alpha plus capital omega"),
+    (r"$a \leq b$", "a less than or equal to b"),
+])
+def test_reads_latex_aloud(text, spoken):
+    assert verbalize(text) == spoken
+
+
+def test_math_inside_prose():
+    assert verbalize(r"The area is $\pi r^2$.") == "The area is pi r squared."
+
+
+def test_drops_markers_and_stage_directions():
+    assert verbalize("[SYNC: 3] Look here [PAUSE] now.") == "Look here now."
+    assert verbalize("[Show the triangle] The sides are a and b.") == "The sides are a and b."
+
+
+def test_plain_prose_is_unchanged():
+    assert verbalize("A well-known result, 50% of the time.") == "A well-known result, 50% of the time."
+    assert verbalize("") == ""
+
+
+def test_deep_nesting_does_not_recurse():
+    depth = 5000
+    text = "$" + r"\frac{" * depth + "x" + "}{y}" * depth + "$"
+    spoken = verbalize(text)
+    assert spoken.startswith("x over y over y")
+    assert spoken.count("over") == depth
@@ -0,0 +1,54 @@
+import time
+import threading
+from pathlib import Path
+
+from tex_cache import cached_svg, snapshot_stats, stats_delta
+
+
+def _compiler(stem, calls, delay=0.0):
+    def compile_svg():
+        calls.append(stem)
+        svg_file = stem.with_suffix(".svg")
+        with open(svg_file, 'w', encoding='utf-8') as f:
+            f.write("<svg>")
+            f.flush()
+            time.sleep(delay)
+            f.write("</svg>")
+        stem.with_suffix(".log").write_text("latex log")
+        return svg_file
+    return compile_svg
+
+
+def test_compiles_once_then_hits(tmp_path):
+    stem = Path(tmp_path) / "abc123"
+    calls = []
+    before = snapshot_stats()
+
+    assert cached_svg(stem, _compiler(stem, calls)) == stem.with_suffix(".svg")
+    assert cached_svg(stem, _compiler(stem, calls)) == stem.with_suffix(".svg")
+    assert len(calls) == 1
+    assert not stem.with_suffix(".log").exists()
+    assert stats_delta(before) == {'lookups': 2, 'compiles': 1, 'latex_runs_saved': 1}
+
+
+def test_concurrent_lookup_waits_for_the_compile(tmp_path):
+    stem = Path(tmp_path) / "def456"
+    calls = []
+    results = []
+    before = snapshot_stats()
+
+    def lookup():
+        svg_file = cached_svg(stem, _compiler(stem, calls, delay=0.2))
+        results.append(svg_file.read_text())
+
+    threads = [threading.Thread(target=lookup) for _ in range(2)]
+    threads[0].start()
+    time.sleep(0.05)
+    # Starts while the first compile is writing the SVG.
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["<svg></svg>", "<svg></svg>"]
+    assert stats_delta(before) == {'lookups': 2, 'compiles': 1, 'latex_runs_saved': 1}
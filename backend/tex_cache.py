@@ -0,0 +1,149 @@
+import os
+import time
+import threading
+
+from filelock import FileLock
+
+TEX_CACHE_DIR = os.environ.get(
+    "TEX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "visionsolve", "tex"),
+)
+TEX_CACHE_MAX_MB = int(os.environ.get("TEX_CACHE_MAX_MB", "256"))
+TEX_CACHE_PRUNE_INTERVAL = 60
+
+# LaTeX/dvisvgm by-products that are safe to drop once the SVG exists.
+INTERMEDIATE_SUFFIXES = (".aux", ".log", ".dvi", ".xdv", ".pdf")
+
+_stats = {'lookups': 0, 'compiles': 0}
+_stats_lock = threading.Lock()
+_last_prune = 0.0
+_installed = False
+
+
+def tex_cache_config():
+    os.makedirs(TEX_CACHE_DIR, exist_ok=True)
+    # manim's own cleanup deletes every non-svg file in tex_dir, which would
+    # pull .tex files and locks out from under other workers.
+    return {"tex_dir": TEX_CACHE_DIR, "no_latex_cleanup": True}
+
+
+def _bump(**counts):
+    with _stats_lock:
+        for name, value in counts.items():
+            _stats[name] += value
+
+
+def snapshot_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def stats_delta(before, after=None):
+    after = after or snapshot_stats()
+    lookups = after['lookups'] - before['lookups']
+    compiles = after['compiles'] - before['compiles']
+    return {
+        'lookups': lookups,
+        'compiles': compiles,
+        'latex_runs_saved': lookups - compiles,
+    }
+
+
+def cached_svg(stem, compile_svg):
+    # The hit check happens under the lock too: dvisvgm writes the SVG in
+    # place, so one that merely exists may still be half written.
+    svg_file = stem.with_suffix(".svg")
+    _bump(lookups=1)
+    with FileLock(str(stem.with_suffix(".lock"))):
+        if svg_file.exists():
+            os.utime(svg_file)
+            return svg_file
+
+        _bump(compiles=1)
+        svg_file = compile_svg()
+        for suffix in INTERMEDIATE_SUFFIXES:
+            try:
+                os.remove(stem.with_suffix(suffix))
+            except FileNotFoundError:
+                pass
+        return svg_file
+
+
+def install_tex_cache():
+    global _installed
+    if _installed:
+        return
+
+    from pathlib import Path
+    from manim import config
+    from manim.mobject.text import tex_mobject
+    from manim.utils import tex_file_writing
+
+    original_tex_to_svg_file = tex_file_writing.tex_to_svg_file
+
+    def cached_tex_to_svg_file(expression, environment=None, tex_template=None):
+        if tex_template is None:
+            tex_template = config["tex_template"]
+        if environment is not None:
+            output = tex_template.get_texcode_for_expression_in_env(expression, environment)
+        else:
+            output = tex_template.get_texcode_for_expression(expression)
+
+        tex_dir = Path(config.get_dir("tex_dir"))
+        stem = tex_dir / tex_file_writing.tex_hash(output)
+        return cached_svg(stem, lambda: original_tex_to_svg_file(expression, environment, tex_template))
+
+    tex_file_writing.tex_to_svg_file = cached_tex_to_svg_file
+    tex_mobject.tex_to_svg_file = cached_tex_to_svg_file
+    _installed = True
+
+
+def prune_tex_cache(max_bytes=TEX_CACHE_MAX_MB * 1024 * 1024, force=False):
+    global _last_prune
+    now = time.time()
+    if not force and now - _last_prune < TEX_CACHE_PRUNE_INTERVAL:
+        return 0
+    _last_prune = now
+
+    if not os.path.isdir(TEX_CACHE_DIR):
+        return 0
+
+    with FileLock(os.path.join(TEX_CACHE_DIR, ".prune.lock")):
+        entries = {}
+        for name in os.listdir(TEX_CACHE_DIR):
+            if name.startswith("."):
+                continue
+            path = os.path.join(TEX_CACHE_DIR, name)
+            stem, suffix = os.path.splitext(name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = entries.setdefault(stem, {'size': 0, 'last_used': None, 'mtime': 0, 'files': []})
+            entry['size'] += stat.st_size
+            entry['mtime'] = max(entry['mtime'], stat.st_mtime)
+            entry['files'].append(path)
+            if suffix == ".svg":
+                entry['last_used'] = stat.st_mtime
+
+        total = sum(entry['size'] for entry in entries.values())
+        for entry in entries.values():
+            if entry['last_used'] is None:
+                # No SVG yet: either a compile in progress (keep) or a stale failure.
+                entry['last_used'] = entry['mtime'] if now - entry['mtime'] > 3600 else now
+
+        removed = 0
+        for stem, entry in sorted(entries.items(), key=lambda item: item[1]['last_used']):
+            if total <= max_bytes or entry['last_used'] >= now:
+                break
+            for path in entry['files']:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= entry['size']
+            removed += 1
+
+    if removed:
+        print(f"Pruned {removed} Tex cache entries from {TEX_CACHE_DIR}")
+    return removed
@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from filelock import FileLock
+
+from av_media import transcode_to_wav
+
+TTS_CACHE_DIR = os.environ.get(
+    "TTS_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "visionsolve", "tts"),
+)
+# Clips are cached as PCM WAV, roughly ten times the size of gTTS's MP3.
+TTS_CACHE_MAX_MB = int(os.environ.get("TTS_CACHE_MAX_MB", "1024"))
+TTS_CACHE_PRUNE_INTERVAL = 60
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "4"))
+# Comma-separated, tried in order; "auto" = online gTTS first, then the
+# offline engines. Set e.g. "pyttsx3,espeak" to never touch the network.
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "auto")
+
+BACKEND_ORDER = ("gtts", "pyttsx3", "espeak", "say", "sapi")
+
+# voice_quality -> which installed voice and how many words per minute.
+# gTTS has a single voice and speed; "rate" None keeps the engine default.
+VOICE_SETTINGS = {
+    'high': {'voice_index': 1, 'rate': 150},
+    'medium': {'voice_index': 0, 'rate': None},
+    'low': {'voice_index': 0, 'rate': None},
+}
+
+
+def _espeak_binary():
+    return shutil.which("espeak-ng") or shutil.which("espeak")
+
+
+def _backend_available(name):
+    if name == "gtts":
+        try:
+            import gtts  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    if name == "pyttsx3":
+        try:
+            import pyttsx3  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    if name == "espeak":
+        return _espeak_binary() is not None
+    if name == "say":
+        return sys.platform == "darwin" and shutil.which("say") is not None
+    if name == "sapi":
+        return os.name == "nt"
+    return False
+
+
+def _as_wav(mp3_path, wav_path):
+    # gTTS can only return MP3. Cache it as PCM so it is decoded once here
+    # instead of on every mix.
+    try:
+        transcode_to_wav(mp3_path, wav_path)
+    except Exception as e:
+        print(f"Could not convert {mp3_path} to WAV, caching the MP3: {e}")
+        if os.path.exists(wav_path):
+            os.remove(wav_path)
+        return mp3_path
+    os.remove(mp3_path)
+    return wav_path
+
+
+class _Pyttsx3Engine:
+    # pyttsx3.init() is slow and its drivers aren't thread-safe, so a single
+    # engine lives on its own thread and serves every request.
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def save(self, text, voice, path):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        future = Future()
+        self._requests.put((text, voice, path, future))
+        return future.result()
+
+    def _run(self):
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+            voices = engine.getProperty('voices')
+            default_rate = engine.getProperty('rate')
+        except Exception as e:
+            error = e
+            while True:
+                *_, future = self._requests.get()
+                future.set_exception(error)
+
+        while True:
+            text, voice, path, future = self._requests.get()
+            try:
+                if voice['voice_index'] < len(voices):
+                    engine.setProperty('voice', voices[voice['voice_index']].id)
+                engine.setProperty('rate', voice['rate'] or default_rate)
+                engine.setProperty('volume', 0.9)
+                engine.save_to_file(text, path)
+                engine.runAndWait()
+                future.set_result(path)
+            except Exception as e:
+                future.set_exception(e)
+
+
+class SpeechSynthesizer:
+
+    def __init__(self, backends=TTS_BACKEND, cache_dir=TTS_CACHE_DIR, workers=TTS_WORKERS):
+        names = BACKEND_ORDER if backends == "auto" else [b.strip() for b in backends.split(",") if b.strip()]
+        self.backends = [name for name in names if _backend_available(name)]
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tts")
+        self._pyttsx3 = _Pyttsx3Engine()
+        self._stats = {'hits': 0, 'misses': 0, 'failures': 0, 'synth_time': 0.0, 'backends': {}}
+        self._stats_lock = threading.Lock()
+        self._last_prune = 0.0
+        if not self.backends:
+            print(f"No TTS backend available (tried {', '.join(names)}). Install gtts or pyttsx3/espeak.")
+
+    def _key(self, text, voice_quality, backend):
+        payload = json.dumps({
+            'text': text,
+            'voice': VOICE_SETTINGS.get(voice_quality, VOICE_SETTINGS['high']),
+            'backend': backend,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+    def _cached(self, key):
+        for ext in (".mp3", ".wav", ".aiff"):
+            path = os.path.join(self.cache_dir, key + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _run_backend(self, backend, text, voice, stem):
+        if backend == "gtts":
+            from gtts import gTTS
+            gTTS(text=text, lang='en', slow=False).save(stem + ".mp3")
+            path = _as_wav(stem + ".mp3", stem + ".wav")
+        elif backend == "pyttsx3":
+            path = self._pyttsx3.save(text, voice, stem + ".wav")
+        elif backend == "espeak":
+            path = stem + ".wav"
+            cmd = [_espeak_binary(), "-v", "en", "-w", path]
+            if voice['rate']:
+                cmd += ["-s", str(voice['rate'])]
+            subprocess.run(cmd + [text], check=True, capture_output=True)
+        elif backend == "say":
+            path = stem + ".aiff"
+            subprocess.run(["say", "-o", path, text], check=True, capture_output=True)
+        else:
+            path = stem + ".wav"
+            escaped = text.replace('"', '`"')
+            ps_script = (f'Add-Type -AssemblyName System.Speech; $synth = New-Object System.Speech.Synthesis.SpeechSynthesizer; '
+                         f'$synth.SetOutputToWaveFile("{path}"); $synth.Speak("{escaped}"); $synth.Dispose();')
+            subprocess.run(['powershell', '-command', ps_script], check=True, capture_output=True)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            raise RuntimeError(f"{backend} wrote no audio")
+        return path
+
+    def synthesize(self, text, voice_quality='high'):
+        # Returns the path of a cached audio file for the (already cleaned)
+        # text, or None if every backend failed.
+        text = text.strip()
+        if not text:
+            return None
+        voice = VOICE_SETTINGS.get(voice_quality, VOICE_SETTINGS['high'])
+
+        # Audio any backend made earlier is reused, so offline runs still
+        # benefit from phrases gTTS synthesized while online.
+        for backend in self.backends:
+            cached = self._cached(self._key(text, voice_quality, backend))
+            if cached:
+                os.utime(cached)
+                self._bump(hits=1)
+                return cached
+
+        for backend in self.backends:
+            key = self._key(text, voice_quality, backend)
+            with FileLock(os.path.join(self.cache_dir, key + ".lock")):
+                cached = self._cached(key)
+                if cached:
+                    self._bump(hits=1)
+                    return cached
+
+                start = time.perf_counter()
+                stem = os.path.join(self.cache_dir, f".{key}.{threading.get_ident()}")
+                try:
+                    tmp_path = self._run_backend(backend, text, voice, stem)
+                except Exception as e:
+                    print(f"TTS backend {backend} failed: {e}")
+                    for ext in (".mp3", ".wav", ".aiff"):
+                        if os.path.exists(stem + ext):
+                            os.remove(stem + ext)
+                    continue
+                path = os.path.join(self.cache_dir, key + os.path.splitext(tmp_path)[1])
+                os.replace(tmp_path, path)
+
+            self._bump(misses=1, synth_time=time.perf_counter() - start, backend=backend)
+            self.prune()
+            return path
+
+        self._bump(failures=1)
+        return None
+
+    def synthesize_many(self, texts, voice_quality='high'):
+        return list(self._pool.map(lambda text: self.synthesize(text, voice_quality), texts))
+
+    def _bump(self, backend=None, **counts):
+        with self._stats_lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+            if backend:
+                self._stats['backends'][backend] = self._stats['backends'].get(backend, 0) + 1
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats, backends=dict(self._stats['backends']), available=list(self.backends))
+
+    def prune(self, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024, force=False):
+        now = time.time()
+        if not force and now - self._last_prune < TTS_CACHE_PRUNE_INTERVAL:
+            return 0
+        self._last_prune = now
+
+        with FileLock(os.path.join(self.cache_dir, ".prune.lock")):
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.startswith("."):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".lock"):
+                    # Per-phrase locks are only needed while a phrase synthesizes.
+                    if now - stat.st_mtime > 3600:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+
+        if removed:
+            print(f"Pruned {removed} cached narration clips from {self.cache_dir}")
+        return removed
+
+
+_synthesizer = None
+_synthesizer_lock = threading.Lock()
+
+
+def get_speech_synthesizer():
+    global _synthesizer
+    with _synthesizer_lock:
+        if _synthesizer is None:
+            _synthesizer = SpeechSynthesizer()
+        return _synthesizer
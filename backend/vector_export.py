@@ -0,0 +1,233 @@
+import os
+import json
+
+from manim import config
+from manim.animation.animation import Add, Wait
+from manim.animation.composition import AnimationGroup, LaggedStart, Succession
+from manim.animation.creation import Create, DrawBorderThenFill, Uncreate, Unwrite, Write
+from manim.animation.fading import FadeIn, FadeOut
+from manim.animation.growing import GrowArrow, GrowFromCenter, GrowFromEdge, GrowFromPoint, SpinInFromNothing
+from manim.animation.transform import (
+    ApplyMethod, FadeToColor, FadeTransform, FadeTransformPieces, MoveToTarget, ReplacementTransform,
+    Restore, ScaleInPlace, ShrinkToCenter, Transform, TransformFromCopy, _MethodAnimation,
+)
+from manim.animation.transform_matching_parts import TransformMatchingShapes, TransformMatchingTex
+from manim.mobject.types.vectorized_mobject import VMobject
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.utils.iterables import list_update
+
+from render_engine import VECTOR_FORMAT_VERSION
+
+# Frames per second recorded for animations the player can't reproduce from
+# their end states (rotations, updaters, paths); everything else is keyframed.
+VECTOR_SAMPLE_RATE = int(os.environ.get("VECTOR_SAMPLE_RATE", "10"))
+
+# Animations whose in-between frames the player can rebuild from the start and
+# end state: how a mobject enters/leaves (effect) plus an eased morph.
+KEYFRAME_ANIMATIONS = {
+    Wait: "fade", Add: "fade",
+    Create: "draw", Write: "draw", DrawBorderThenFill: "draw",
+    Uncreate: "undraw", Unwrite: "undraw",
+    FadeIn: "fade", FadeOut: "fade",
+    GrowFromPoint: "grow", GrowFromCenter: "grow", GrowFromEdge: "grow", GrowArrow: "grow", SpinInFromNothing: "grow",
+    Transform: "fade", ReplacementTransform: "fade", TransformFromCopy: "fade", FadeTransform: "fade",
+    FadeTransformPieces: "fade", MoveToTarget: "fade", _MethodAnimation: "fade", ApplyMethod: "fade",
+    FadeToColor: "fade", ScaleInPlace: "fade", ShrinkToCenter: "fade", Restore: "fade",
+}
+GROUP_ANIMATIONS = {AnimationGroup, LaggedStart, Succession, TransformMatchingShapes, TransformMatchingTex}
+# Rate functions the player implements (same names as manim.utils.rate_functions).
+PLAYER_EASINGS = {"linear", "smooth", "rush_into", "rush_from", "double_smooth"}
+
+
+class VectorUnsupported(Exception):
+    pass
+
+
+def _num(value, digits):
+    text = f"{value:.{digits}f}".rstrip("0").rstrip(".")
+    if text.startswith("0."):
+        text = text[1:]
+    elif text.startswith("-0."):
+        text = "-" + text[2:]
+    return text if text not in ("", "-", "-0") else "0"
+
+
+def _keyframeable(anim):
+    if type(anim) in GROUP_ANIMATIONS:
+        return anim.rate_func.__name__ == "linear" and all(_keyframeable(sub) for sub in anim.animations)
+    if type(anim) not in KEYFRAME_ANIMATIONS:
+        return False
+    if getattr(anim, "path_arc", 0):
+        return False
+    return anim.rate_func.__name__ in PLAYER_EASINGS
+
+
+class TimelineRecorder(CairoRenderer):
+    # Records what is on screen after each play instead of rasterizing frames.
+    # Keyframeable plays are skipped straight to their end state; the rest are
+    # sampled at the (low) configured frame rate.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shapes = {}
+        self.styles = {}
+        self.keyframes = []
+        self._tracks = {}
+        self._sampled = False
+        self._last_sample = 0.0
+        self._scene = None
+
+    def init_scene(self, scene):
+        super().init_scene(scene)
+        self._scene = scene
+        compile_animation_data = scene.compile_animation_data
+
+        # play() decides whether to skip an animation right after compiling
+        # it, so that's where keyframeable plays are switched to skipping.
+        def compile_and_classify(*args, **kwargs):
+            compile_animation_data(*args, **kwargs)
+            self._sampled = (
+                any(mob.get_family_updaters() for mob in scene.mobjects)
+                or not all(_keyframeable(anim) for anim in scene.animations or [])
+            )
+            self.skip_animations = not self._sampled
+
+        scene.compile_animation_data = compile_and_classify
+
+    def update_frame(self, *args, **kwargs):
+        pass
+
+    def get_frame(self):
+        return None
+
+    def save_static_frame_data(self, scene, static_mobjects):
+        self.static_image = None
+        return None
+
+    def add_frame(self, frame, num_frames=1):
+        if self._sampled and not self.skip_animations:
+            self._push(self._last_sample, self.time, self._snapshot(self._scene))
+            self._last_sample = self.time
+        super().add_frame(frame, num_frames)
+
+    def play(self, scene, *args, **kwargs):
+        start = self.time
+        # Anything added or removed between plays appears instantly.
+        self._push(start, start, self._snapshot(scene))
+        self._last_sample = start
+        super().play(scene, *args, **kwargs)
+
+        items = self._snapshot(scene)
+        if self._sampled:
+            self._push(self._last_sample, self.time, items)
+        else:
+            windows = {}
+            for anim in scene.animations or []:
+                self._windows(anim, start, start + anim.get_run_time(), windows)
+            self._push(start, self.time, items, windows)
+        self._sampled = False
+
+    def _windows(self, anim, start, end, windows):
+        if isinstance(anim, AnimationGroup):
+            total = anim.max_end_time or 1.0
+            for row in anim.anims_with_timings:
+                self._windows(row["anim"], start + (end - start) * row["start"] / total,
+                              start + (end - start) * row["end"] / total, windows)
+            return
+
+        # Same sub-intervals manim uses to stagger submobjects by lag_ratio.
+        effect = KEYFRAME_ANIMATIONS.get(type(anim), "fade")
+        rate = anim.rate_func.__name__
+        for family in (anim.mobject, getattr(anim, "target_mobject", None)):
+            if family is None:
+                continue
+            leaves = family.family_members_with_points()
+            full_length = (len(leaves) - 1) * anim.lag_ratio + 1
+            for i, leaf in enumerate(leaves):
+                track = self._tracks.get(id(leaf))
+                if track is None:
+                    continue
+                windows[str(track[0])] = [
+                    round(start + (end - start) * i * anim.lag_ratio / full_length, 3),
+                    round(start + (end - start) * (i * anim.lag_ratio + 1) / full_length, 3),
+                    effect,
+                    rate,
+                ]
+
+    def _push(self, start, end, items, windows=None):
+        if self.keyframes and self.keyframes[-1]["items"] == items:
+            return
+        keyframe = {"start": round(start, 3), "t": round(end, 3), "items": items}
+        if windows:
+            keyframe["anims"] = windows
+        self.keyframes.append(keyframe)
+
+    def _snapshot(self, scene):
+        mobjects = self.camera.get_mobjects_to_display(list_update(scene.mobjects, scene.foreground_mobjects))
+        items = []
+        for mob in mobjects:
+            if len(mob.points) == 0:
+                continue
+            if not isinstance(mob, VMobject):
+                raise VectorUnsupported(f"{type(mob).__name__} has no vector outline")
+            item = self._item(mob)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def _item(self, mob):
+        points = mob.points[:, :2]
+        low, high = points.min(axis=0), points.max(axis=0)
+        size = float(max(high - low))
+        if size < 1e-6:
+            return None
+        center = (low + high) / 2
+
+        # Outlines are stored once per distinct shape, centred and scaled to a
+        # unit box (y up -> SVG y down); identical glyphs share an entry.
+        path = []
+        for subpath in mob.get_subpaths():
+            coords = (subpath[:, :2] - center) / size
+            coords[:, 1] *= -1
+            path.append("M" + " ".join(_num(v, 4) for v in coords[0]))
+            for i in range(0, len(coords) - 3, 4):
+                path.append("C" + " ".join(_num(v, 4) for v in coords[i + 1:i + 4].ravel()))
+            if len(subpath) and (abs(subpath[0] - subpath[-1]) < 1e-6).all():
+                path.append("Z")
+        shape = self.shapes.setdefault("".join(path), len(self.shapes))
+
+        stroke_color = mob.get_stroke_color()
+        style = (
+            mob.get_fill_color().to_hex(),
+            stroke_color.to_hex() if stroke_color is not None else "none",
+            round(float(mob.get_stroke_width()) * 0.01, 4),
+        )
+        style_id = self.styles.setdefault(style, len(self.styles))
+
+        track = self._tracks.setdefault(id(mob), (len(self._tracks), mob))[0]
+        return [
+            track, shape,
+            round(float(center[0]), 3), round(float(-center[1]), 3), round(size, 4),
+            style_id,
+            round(float(mob.get_fill_opacity()), 3),
+            round(float(mob.get_stroke_opacity()), 3),
+        ]
+
+    def timeline(self):
+        return {
+            "version": VECTOR_FORMAT_VERSION,
+            "width": config.frame_width,
+            "height": config.frame_height,
+            "background": config.background_color.to_hex(),
+            "duration": round(self.time, 3),
+            "sample_rate": VECTOR_SAMPLE_RATE,
+            "shapes": list(self.shapes),
+            "styles": [list(style) for style in self.styles],
+            "keyframes": self.keyframes,
+        }
+
+
+def write_timeline(timeline, output_path):
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(timeline, f, separators=(",", ":"))
+    return os.path.getsize(output_path)
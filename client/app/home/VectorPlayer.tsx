@@ -0,0 +1,384 @@
+'use client'
+import React, { useState, useRef, useEffect } from 'react';
+import { FaPlay, FaPause } from 'react-icons/fa';
+
+// Plays the timeline JSON written by backend/vector_export.py: every keyframe
+// lists what is on screen at its end time, and the player eases each item from
+// the previous keyframe using the animation windows the backend recorded.
+
+const SUPPORTED_VERSION = 1;
+const SVG_NS = 'http://www.w3.org/2000/svg';
+
+// [track, shape, x, y, size, style, fill opacity, stroke opacity]
+type Item = [number, number, number, number, number, number, number, number];
+// [start, end, effect, rate function]
+type Window = [number, number, string, string];
+
+interface Keyframe {
+  start: number;
+  t: number;
+  items: Item[];
+  anims?: Record<string, Window>;
+}
+
+interface Timeline {
+  version: number;
+  width: number;
+  height: number;
+  background: string;
+  duration: number;
+  shapes: string[];
+  styles: [string, string, number][];
+  keyframes: Keyframe[];
+  audio?: string;
+}
+
+interface DrawOp {
+  shape: number;
+  style: number;
+  fillColor: string;
+  strokeColor: string;
+  x: number;
+  y: number;
+  size: number;
+  fillOpacity: number;
+  strokeOpacity: number;
+  // 0..1 while being written/created, undefined otherwise.
+  draw?: number;
+}
+
+const sigmoid = (x: number) => 1 / (1 + Math.exp(-x));
+
+const smooth = (t: number) => {
+  const error = sigmoid(-5);
+  return Math.min(Math.max((sigmoid(10 * (t - 0.5)) - error) / (1 - 2 * error), 0), 1);
+};
+
+// Same names and curves as manim.utils.rate_functions.
+const EASINGS: Record<string, (t: number) => number> = {
+  linear: (t) => t,
+  smooth,
+  rush_into: (t) => 2 * smooth(t / 2),
+  rush_from: (t) => 2 * smooth(t / 2 + 0.5) - 1,
+  double_smooth: (t) => (t < 0.5 ? 0.5 * smooth(2 * t) : 0.5 * (1 + smooth(2 * t - 1))),
+};
+
+const lerp = (a: number, b: number, p: number) => a + (b - a) * p;
+
+const mixColor = (a: string, b: string, p: number) => {
+  if (a === b || !a.startsWith('#') || !b.startsWith('#')) return p < 0.5 ? a : b;
+  const channel = (hex: string, i: number) => parseInt(hex.slice(1 + 2 * i, 3 + 2 * i), 16);
+  const mixed = [0, 1, 2].map((i) => Math.round(lerp(channel(a, i), channel(b, i), p)));
+  return `#${mixed.map((v) => v.toString(16).padStart(2, '0')).join('')}`;
+};
+
+const findKeyframe = (keyframes: Keyframe[], time: number) => {
+  let low = 0;
+  let high = keyframes.length - 1;
+  while (low < high) {
+    const mid = (low + high + 1) >> 1;
+    if (keyframes[mid].start <= time) low = mid;
+    else high = mid - 1;
+  }
+  return low;
+};
+
+const itemOp = (timeline: Timeline, item: Item): DrawOp => {
+  const [fill, stroke] = timeline.styles[item[5]];
+  return {
+    shape: item[1],
+    style: item[5],
+    fillColor: fill,
+    strokeColor: stroke,
+    x: item[2],
+    y: item[3],
+    size: item[4],
+    fillOpacity: item[6],
+    strokeOpacity: item[7],
+  };
+};
+
+function frameAt(timeline: Timeline, time: number): DrawOp[] {
+  const { keyframes } = timeline;
+  if (!keyframes.length) return [];
+  const index = findKeyframe(keyframes, time);
+  const keyframe = keyframes[index];
+  if (time >= keyframe.t || index === 0) {
+    return keyframe.items.map((item) => itemOp(timeline, item));
+  }
+
+  const previous = new Map(keyframes[index - 1].items.map((item) => [item[0], item]));
+  const next = new Map(keyframe.items.map((item) => [item[0], item]));
+  const progress = (track: number) => {
+    const span: Window = keyframe.anims?.[track] ?? [keyframe.start, keyframe.t, 'fade', keyframe.anims ? 'smooth' : 'linear'];
+    const [start, end, effect, rate] = span;
+    const linear = end > start ? Math.min(Math.max((time - start) / (end - start), 0), 1) : 1;
+    return { p: (EASINGS[rate] ?? EASINGS.linear)(linear), effect };
+  };
+
+  const ops: DrawOp[] = [];
+  for (const item of keyframe.items) {
+    const { p, effect } = progress(item[0]);
+    const target = itemOp(timeline, item);
+    const before = previous.get(item[0]);
+    if (!before) {
+      // Entering.
+      if (effect === 'draw') ops.push({ ...target, draw: p });
+      else if (effect === 'grow') ops.push({ ...target, size: target.size * p });
+      else ops.push({ ...target, fillOpacity: target.fillOpacity * p, strokeOpacity: target.strokeOpacity * p });
+      continue;
+    }
+
+    const source = itemOp(timeline, before);
+    const moved = {
+      x: lerp(source.x, target.x, p),
+      y: lerp(source.y, target.y, p),
+      size: lerp(source.size, target.size, p),
+    };
+    if (source.shape === target.shape) {
+      ops.push({
+        ...target,
+        ...moved,
+        fillColor: mixColor(source.fillColor, target.fillColor, p),
+        strokeColor: mixColor(source.strokeColor, target.strokeColor, p),
+        fillOpacity: lerp(source.fillOpacity, target.fillOpacity, p),
+        strokeOpacity: lerp(source.strokeOpacity, target.strokeOpacity, p),
+      });
+    } else {
+      // Morphing between outlines: crossfade the two shapes along the move.
+      ops.push({ ...source, ...moved, fillOpacity: source.fillOpacity * (1 - p), strokeOpacity: source.strokeOpacity * (1 - p) });
+      ops.push({ ...target, ...moved, fillOpacity: target.fillOpacity * p, strokeOpacity: target.strokeOpacity * p });
+    }
+  }
+
+  for (const item of keyframes[index - 1].items) {
+    if (next.has(item[0])) continue;
+    // Leaving.
+    const { p, effect } = progress(item[0]);
+    const source = itemOp(timeline, item);
+    if (effect === 'undraw') ops.push({ ...source, draw: 1 - p });
+    else ops.push({ ...source, fillOpacity: source.fillOpacity * (1 - p), strokeOpacity: source.strokeOpacity * (1 - p) });
+  }
+  return ops;
+}
+
+function paint(group: SVGGElement, timeline: Timeline, ops: DrawOp[]) {
+  while (group.childNodes.length < ops.length) {
+    group.appendChild(document.createElementNS(SVG_NS, 'path'));
+  }
+  group.childNodes.forEach((node, i) => {
+    const path = node as SVGPathElement;
+    const op = ops[i];
+    if (!op || op.size <= 0) {
+      path.setAttribute('display', 'none');
+      return;
+    }
+    const strokeWidth = timeline.styles[op.style][2];
+    path.removeAttribute('display');
+    path.setAttribute('d', timeline.shapes[op.shape]);
+    path.setAttribute('transform', `translate(${op.x} ${op.y}) scale(${op.size})`);
+    path.setAttribute('fill', op.fillColor);
+    path.setAttribute('stroke-linejoin', 'round');
+    path.setAttribute('stroke-linecap', 'round');
+
+    if (op.draw === undefined) {
+      path.setAttribute('fill-opacity', String(op.fillOpacity));
+      path.setAttribute('stroke', op.strokeColor);
+      path.setAttribute('stroke-opacity', String(strokeWidth > 0 ? op.strokeOpacity : 0));
+      path.setAttribute('stroke-width', String(strokeWidth / op.size));
+      path.removeAttribute('stroke-dasharray');
+      path.removeAttribute('stroke-dashoffset');
+      path.removeAttribute('pathLength');
+      return;
+    }
+
+    // Like manim's Write: trace the outline over the first half, fill in the second.
+    const outline = Math.min(1, 2 * op.draw);
+    const fill = Math.max(0, 2 * op.draw - 1);
+    const stroked = strokeWidth > 0 && op.strokeOpacity > 0;
+    path.setAttribute('pathLength', '1');
+    path.setAttribute('stroke-dasharray', '1 1');
+    path.setAttribute('stroke-dashoffset', String(1 - outline));
+    path.setAttribute('fill-opacity', String(op.fillOpacity * fill));
+    path.setAttribute('stroke', stroked ? op.strokeColor : op.fillColor);
+    path.setAttribute('stroke-opacity', String(stroked ? op.strokeOpacity : op.fillOpacity * (1 - fill)));
+    path.setAttribute('stroke-width', String((stroked ? strokeWidth : 0.02) / op.size));
+  });
+}
+
+const formatTime = (seconds: number) => {
+  const whole = Math.floor(seconds);
+  return `${Math.floor(whole / 60)}:${String(whole % 60).padStart(2, '0')}`;
+};
+
+// The MP4 rendered alongside a vector lesson; the job reports its URL once done.
+const FALLBACK_POLL_MS = 3000;
+
+export default function VectorPlayer({
+  src,
+  fallbackSrc,
+  fallbackStatusUrl,
+}: {
+  src: string;
+  fallbackSrc?: string;
+  fallbackStatusUrl?: string;
+}) {
+  const [timeline, setTimeline] = useState<Timeline | null>(null);
+  const [failed, setFailed] = useState(false);
+  const [renderedSrc, setRenderedSrc] = useState<string | null>(null);
+  const [fallbackFailed, setFallbackFailed] = useState(false);
+  const [playing, setPlaying] = useState(false);
+  const [time, setTime] = useState(0);
+  const groupRef = useRef<SVGGElement>(null);
+  const audioRef = useRef<HTMLAudioElement>(null);
+  const timeRef = useRef(0);
+
+  useEffect(() => {
+    let cancelled = false;
+    const started = performance.now();
+    fetch(src)
+      .then((response) => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.text();
+      })
+      .then((text) => {
+        const fetched = performance.now();
+        const data: Timeline = JSON.parse(text);
+        console.info(
+          `Vector lesson: ${(text.length / 1024).toFixed(1)} KB, fetched in ${(fetched - started).toFixed(0)} ms, ` +
+            `decoded in ${(performance.now() - fetched).toFixed(1)} ms`
+        );
+        if (cancelled) return;
+        if (data.version !== SUPPORTED_VERSION) throw new Error(`Unsupported timeline version ${data.version}`);
+        setTimeline(data);
+      })
+      .catch((error) => {
+        console.error('Vector lesson unavailable:', error);
+        if (!cancelled) setFailed(true);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [src]);
+
+  useEffect(() => {
+    if (!failed || fallbackSrc || !fallbackStatusUrl) return;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    let cancelled = false;
+    const poll = () => {
+      fetch(fallbackStatusUrl)
+        .then((response) => response.json())
+        .then((job) => {
+          if (cancelled) return;
+          if (job.videoUrl) setRenderedSrc(new URL(job.videoUrl, fallbackStatusUrl).toString());
+          else if (job.status === 'failed') setFallbackFailed(true);
+          else timer = setTimeout(poll, FALLBACK_POLL_MS);
+        })
+        .catch(() => {
+          if (!cancelled) setFallbackFailed(true);
+        });
+    };
+    poll();
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [failed, fallbackSrc, fallbackStatusUrl]);
+
+  useEffect(() => {
+    if (timeline && groupRef.current) paint(groupRef.current, timeline, frameAt(timeline, time));
+  }, [timeline, time]);
+
+  useEffect(() => {
+    if (!playing || !timeline) return;
+    let frame = 0;
+    let last = performance.now();
+    const tick = (now: number) => {
+      const audio = audioRef.current;
+      // The narration is the clock when there is one.
+      const next = audio && !audio.paused ? audio.currentTime : timeRef.current + (now - last) / 1000;
+      last = now;
+      timeRef.current = Math.min(next, timeline.duration);
+      setTime(timeRef.current);
+      if (timeRef.current >= timeline.duration) {
+        // The narration can run a little past the last keyframe.
+        audio?.pause();
+        setPlaying(false);
+        return;
+      }
+      frame = requestAnimationFrame(tick);
+    };
+    frame = requestAnimationFrame(tick);
+    return () => cancelAnimationFrame(frame);
+  }, [playing, timeline]);
+
+  const seek = (value: number) => {
+    timeRef.current = value;
+    setTime(value);
+    if (audioRef.current) audioRef.current.currentTime = value;
+  };
+
+  const togglePlay = () => {
+    const audio = audioRef.current;
+    if (playing) {
+      audio?.pause();
+      setPlaying(false);
+      return;
+    }
+    if (timeline && timeRef.current >= timeline.duration) seek(0);
+    if (audio) {
+      audio.currentTime = timeRef.current;
+      audio.play().catch(() => undefined);
+    }
+    setPlaying(true);
+  };
+
+  if (failed) {
+    const videoSrc = fallbackSrc ?? renderedSrc;
+    if (videoSrc) {
+      return (
+        <video controls className="mt-2 rounded-lg" style={{ maxWidth: '100%' }}>
+          <source src={videoSrc} type="video/mp4" />
+          Your browser does not support the video tag.
+        </video>
+      );
+    }
+    if (fallbackStatusUrl && !fallbackFailed) {
+      return <p className="mt-2 text-sm text-gray-500">Preparing the video version of this lesson...</p>;
+    }
+    return <p className="mt-2 text-sm text-red-500">Could not load this lesson.</p>;
+  }
+
+  if (!timeline) {
+    return <p className="mt-2 text-sm text-gray-500">Loading lesson...</p>;
+  }
+
+  return (
+    <div className="mt-2 rounded-lg overflow-hidden" style={{ maxWidth: '100%' }}>
+      <svg
+        viewBox={`${-timeline.width / 2} ${-timeline.height / 2} ${timeline.width} ${timeline.height}`}
+        style={{ width: '100%', display: 'block', background: timeline.background }}
+      >
+        <g ref={groupRef} />
+      </svg>
+      {timeline.audio && <audio ref={audioRef} src={new URL(timeline.audio, src).toString()} preload="auto" />}
+      <div className="flex items-center gap-3 bg-gray-800 px-3 py-2 text-white text-xs">
+        <button onClick={togglePlay} aria-label={playing ? 'Pause' : 'Play'}>
+          {playing ? <FaPause /> : <FaPlay />}
+        </button>
+        <input
+          type="range"
+          min={0}
+          max={timeline.duration}
+          step={0.01}
+          value={time}
+          onChange={(e) => seek(Number(e.target.value))}
+          className="flex-1"
+        />
+        <span>
+          {formatTime(time)} / {formatTime(timeline.duration)}
+        </span>
+      </div>
+    </div>
+  );
+}
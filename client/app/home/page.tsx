@@ -18,6 +18,7 @@ import {
   FaPencilAlt 
 } from 'react-icons/fa';
 import '../globals.css'
+import VectorPlayer from './VectorPlayer';
 
 interface Message {
   sender: 'user' | 'bot';
@@ -25,6 +26,8 @@ interface Message {
   message?: string;
   content: string | File | null;
   videoUrl?: string;
+  vectorUrl?: string;
+  statusUrl?: string;
   imageUrl?: string;
 }
 
@@ -104,6 +107,8 @@ const ChatbotUI: React.FC = () => {
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [selectedFilePreview, setSelectedFilePreview] = useState<string | null>(null);
   const [isBotTyping, setIsBotTyping] = useState(false);
+  // Lightweight vector lessons are opt-in; the MP4 stays the default.
+  const [vectorLessons, setVectorLessons] = useState(false);
   const [botResponseVideoUrl, setBotResponseVideoUrl] = useState<string | null>(null);
   const chatBottomRef = useRef<HTMLDivElement>(null);
   const [isSidebarOpen, setIsSidebarOpen] = useState(true);
@@ -179,7 +184,12 @@ const ChatbotUI: React.FC = () => {
       const response = await fetch('https://video-gen-backend-ava3edcqfvafa6d8.canadacentral-01.azurewebsites.net/api/ask', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: inputText.trim() })
+        body: JSON.stringify({
+          message: inputText.trim(),
+          // Lets the backend pick a render size for this screen.
+          viewportWidth: window.innerWidth,
+          ...(vectorLessons && { format: 'vector' })
+        })
       });
 
       const data = await response.json();
@@ -188,7 +198,9 @@ const ChatbotUI: React.FC = () => {
         sender: 'bot',
         type: 'video',
         content: null,
-        videoUrl: data.videoUrl
+        videoUrl: data.videoUrl,
+        vectorUrl: data.vectorUrl,
+        statusUrl: data.statusUrl
       };
       setMessages(prev => [...prev, botReply]);
     } catch (error) {
@@ -233,6 +245,7 @@ const ChatbotUI: React.FC = () => {
     try {
       const formData = new FormData();
       formData.append('file', file);
+      formData.append('viewportWidth', String(window.innerWidth));
 
       const response = await fetch('https://video-gen-backend-ava3edcqfvafa6d8.canadacentral-01.azurewebsites.net/api/upload/pdf', {
         method: 'POST',
@@ -275,6 +288,7 @@ const ChatbotUI: React.FC = () => {
     try {
       const formData = new FormData();
       formData.append('file', file);
+      formData.append('viewportWidth', String(window.innerWidth));
   
       const response = await fetch('https://video-gen-backend-ava3edcqfvafa6d8.canadacentral-01.azurewebsites.net/api/upload/handwritten', {
         method: 'POST',
@@ -425,7 +439,14 @@ const ChatbotUI: React.FC = () => {
                   )}
                 </div>
               )}
-              {msg.type === "video" && msg.videoUrl && (
+              {msg.type === "video" && msg.vectorUrl && (
+                <VectorPlayer
+                  src={`https://video-gen-backend-ava3edcqfvafa6d8.canadacentral-01.azurewebsites.net${msg.vectorUrl}`}
+                  fallbackSrc={msg.videoUrl && `https://video-gen-backend-ava3edcqfvafa6d8.canadacentral-01.azurewebsites.net${msg.videoUrl}`}
+                  fallbackStatusUrl={msg.statusUrl && `https://video-gen-backend-ava3edcqfvafa6d8.canadacentral-01.azurewebsites.net${msg.statusUrl}`}
+                />
+              )}
+              {msg.type === "video" && !msg.vectorUrl && msg.videoUrl && (
                 <video controls className="mt-2 rounded-lg" style={{ maxWidth: '100%' }}>
                   <source src={`https://video-gen-backend-ava3edcqfvafa6d8.canadacentral-01.azurewebsites.net${msg.videoUrl}`} type="video/mp4" />
                   {msg.message && <p className="mt-1">{msg.message}</p>}
@@ -465,6 +486,14 @@ const ChatbotUI: React.FC = () => {
               <FaPaperPlane className="text-lg" />
             </button>
           </div>
+          <label className="flex items-center gap-1 text-xs text-gray-600 cursor-pointer whitespace-nowrap">
+            <input
+              type="checkbox"
+              checked={vectorLessons}
+              onChange={(e) => setVectorLessons(e.target.checked)}
+            />
+            Lite player
+          </label>
           <div>
             <label htmlFor="file-upload" className="cursor-pointer text-gray-600 hover:text-indigo-500">
               <FaFileUpload className="text-xl" />